@@ -0,0 +1,198 @@
+import asyncio
+import os
+import random
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from time import monotonic, time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from metrics import label_values, registry
+
+# Окно параллельных запросов к одному хосту: старт, пределы и шаги AIMD
+HOST_INITIAL_CONCURRENCY = float(os.getenv("HOST_INITIAL_CONCURRENCY", "4"))
+HOST_MIN_CONCURRENCY = float(os.getenv("HOST_MIN_CONCURRENCY", "1"))
+HOST_MAX_CONCURRENCY = float(os.getenv("HOST_MAX_CONCURRENCY", "32"))
+# Ответ медленнее базовой задержки в столько раз считается перегрузкой
+HOST_SLOW_FACTOR = float(os.getenv("HOST_SLOW_FACTOR", "3"))
+# Паузы после 429/5xx: экспонента с полным джиттером, потолок; Retry-After важнее
+HOST_BACKOFF_BASE_S = float(os.getenv("HOST_BACKOFF_BASE_S", "1"))
+HOST_BACKOFF_MAX_S = float(os.getenv("HOST_BACKOFF_MAX_S", "120"))
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах или HTTP-дате -> секунды ожидания"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_s: float = HOST_BACKOFF_BASE_S, max_s: float = HOST_BACKOFF_MAX_S) -> float:
+    """Экспоненциальная пауза с полным джиттером: случайное число в [0, base * 2^attempt]"""
+    return random.uniform(0, min(max_s, base_s * 2 ** attempt))
+
+
+class HostState:
+    """Окно и статистика одного хоста"""
+
+    def __init__(self, host: str, initial: float):
+        self.host = host
+        self.limit = initial
+        self.inflight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.failures = 0
+        self.base_latency: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.counters = {"ok": 0, "slow": 0, "throttled": 0, "errors": 0}
+        self.changed = asyncio.Condition()
+
+
+class Slot:
+    """Аренда места в окне хоста; observe() сообщает результат ответа"""
+
+    def __init__(self, limiter: "AdaptiveHostLimiter", state: HostState):
+        self._limiter = limiter
+        self._state = state
+        self._started = monotonic()
+        self.observed = False
+
+    def observe(self, status: int, retry_after: Optional[str] = None):
+        """Вызывается при получении заголовков ответа (задержка — до первого байта)"""
+        self.observed = True
+        self._limiter._record(self._state, status, monotonic() - self._started, retry_after_seconds(retry_after))
+
+
+class AdaptiveHostLimiter:
+    """
+    AIMD-регулятор параллельности по хостам: пока ответы быстрые и без ошибок,
+    окно растёт на 1 за «окно» ответов; на 429/5xx и таймауты — уменьшается
+    вдвое и хост ставится на паузу (Retry-After или экспонента с джиттером),
+    на медленные ответы — уменьшается на 10%.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: float = HOST_INITIAL_CONCURRENCY,
+        minimum: float = HOST_MIN_CONCURRENCY,
+        maximum: float = HOST_MAX_CONCURRENCY,
+        slow_factor: float = HOST_SLOW_FACTOR,
+    ):
+        self.name = name
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_factor = slow_factor
+        self.hosts: Dict[str, HostState] = {}
+        registry.gauge(
+            f"manga_{name}_host_concurrency_limit",
+            f"Текущее окно параллельных запросов по хостам ({name})",
+            lambda: label_values({host: round(s.limit, 2) for host, s in self.hosts.items()}, "host"),
+        )
+        registry.gauge(
+            f"manga_{name}_host_inflight",
+            f"Запросы в работе по хостам ({name})",
+            lambda: label_values({host: s.inflight for host, s in self.hosts.items()}, "host"),
+        )
+        registry.gauge(
+            f"manga_{name}_host_backoff_seconds",
+            f"Сколько ещё длится пауза хоста ({name})",
+            lambda: label_values({host: round(max(0.0, s.blocked_until - monotonic()), 2) for host, s in self.hosts.items()}, "host"),
+        )
+        self.throttled_total = registry.counter(
+            f"manga_{name}_host_throttled_total",
+            f"Ответы 429/5xx и сетевые ошибки по хостам ({name})",
+        )
+
+    def _state(self, url: str) -> HostState:
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostState(host, self.initial)
+        return self.hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Ждём места в окне хоста и окончания паузы; исключение внутри блока — сетевая ошибка"""
+        state = self._state(url)
+        async with state.changed:
+            while True:
+                pause = state.blocked_until - monotonic()
+                if pause <= 0 and state.inflight < max(1, int(state.limit)):
+                    break
+                try:
+                    await asyncio.wait_for(state.changed.wait(), timeout=pause if pause > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+            state.inflight += 1
+        slot = Slot(self, state)
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if not slot.observed:
+                self._record(state, 0, monotonic() - slot._started, None)
+            raise
+        finally:
+            async with state.changed:
+                state.inflight -= 1
+                state.changed.notify_all()
+
+    def _decrease(self, state: HostState, factor: float):
+        """Уменьшаем окно не чаще раза за задержку ответа: пачка ошибок от одного всплеска — одно уменьшение"""
+        now = monotonic()
+        if now - state.last_decrease < max(state.latency or 0.0, 0.5):
+            return
+        state.last_decrease = now
+        state.limit = max(self.minimum, state.limit * factor)
+
+    def _record(self, state: HostState, status: int, latency: float, retry_after: Optional[float]):
+        if status in THROTTLE_STATUSES or status >= 500 or status == 0:
+            # Multiplicative decrease + пауза всего хоста
+            state.failures += 1
+            state.counters["throttled" if status in THROTTLE_STATUSES else "errors"] += 1
+            self._decrease(state, 0.5)
+            delay = retry_after if retry_after is not None else backoff_delay(state.failures - 1)
+            state.blocked_until = max(state.blocked_until, monotonic() + min(delay, HOST_BACKOFF_MAX_S))
+            self.throttled_total.inc(host=state.host, status=status or "network")
+            return
+        if status >= 400:
+            return  # 404 и т.п. ничего не говорят о нагрузке на хост
+
+        state.failures = 0
+        state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+        # Базовая задержка — медленно забываемый минимум
+        if state.base_latency is None or latency < state.base_latency:
+            state.base_latency = latency
+        else:
+            state.base_latency += (latency - state.base_latency) * 0.01
+        if latency > state.base_latency * self.slow_factor and latency > 0.2:
+            state.counters["slow"] += 1
+            self._decrease(state, 0.9)
+        else:
+            # Additive increase: +1 к окну за каждые limit успешных ответов
+            state.counters["ok"] += 1
+            state.limit = min(self.maximum, state.limit + 1 / state.limit)
+
+    def stats(self) -> Dict:
+        now = monotonic()
+        return {
+            host: {
+                "limit": round(s.limit, 2),
+                "inflight": s.inflight,
+                "backoff_s": round(max(0.0, s.blocked_until - now), 2),
+                "latency_ms": round(s.latency * 1000, 1) if s.latency is not None else None,
+                "base_latency_ms": round(s.base_latency * 1000, 1) if s.base_latency is not None else None,
+                **s.counters,
+            }
+            for host, s in self.hosts.items()
+        }
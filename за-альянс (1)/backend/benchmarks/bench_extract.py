@@ -0,0 +1,130 @@
+"""
+Бенчмарк скриптов извлечения метаданных на HTML-фикстурах.
+
+Запуск из папки backend:
+    python benchmarks/bench_extract.py --runs 20 --chapters 300 500 1500
+    python benchmarks/bench_extract.py output.html --budget-ms 250
+    python benchmarks/bench_extract.py --baseline <commit>
+
+Для каждой фикстуры замеряет время page.evaluate у текущих скриптов
+(extract_scripts.py) и у исходных — из get_full_manga_info в server.py
+указанного коммита (по умолчанию первого в истории), сравнивает
+извлечённые поля и падает с кодом 1, если медиана превышает бюджет.
+Сохранённые страницы берутся из benchmarks/fixtures (см. record_fixture.py).
+"""
+import argparse
+import ast
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from playwright.async_api import async_playwright
+
+from benchmarks.fixtures import detail_page_html, load_saved_fixtures
+from extract_scripts import EXPAND_TAGS_JS, MANGA_INFO_JS
+
+COMPARED_FIELDS = ("title", "alternative_titles", "additional_info", "cover_url")
+
+
+async def measure(page, html: str, expand_js: str, info_js: str, runs: int) -> Tuple[List[float], List[float], Dict]:
+    """Время (мс) скрипта разворачивания и скрипта извлечения по прогонам"""
+    expand_times, info_times, info = [], [], {}
+    for _ in range(runs):
+        await page.set_content(html, wait_until="domcontentloaded")
+        started = perf_counter()
+        await page.evaluate(expand_js)
+        expand_times.append((perf_counter() - started) * 1000)
+        started = perf_counter()
+        info = await page.evaluate(info_js)
+        info_times.append((perf_counter() - started) * 1000)
+    info.pop("_elapsed_ms", None)
+    return expand_times, info_times, info
+
+
+def git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, encoding="utf-8", check=True
+    ).stdout
+
+
+def baseline_scripts(rev: Optional[str] = None) -> Tuple[str, str]:
+    """Исходные скрипты разворачивания тегов и извлечения метаданных из истории git"""
+    rev = rev or git("rev-list", "--max-parents=0", "HEAD").split()[0]
+    tree = ast.parse(git("show", f"{rev}:./server.py"))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AsyncFunctionDef) and node.name == "get_full_manga_info":
+            calls = sorted(
+                (call for call in ast.walk(node)
+                 if isinstance(call, ast.Call) and getattr(call.func, "attr", None) == "evaluate"
+                 and call.args and isinstance(call.args[0], ast.Constant)),
+                key=lambda call: call.lineno,
+            )
+            scripts = [call.args[0].value for call in calls]
+            if len(scripts) >= 2:
+                return scripts[0], scripts[1]
+    raise RuntimeError(f"В server.py коммита {rev} нет скриптов get_full_manga_info")
+
+
+def summary(times: List[float]) -> str:
+    ordered = sorted(times)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered):7.1f} мс  p95 {p95:7.1f} мс"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("html", nargs="*", help="Сохранённые HTML-страницы тайтлов")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--chapters", type=int, nargs="*", default=[300, 1500], help="Размеры сгенерированных фикстур")
+    parser.add_argument("--budget-ms", type=float, default=250, help="Допустимая медиана извлечения метаданных")
+    parser.add_argument("--skip-legacy", action="store_true", help="Не гонять исходные скрипты")
+    parser.add_argument("--baseline", help="Коммит с исходными скриптами (по умолчанию первый)")
+    args = parser.parse_args()
+
+    legacy = None
+    if not args.skip_legacy:
+        try:
+            legacy = baseline_scripts(args.baseline)
+        except (OSError, subprocess.CalledProcessError, RuntimeError) as e:
+            print(f"[WARN] Исходные скрипты не найдены, сравнение пропущено: {e}")
+
+    fixtures = [(f"generated, {n} глав", detail_page_html(chapters=n, comments=n)) for n in args.chapters]
+    saved = load_saved_fixtures(args.html)
+    if not saved:
+        print("[WARN] Нет сохранённых страниц: меряем только сгенерированные (benchmarks/record_fixture.py)")
+    for path in saved:
+        with open(path, encoding="utf-8") as f:
+            fixtures.append((os.path.basename(path), f.read()))
+
+    over_budget = False
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=["--no-sandbox"])
+        page = await browser.new_page()
+        for name, html in fixtures:
+            print(f"\n📄 {name} ({len(html) // 1024} КБ)")
+            expand_t, info_t, info = await measure(page, html, EXPAND_TAGS_JS, MANGA_INFO_JS, args.runs)
+            print(f"   текущий  expand: {summary(expand_t)} | metadata: {summary(info_t)}")
+            if statistics.median(info_t) > args.budget_ms:
+                over_budget = True
+                print(f"   ❌ медиана извлечения выше бюджета {args.budget_ms} мс")
+
+            if legacy:
+                legacy_expand_t, legacy_info_t, legacy_info = await measure(page, html, *legacy, args.runs)
+                print(f"   исходный expand: {summary(legacy_expand_t)} | metadata: {summary(legacy_info_t)}")
+                for field in COMPARED_FIELDS:
+                    if info.get(field) != legacy_info.get(field):
+                        print(f"   ⚠️ {field}: {info.get(field)!r} != {legacy_info.get(field)!r}")
+        await browser.close()
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,231 @@
+"""
+Офлайн-бенчмарк парсера против локального заменителя сайта (benchmarks/standin.py).
+
+Запуск из папки backend:
+    python benchmarks/bench_parser.py --chapters 50 --pages 20 --image-kb 800 --workers 4 10 20
+    python benchmarks/bench_parser.py --no-nuxt --latency-ms 40 --json bench.json
+    python benchmarks/bench_parser.py --fixtures-dir benchmarks/fixtures
+
+С --fixtures-dir страницы тайтла и читалки — сохранённые HTML (см. StandInSite).
+Окно host_limiter для каждого max_workers стартует с этого значения, а пул
+соединений допускает max(--workers) на хост: иначе стартовое окно 4 и
+HTTP_MAX_PER_HOST=16 срезали бы весь перебор max_workers.
+
+Меряет FastMangaParser.get_manga_info, process_chapter_async и
+download_images_batch: страницы/с, главы/с, p50/p95 задержки,
+пиковый RSS (процесс + браузеры) и число запущенных браузеров.
+Все файлы пишутся во временную папку, рабочая папка manga/ не трогается.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from playwright.async_api import async_playwright
+
+from benchmarks.standin import StandInSite
+
+try:
+    import psutil
+except ImportError:  # без psutil пиковый RSS берём из getrusage
+    psutil = None
+
+
+class ResourceMonitor:
+    """Фоновая выборка RSS процесса и дочерних процессов (браузеров)"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_browsers = 0
+        self._task = None
+
+    def _sample(self):
+        proc = psutil.Process()
+        rss = proc.memory_info().rss
+        browsers = 0
+        for child in proc.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+                cmdline = " ".join(child.cmdline())
+                if "chrom" in child.name().lower() and "--type=" not in cmdline:
+                    browsers += 1
+            except psutil.Error:
+                continue
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_browsers = max(self.peak_browsers, browsers)
+
+    async def _loop(self):
+        while True:
+            self._sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if psutil is not None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> Dict:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            return {"peak_rss_mb": round(self.peak_rss / 2**20, 1), "peak_browser_processes": self.peak_browsers}
+        # ru_maxrss в КБ (Linux); по детям — максимум одного процесса, а не сумма
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return {"peak_rss_mb": round((own + children) / 1024, 1), "peak_browser_processes": None}
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None}
+    ordered = sorted(values)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapters", type=int, default=30, help="Глав у тайтла-заменителя")
+    parser.add_argument("--pages", type=int, default=20, help="Страниц в главе")
+    parser.add_argument("--image-kb", type=int, default=600, help="Средний размер картинки")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Искусственная задержка ответа")
+    parser.add_argument("--no-nuxt", action="store_true", help="Без Nuxt-пейлоада: главы только через браузер")
+    parser.add_argument("--fixtures-dir", help="Папка с сохранёнными detail.html/output.html и reader*.html")
+    parser.add_argument("--browsers", type=int, default=2, help="Размер пула браузеров")
+    parser.add_argument("--chapter-concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="*", default=[10], help="Значения max_workers для загрузки")
+    parser.add_argument("--download-chapters", type=int, default=5, help="Сколько глав скачивать в тесте загрузки")
+    parser.add_argument("--json", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    # Пути из аргументов — относительно папки запуска, а не временной папки после chdir
+    if args.fixtures_dir:
+        args.fixtures_dir = os.path.abspath(args.fixtures_dir)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    workdir = tempfile.mkdtemp(prefix="manga-bench-")
+    os.chdir(workdir)
+    import server  # после chdir: manga/ и SQLite-файлы создаются во временной папке
+    from browser_pool import BrowserPool
+    from scheduler import ChapterScheduler, HostRateLimiter
+
+    site = StandInSite(
+        chapters=args.chapters,
+        pages_per_chapter=args.pages,
+        image_kb=args.image_kb,
+        latency_ms=args.latency_ms,
+        embed_nuxt=not args.no_nuxt,
+        fixtures_dir=args.fixtures_dir,
+    )
+    await site.start()
+    server.BASE_URL = site.base_url
+    # к локальному заменителю лимит частоты не нужен — меряем сам парсер
+    server.parser.chapter_scheduler = ChapterScheduler(args.chapter_concurrency, HostRateLimiter(0))
+
+    monitor = ResourceMonitor()
+    monitor.start()
+    results: Dict = {"config": vars(args)}
+
+    playwright = await async_playwright().start()
+    server.playwright_instance = playwright
+    server.browser_pool = BrowserPool(playwright, size=args.browsers)
+    launch_started = perf_counter()
+    await server.browser_pool.start()
+    results["pool_start_s"] = round(perf_counter() - launch_started, 2)
+    server.HTTP_MAX_PER_HOST = max(server.HTTP_MAX_PER_HOST, *args.workers)
+    server.HTTP_MAX_CONNECTIONS = max(server.HTTP_MAX_CONNECTIONS, server.HTTP_MAX_PER_HOST)
+    server.http_session = server.create_http_session()
+
+    try:
+        # 1. Полный проход по тайтлу (метаданные + все главы, только ссылки)
+        started = perf_counter()
+        info = await server.parser.get_manga_info(site.title_url)
+        elapsed = perf_counter() - started
+        total_pages = sum(ch["total_pages"] for ch in info["chapters"])
+        results["get_manga_info"] = {
+            "seconds": round(elapsed, 2),
+            "chapters": info["total_chapters"],
+            "chapters_per_s": round(info["total_chapters"] / elapsed, 2),
+            "pages_found": total_pages,
+            "failed_chapters": len(info.get("failed_chapters", [])),
+        }
+
+        # 2. Отдельные главы: задержка одной главы
+        manga_dir = os.path.join("manga", server.parser.sanitize_filename(info["title"]))
+        latencies = []
+        started = perf_counter()
+        for idx, chapter in enumerate(info["chapters"], start=1):
+            t0 = perf_counter()
+            await server.parser.process_chapter_async(None, chapter, idx, manga_dir, download_images=False)
+            latencies.append(perf_counter() - t0)
+        elapsed = perf_counter() - started
+        results["process_chapter_async"] = {
+            "chapters_per_s": round(len(latencies) / elapsed, 2),
+            **percentiles(latencies),
+            "extraction": dict(server.parser.extraction_stats),
+        }
+
+        # 3. Загрузка картинок при разных max_workers
+        urls = [p for ch in info["chapters"][:args.download_chapters] for p in ch["pages"]]
+        results["download_images_batch"] = []
+        for workers in args.workers:
+            target = os.path.join(workdir, f"download_{workers}")
+            download_list = [(url, os.path.join(target, f"{i:05d}.jpg")) for i, url in enumerate(urls)]
+            server.parser.max_workers = workers
+            # Окно хоста с нуля и не меньше max_workers, иначе меряется AIMD, а не загрузка
+            server.host_limiter.hosts.clear()
+            server.host_limiter.initial = workers
+            server.host_limiter.maximum = max(server.host_limiter.maximum, workers)
+            bytes_before = site.bytes_sent
+            started = perf_counter()
+            downloaded = await server.parser.download_images_batch(download_list)
+            elapsed = perf_counter() - started
+            megabytes = (site.bytes_sent - bytes_before) / 2**20
+            results["download_images_batch"].append({
+                "max_workers": workers,
+                "pages": downloaded,
+                "pages_per_s": round(downloaded / elapsed, 1),
+                "mb_per_s": round(megabytes / elapsed, 1),
+                "seconds": round(elapsed, 2),
+            })
+            shutil.rmtree(target, ignore_errors=True)
+
+        results["browser_pool"] = {
+            "launches": server.browser_pool.launches,
+            "recycled": server.browser_pool.recycled,
+        }
+        results["standin_requests"] = site.requests
+        results["readiness"] = server.readiness_stats.snapshot()
+    finally:
+        await server.http_session.close()
+        await server.browser_pool.stop()
+        await playwright.stop()
+        results["resources"] = await monitor.stop()
+        await site.stop()
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""Генерация HTML-фикстур в разметке webfandom.ru для офлайн-бенчмарков"""
+import json
+import os
+from typing import List, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def detail_page_html(
+    chapters: int = 300,
+    tags: int = 40,
+    comments: int = 200,
+    reader_base: str = "/reader/bench",
+    cover_url: str = "/media/catalog/publication/cover.jpg",
+) -> str:
+    """Страница тайтла: метаданные, теги с «Показать все», список глав и комментарии"""
+    tag_items = "".join(
+        f'<a href="/catalog?genres={i}"><span class="badge text-wf-yellow">Жанр {i}</span></a>'
+        for i in range(tags)
+    )
+    chapter_items = "".join(
+        f'<div class="chapter-row"><div class="flex"><a href="{reader_base}/{i}">Глава {i}</a>'
+        f'<span class="date">01.01.2025</span></div></div>'
+        for i in range(chapters, 0, -1)
+    )
+    comment_items = "".join(
+        f'<div class="comment"><div class="comment-head"><span>Пользователь {i}</span></div>'
+        f'<div class="comment-body"><p>Комментарий номер {i}, отличная глава...</p></div></div>'
+        for i in range(comments)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>Бенчмарк</title></head>
+<body><main>
+  <div class="publication-cover"><picture><img class="rounded w-full" src="{cover_url}" alt="обложка"></picture></div>
+  <h1>Всеведущий читатель</h1>
+  <div class="publication-info">
+    <div><span>Английское название:</span><span>Omniscient Reader's Viewpoint</span></div>
+    <div><span>Корейское название:</span><span>전지적 독자 시점</span></div>
+    <div><span>Статус</span><span>Продолжается</span></div>
+    <div><span>Автор:</span><span>Sing Shong</span></div>
+    <div><span>Художник:</span><span>Sleepy-C</span></div>
+    <div><span>Год выпуска</span><span>2020</span></div>
+  </div>
+  <div class="publication-description whitespace-pre-wrap">{"Описание тайтла для бенчмарка. " * 20}</div>
+  <div class="tags">{tag_items}<span class="badge">Показать все</span></div>
+  <div class="chapters">{chapter_items}</div>
+  <div class="comments">{comment_items}</div>
+</main></body></html>"""
+
+
+def reader_page_html(images: List[str], embed_nuxt: bool = True) -> str:
+    """Страница читалки: картинки в Nuxt-пейлоаде (как на сайте) и/или в <img>"""
+    nuxt = ""
+    if embed_nuxt:
+        payload = json.dumps([{"pages": [{"url": url} for url in images]}])
+        nuxt = f'<script type="application/json" id="__NUXT_DATA__">{payload}</script>'
+    img_tags = "".join(f'<img src="{url}" alt="">' for url in images)
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>Глава</title></head>
+<body><div class="reader">{img_tags}</div>{nuxt}</body></html>"""
+
+
+def load_saved_fixtures(paths: Optional[List[str]] = None) -> List[str]:
+    """Сохранённые страницы (например, output.html из get.py) из benchmarks/fixtures и переданных путей"""
+    found = []
+    if os.path.isdir(FIXTURES_DIR):
+        found += [os.path.join(FIXTURES_DIR, name) for name in sorted(os.listdir(FIXTURES_DIR)) if name.endswith(".html")]
+    found += paths or []
+    return found
@@ -0,0 +1,51 @@
+"""
+Сохраняем страницу тайтла для бенчмарков в benchmarks/fixtures.
+
+Запуск из папки backend:
+    python benchmarks/record_fixture.py https://webfandom.ru/publications/manga-vseveduschij-chitatel
+    python benchmarks/record_fixture.py <url> --name detail.html
+
+Сохраняется DOM после загрузки страницы (то, что видят скрипты извлечения),
+без картинок и сторонних скриптов — так же, как страницу открывает парсер.
+Файл кладётся в репозиторий: bench_extract.py и StandInSite(fixtures_dir=...) берут его оттуда.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+
+from benchmarks.fixtures import FIXTURES_DIR
+from resource_blocking import ResourceBlocker
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", help="Страница тайтла или читалки")
+    parser.add_argument("--name", help="Имя файла (по умолчанию — последний сегмент URL)")
+    args = parser.parse_args()
+
+    name = args.name or re.sub(r"[^\w.-]+", "_", args.url.rstrip("/").rsplit("/", 1)[-1]) + ".html"
+    path = os.path.join(FIXTURES_DIR, name)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=["--no-sandbox"])
+        context = await browser.new_context(locale="ru-RU")
+        await ResourceBlocker(args.url).install(context)
+        page = await context.new_page()
+        await page.goto(args.url, wait_until="domcontentloaded")
+        html = await page.content()
+        await browser.close()
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    print(f"💾 {path} ({len(html) // 1024} КБ)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
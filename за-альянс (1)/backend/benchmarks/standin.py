@@ -0,0 +1,152 @@
+"""Локальный заменитель webfandom.ru: страницы тайтла, читалки и картинки заданного размера"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+from typing import Optional
+
+from aiohttp import web
+
+from benchmarks.fixtures import detail_page_html, reader_page_html
+
+SOURCE_ORIGIN = "https://webfandom.ru"
+# Абсолютные ссылки на картинки в сохранённых страницах: подменяются на локальные
+IMAGE_URL_RE = re.compile(r"https?://[^\s\"'<>()]+?\.(?:jpe?g|png|webp|gif)(?:\?[^\s\"'<>()]*)?", re.IGNORECASE)
+
+
+class StandInSite:
+    """
+    HTTP-сервер на 127.0.0.1 с детерминированным контентом для бенчмарков.
+    С fixtures_dir страницы тайтла и читалки берутся из сохранённых файлов
+    (detail.html или output.html, reader_<последний сегмент пути>.html или reader.html):
+    ссылки на webfandom.ru ведут на заменитель, а картинки — на локальные /images.
+    """
+
+    def __init__(
+        self,
+        chapters: int = 50,
+        pages_per_chapter: int = 20,
+        image_kb: int = 600,
+        image_kb_jitter: float = 0.5,
+        latency_ms: float = 0,
+        embed_nuxt: bool = True,
+        port: int = 0,
+        fixtures_dir: Optional[str] = None,
+    ):
+        self.chapters = chapters
+        self.pages_per_chapter = pages_per_chapter
+        self.image_kb = image_kb
+        self.image_kb_jitter = image_kb_jitter
+        self.latency_ms = latency_ms
+        self.embed_nuxt = embed_nuxt
+        self.port = port
+        self.fixtures_dir = fixtures_dir
+        self.base_url: Optional[str] = None
+        self.requests = 0
+        self.bytes_sent = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def title_url(self) -> str:
+        return f"{self.base_url}/publications/bench"
+
+    def image_url(self, chapter, page: int) -> str:
+        return f"{self.base_url}/images/{chapter}/{page:03d}.jpg"
+
+    async def start(self) -> str:
+        app = web.Application(middlewares=[self._count])
+        app.router.add_get("/publications/bench", self._detail)
+        if self.fixtures_dir:
+            app.router.add_get("/reader/{path:.+}", self._recorded_reader)
+            # Относительные ссылки на картинки сайта (обложки, /media/...)
+            app.router.add_get("/media/{path:.+}", self._media)
+        else:
+            app.router.add_get("/reader/bench/{chapter}", self._reader)
+        app.router.add_get("/images/cover.jpg", self._cover)
+        app.router.add_get("/images/{chapter}/{page}", self._image)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @web.middleware
+    async def _count(self, request, handler):
+        self.requests += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        response = await handler(request)
+        self.bytes_sent += response.content_length or 0
+        return response
+
+    def _recorded(self, names, chapter: str) -> Optional[str]:
+        """Сохранённая страница с локальными ссылками; картинки главы нумеруются по порядку"""
+        for name in names:
+            path = os.path.join(self.fixtures_dir, name)
+            if os.path.isfile(path):
+                break
+        else:
+            return None
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        pages = iter(range(1, 10 ** 6))
+        images = {}
+
+        def local_image(match) -> str:
+            url = match.group(0)
+            if url not in images:
+                images[url] = self.image_url(chapter, next(pages))
+            return images[url]
+
+        html = IMAGE_URL_RE.sub(local_image, html)
+        return html.replace(SOURCE_ORIGIN, self.base_url)
+
+    async def _detail(self, request):
+        if self.fixtures_dir:
+            html = self._recorded(["detail.html", "output.html"], "cover")
+            if html is None:
+                raise web.HTTPNotFound(text=f"Нет detail.html или output.html в {self.fixtures_dir}")
+            return web.Response(text=html, content_type="text/html")
+        html = detail_page_html(
+            chapters=self.chapters,
+            reader_base="/reader/bench",
+            cover_url=f"{self.base_url}/images/cover.jpg",
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def _reader(self, request):
+        chapter = int(request.match_info["chapter"])
+        images = [self.image_url(chapter, page) for page in range(1, self.pages_per_chapter + 1)]
+        return web.Response(text=reader_page_html(images, embed_nuxt=self.embed_nuxt), content_type="text/html")
+
+    async def _recorded_reader(self, request):
+        chapter = request.match_info["path"].rstrip("/").rsplit("/", 1)[-1]
+        html = self._recorded([f"reader_{chapter}.html", "reader.html"], chapter)
+        if html is None:
+            raise web.HTTPNotFound(text=f"Нет reader_{chapter}.html или reader.html в {self.fixtures_dir}")
+        return web.Response(text=html, content_type="text/html")
+
+    async def _media(self, request):
+        return web.Response(body=self._image_bytes(request.match_info["path"]), content_type="image/jpeg")
+
+    def _image_bytes(self, key: str) -> bytes:
+        """Псевдослучайное содержимое (не сжимается и не дедуплицируется) стабильного размера"""
+        rnd = random.Random(key)
+        size = int(self.image_kb * 1024 * (1 + self.image_kb_jitter * (2 * rnd.random() - 1)))
+        seed = hashlib.sha256(key.encode()).digest()
+        block = (seed * (64 * 1024 // len(seed) + 1))[:64 * 1024]
+        return b"\xff\xd8" + (block * (size // len(block) + 1))[:size] + key.encode()
+
+    async def _cover(self, request):
+        return web.Response(body=self._image_bytes("cover"), content_type="image/jpeg")
+
+    async def _image(self, request):
+        key = f"{request.match_info['chapter']}/{request.match_info['page']}"
+        return web.Response(body=self._image_bytes(key), content_type="image/jpeg")
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from time import time
+from typing import Dict, List, Optional
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Блоб без ссылок моложе этого срока gc не трогает: его только что скачали, и глава ещё не успела на него сослаться
+BLOB_GC_GRACE_S = float(os.getenv("BLOB_GC_GRACE_S", "3600"))
+
+
+def _file_digest(path: str) -> str:
+    """sha256 файла, читаем по частям"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def chapter_owner(manga_id: str, chapter_url: str) -> str:
+    """
+    Владелец ссылок главы: id тайтла и хеш URL главы. Не позиция в списке и не имя папки:
+    после сдвига списка глав или у тайтлов с одинаковым названием ссылки не перетираются.
+    """
+    return f"{manga_id}/chapter/{hashlib.sha1(chapter_url.encode()).hexdigest()}"
+
+
+def cover_owner(manga_id: str) -> str:
+    return f"{manga_id}/cover"
+
+
+class BlobStore:
+    """
+    Контентно-адресуемое хранилище картинок: файл лежит в <root>/ab/cd/<sha256>.<ext>
+    один раз, сколько бы глав и тайтлов на него ни ссылались.
+    Ссылки (владелец -> список хешей) и счётчики ссылок хранятся в SQLite,
+    gc() удаляет блобы, на которые больше никто не ссылается.
+    Из async-кода — alookup_url/ingest/aset_refs: SQLite и файлы в отдельном потоке.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.staging_dir = os.path.join(root, "staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                owner TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (owner, position)
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def blob_path(self, digest: str, ext: str) -> str:
+        """Путь блоба с шардированием по первым байтам хеша"""
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.{ext}")
+
+    def staging_path(self, url: str, ext: str) -> str:
+        """
+        Постоянный путь для URL: после падения загрузка продолжается с недокачанного .part (Range).
+        Одновременные загрузки одного URL в процессе склеивает page_flights.
+        """
+        return os.path.join(self.staging_dir, f"{hashlib.sha1(url.encode()).hexdigest()}.{ext}")
+
+    def lookup_url(self, url: str) -> Optional[Dict]:
+        """Блоб, уже скачанный по этому URL (если файл на месте)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT b.digest, b.ext, b.refcount FROM urls u JOIN blobs b ON b.digest = u.digest WHERE u.url = ?",
+                (url,),
+            ).fetchone()
+            if row and row[2] <= 0:
+                # Блоб без ссылок снова понадобился — продлеваем ему отсрочку от gc
+                self._db.execute("UPDATE blobs SET created_at = ? WHERE digest = ?", (time(), row[0]))
+                self._db.commit()
+        if not row or not os.path.exists(self.blob_path(row[0], row[1])):
+            return None
+        return {"digest": row[0], "ext": row[1]}
+
+    async def alookup_url(self, url: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self.lookup_url, url)
+
+    async def ingest(self, src_path: str, ext: str, url: Optional[str] = None) -> str:
+        """Кладём скачанный файл в хранилище; дубликат удаляется, возвращаем хеш"""
+        return await asyncio.to_thread(self._ingest, src_path, ext, url)
+
+    def _ingest(self, src_path: str, ext: str, url: Optional[str]) -> str:
+        digest = _file_digest(src_path)
+        # Файл и запись меняются под одной блокировкой с gc: он не удалит блоб между переименованием и INSERT
+        with self._lock, self._db:
+            row = self._db.execute("SELECT ext FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row:
+                ext = row[0]  # те же байты уже лежат под своим расширением
+            target = self.blob_path(digest, ext)
+            if os.path.exists(target):
+                os.remove(src_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(src_path, target)
+            # created_at обновляется у блобов без ссылок: отсрочка от gc отсчитывается от последнего скачивания
+            self._db.execute(
+                "INSERT INTO blobs (digest, ext, size, refcount, created_at) VALUES (?, ?, ?, 0, ?) "
+                "ON CONFLICT (digest) DO UPDATE SET created_at = excluded.created_at WHERE refcount <= 0",
+                (digest, ext, os.path.getsize(target), time()),
+            )
+            if url:
+                self._db.execute("INSERT OR REPLACE INTO urls (url, digest) VALUES (?, ?)", (url, digest))
+        return digest
+
+    def set_refs(self, owner: str, digests: List[str]):
+        """Атомарно заменяем список страниц владельца (главы) и пересчитываем счётчики"""
+        with self._lock, self._db:
+            old = [row[0] for row in self._db.execute("SELECT digest FROM refs WHERE owner = ?", (owner,))]
+            self._db.executemany("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", [(d,) for d in old])
+            self._db.execute("DELETE FROM refs WHERE owner = ?", (owner,))
+            self._db.executemany(
+                "INSERT INTO refs (owner, position, digest) VALUES (?, ?, ?)",
+                [(owner, position, d) for position, d in enumerate(digests)],
+            )
+            self._db.executemany("UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?", [(d,) for d in digests])
+
+    async def aset_refs(self, owner: str, digests: List[str]):
+        await asyncio.to_thread(self.set_refs, owner, digests)
+
+    def get_refs(self, owner: str) -> List[Dict]:
+        """Страницы владельца по порядку"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT r.digest, b.ext FROM refs r JOIN blobs b ON b.digest = r.digest "
+                "WHERE r.owner = ? ORDER BY r.position",
+                (owner,),
+            ).fetchall()
+        return [{"digest": d, "ext": ext} for d, ext in rows]
+
+    def gc(self, staging_max_age_s: float = 24 * 3600, grace_s: float = BLOB_GC_GRACE_S) -> Dict:
+        """Удаляем блобы без ссылок (старше grace_s) и забытые недокачанные файлы"""
+        freed = 0
+        with self._lock, self._db:
+            orphans = self._db.execute(
+                "SELECT digest, ext, size FROM blobs WHERE refcount <= 0 AND created_at < ?", (time() - grace_s,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d, _, _ in orphans])
+            self._db.executemany("DELETE FROM urls WHERE digest = ?", [(d,) for d, _, _ in orphans])
+
+        # Файлы удаляются без общей блокировки: под ней только проверка, что блоб
+        # не появился снова, и быстрое переименование в staging; загрузки не ждут удаления
+        for digest, ext, size in orphans:
+            trash = os.path.join(self.staging_dir, f"{digest}.gc")
+            with self._lock:
+                if self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone():
+                    continue
+                try:
+                    os.replace(self.blob_path(digest, ext), trash)
+                except FileNotFoundError:
+                    continue
+            try:
+                os.remove(trash)
+                freed += size
+            except FileNotFoundError:
+                pass
+
+        stale = 0
+        now = time()
+        for name in os.listdir(self.staging_dir):
+            path = os.path.join(self.staging_dir, name)
+            try:
+                if now - os.path.getmtime(path) > staging_max_age_s:
+                    os.remove(path)
+                    stale += 1
+            except FileNotFoundError:
+                pass
+
+        return {"removed_blobs": len(orphans), "freed_bytes": freed, "removed_staging": stale}
+
+    def stats(self) -> Dict:
+        """Синхронно: из async-кода вызывать через asyncio.to_thread"""
+        with self._lock:
+            blobs, total_size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            refs = self._db.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+        return {"blobs": blobs, "bytes": total_size, "page_refs": refs}
@@ -0,0 +1,236 @@
+import asyncio
+from contextlib import asynccontextmanager
+from time import time
+from typing import Dict, List, Optional
+
+from metrics import stage_seconds
+
+try:
+    import psutil
+except ImportError:  # без psutil память браузеров не отслеживается
+    psutil = None
+
+DEFAULT_LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+]
+
+
+class PooledBrowser:
+    """Браузер из пула: считает открытые контексты и активные аренды"""
+
+    def __init__(self, browser, slot: int):
+        self.browser = browser
+        self.slot = slot
+        self.leases = 0
+        self.pages_served = 0
+        self.started_at = time()
+        self.retiring = False
+        self.closing = False
+
+    async def new_context(self, **kwargs):
+        """Открываем новый контекст и учитываем его в счётчике страниц"""
+        self.pages_served += 1
+        return await self.browser.new_context(**kwargs)
+
+    def is_connected(self) -> bool:
+        return self.browser.is_connected()
+
+    async def memory_mb(self) -> Optional[float]:
+        """Суммарный RSS процессов браузера (None, если измерить нельзя)"""
+        if psutil is None:
+            return None
+        try:
+            session = await self.browser.new_browser_cdp_session()
+            try:
+                info = await session.send("SystemInfo.getProcessInfo")
+            finally:
+                await session.detach()
+        except Exception:
+            return None
+
+        total = 0
+        for proc in info.get("processInfo", []):
+            try:
+                total += psutil.Process(proc["id"]).memory_info().rss
+            except (psutil.Error, KeyError):
+                continue
+        return total / (1024 * 1024)
+
+
+class BrowserPool:
+    """Пул долгоживущих браузеров Chromium с арендой, проверкой здоровья и перезапуском"""
+
+    def __init__(
+        self,
+        playwright,
+        size: int = 2,
+        max_leases_per_browser: int = 4,
+        max_pages_per_browser: int = 200,
+        max_memory_mb: Optional[int] = 1024,
+        health_check_interval: float = 30.0,
+        launch_args: Optional[List[str]] = None,
+    ):
+        self.playwright = playwright
+        self.size = size
+        self.max_leases_per_browser = max_leases_per_browser
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_memory_mb = max_memory_mb
+        self.health_check_interval = health_check_interval
+        self.launch_args = launch_args or DEFAULT_LAUNCH_ARGS
+
+        self._browsers: List[Optional[PooledBrowser]] = [None] * size
+        self._condition = asyncio.Condition()
+        self._health_task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.launches = 0
+        self.recycled = 0
+
+    async def _launch(self, slot: int) -> PooledBrowser:
+        with stage_seconds.time(stage="browser_launch"):
+            browser = await self.playwright.chromium.launch(headless=True, args=self.launch_args)
+        self.launches += 1
+        return PooledBrowser(browser, slot)
+
+    async def start(self):
+        """Запускаем все браузеры пула и фоновую проверку здоровья"""
+        browsers = await asyncio.gather(*(self._launch(slot) for slot in range(self.size)))
+        for pooled in browsers:
+            self._browsers[pooled.slot] = pooled
+        self._health_task = asyncio.create_task(self._health_loop())
+        print(f"🌐 Пул браузеров запущен: {self.size} шт.")
+
+    async def stop(self):
+        """Закрываем все браузеры пула"""
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        for pooled in self._browsers:
+            if pooled:
+                try:
+                    await pooled.browser.close()
+                except Exception:
+                    pass
+        self._browsers = [None] * self.size
+
+    def _needs_recycle(self, pooled: PooledBrowser) -> bool:
+        return (
+            not pooled.is_connected()
+            or pooled.pages_served >= self.max_pages_per_browser
+        )
+
+    def _pick(self) -> Optional[PooledBrowser]:
+        candidates = [
+            b for b in self._browsers
+            if b and not b.retiring and b.leases < self.max_leases_per_browser
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: b.leases)
+
+    async def acquire(self) -> PooledBrowser:
+        """Берём в аренду наименее загруженный браузер (ждём, если все заняты)"""
+        async with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Пул браузеров остановлен")
+                pooled = self._pick()
+                if pooled:
+                    pooled.leases += 1
+                    return pooled
+                await self._condition.wait()
+
+    async def release(self, pooled: PooledBrowser):
+        """Возвращаем браузер в пул и перезапускаем его при необходимости"""
+        async with self._condition:
+            pooled.leases -= 1
+            if self._needs_recycle(pooled):
+                pooled.retiring = True
+            should_replace = pooled.retiring and pooled.leases == 0
+            self._condition.notify_all()
+        if should_replace:
+            await self._replace(pooled)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Контекстный менеджер аренды браузера"""
+        pooled = await self.acquire()
+        try:
+            yield pooled
+        finally:
+            await self.release(pooled)
+
+    async def _replace(self, pooled: PooledBrowser):
+        """Закрываем отработавший браузер и запускаем новый на его месте"""
+        if self._closed or pooled.closing or self._browsers[pooled.slot] is not pooled:
+            return
+        pooled.closing = True
+        print(f"♻️ Перезапуск браузера #{pooled.slot} (страниц: {pooled.pages_served})")
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+        self.recycled += 1
+        try:
+            fresh = await self._launch(pooled.slot)
+        except Exception as e:
+            print(f"[ERROR] Не удалось перезапустить браузер #{pooled.slot}: {e}")
+            fresh = None
+        async with self._condition:
+            self._browsers[pooled.slot] = fresh
+            self._condition.notify_all()
+
+    async def _health_loop(self):
+        """Периодически проверяем соединение и память браузеров"""
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+            for slot in range(self.size):
+                pooled = self._browsers[slot]
+                if pooled is None:
+                    try:
+                        fresh = await self._launch(slot)
+                    except Exception as e:
+                        print(f"[WARN] Браузер #{slot} всё ещё не запускается: {e}")
+                        continue
+                    async with self._condition:
+                        self._browsers[slot] = fresh
+                        self._condition.notify_all()
+                    continue
+
+                if not pooled.retiring and self.max_memory_mb:
+                    memory = await pooled.memory_mb()
+                    if memory is not None and memory > self.max_memory_mb:
+                        print(f"[WARN] Браузер #{slot} занимает {memory:.0f} МБ, отправляем на перезапуск")
+                        pooled.retiring = True
+
+                if self._needs_recycle(pooled):
+                    pooled.retiring = True
+                if pooled.retiring and pooled.leases == 0:
+                    await self._replace(pooled)
+
+    def stats(self) -> Dict:
+        """Состояние пула для /health"""
+        alive = [b for b in self._browsers if b]
+        return {
+            "size": self.size,
+            "alive": len(alive),
+            "leased": sum(b.leases for b in alive),
+            "capacity": self.size * self.max_leases_per_browser,
+            "launches": self.launches,
+            "recycled": self.recycled,
+            "browsers": [
+                {
+                    "slot": b.slot,
+                    "leases": b.leases,
+                    "pages_served": b.pages_served,
+                    "retiring": b.retiring,
+                    "uptime_s": round(time() - b.started_at, 1),
+                }
+                for b in alive
+            ],
+        }
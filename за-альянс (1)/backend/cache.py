@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Dict, Optional, Tuple
+
+
+class MangaCache:
+    """
+    Двухуровневый кеш метаданных манги.
+    Память: LRU с ограничением по числу записей и примерному объёму.
+    Диск: SQLite, переживает перезапуск воркера (и reload при разработке)
+    и общий для всех воркеров на машине.
+    У каждой записи свой TTL.
+    Из async-кода диск вызывается через aget/aset/adelete (в потоке), чтобы
+    сериализация и запись в SQLite не блокировали цикл событий.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = 200,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_s: float = 6 * 3600,
+        disk_max_entries: int = 20000,
+        memory_ttl_s: Optional[float] = None,
+        trim_every: int = 100,
+        touch_batch: int = 100,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        # Сколько запись живёт в памяти процесса (при нескольких воркерах — недолго, чтобы видеть чужие записи)
+        self.memory_ttl_s = memory_ttl_s
+        self.disk_max_entries = disk_max_entries
+        # Подрезка диска раз в trim_every записей; время доступа пишется пачками по touch_batch
+        self.trim_every = max(1, trim_every)
+        self.touch_batch = max(1, touch_batch)
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+
+        self._memory: "OrderedDict[str, Tuple[Dict, float, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.stats_counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS manga_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def count(self, exclude_prefix: Optional[str] = None) -> int:
+        """Записи в памяти, кроме ключей с заданным префиксом (например, глав)"""
+        with self._lock:
+            if not exclude_prefix:
+                return len(self._memory)
+            return sum(1 for key in self._memory if not key.startswith(exclude_prefix))
+
+    def _memory_get(self, key: str, now: float) -> Optional[Dict]:
+        entry = self._memory.get(key)
+        if not entry:
+            return None
+        value, expires_at, size = entry
+        if expires_at > now:
+            self._memory.move_to_end(key)
+            self.stats_counters["hits"] += 1
+            self.stats_counters["memory_hits"] += 1
+            return value
+        self._drop(key)
+        self.stats_counters["expired"] += 1
+        return None
+
+    def _disk_get(self, key: str) -> Optional[Dict]:
+        now = time()
+        with self._lock:
+            value = self._memory_get(key, now)  # пока ждали поток, запись могла появиться в памяти
+            if value is not None:
+                return value
+            row = self._db.execute(
+                "SELECT value, expires_at FROM manga_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                self.stats_counters["misses"] += 1
+                return None
+            raw, expires_at = row
+            if expires_at <= now:
+                self._db.execute("DELETE FROM manga_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self.stats_counters["expired"] += 1
+                self.stats_counters["misses"] += 1
+                return None
+
+            # Время доступа нужно только для вытеснения — пишем его пачкой, а не коммитом на каждое чтение
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touches()
+                self._db.commit()
+            value = json.loads(raw)
+            self._put_memory(key, value, expires_at, len(raw))
+            self.stats_counters["hits"] += 1
+            self.stats_counters["disk_hits"] += 1
+            return value
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Ищем в памяти, затем на диске; просроченные записи считаются промахом"""
+        with self._lock:
+            value = self._memory_get(key, time())
+        return value if value is not None else self._disk_get(key)
+
+    async def aget(self, key: str) -> Optional[Dict]:
+        """get для async-кода: память — сразу, диск — в потоке"""
+        with self._lock:
+            value = self._memory_get(key, time())
+        return value if value is not None else await asyncio.to_thread(self._disk_get, key)
+
+    def set(self, key: str, value: Dict, ttl_s: Optional[float] = None):
+        """Сохраняем в оба уровня"""
+        now = time()
+        expires_at = now + (ttl_s if ttl_s is not None else self.ttl_s)
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._put_memory(key, value, expires_at, len(raw))
+            self._db.execute(
+                "INSERT OR REPLACE INTO manga_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, raw, expires_at, now),
+            )
+            self._touched.pop(key, None)
+            self._writes += 1
+            if self._writes % self.trim_every == 0:
+                self._flush_touches()
+                self._trim_disk()
+            self._db.commit()
+
+    async def aset(self, key: str, value: Dict, ttl_s: Optional[float] = None):
+        await asyncio.to_thread(self.set, key, value, ttl_s)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._drop(key)
+            self._touched.pop(key, None)
+            self._db.execute("DELETE FROM manga_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    async def adelete(self, key: str):
+        await asyncio.to_thread(self.delete, key)
+
+    def _flush_touches(self):
+        self._db.executemany(
+            "UPDATE manga_cache SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _put_memory(self, key: str, value: Dict, expires_at: float, size: int):
+        if self.memory_ttl_s is not None:
+            expires_at = min(expires_at, time() + self.memory_ttl_s)
+        self._drop(key)
+        self._memory[key] = (value, expires_at, size)
+        self._memory_bytes += size
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            oldest = next(iter(self._memory))
+            if oldest == key and len(self._memory) == 1:
+                break  # одна запись больше бюджета — держим её, пока не придёт следующая
+            self._drop(oldest)
+            self.stats_counters["evictions"] += 1
+
+    def _drop(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry:
+            self._memory_bytes -= entry[2]
+
+    def _trim_disk(self):
+        count = self._db.execute("SELECT COUNT(*) FROM manga_cache").fetchone()[0]
+        overflow = count - self.disk_max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM manga_cache WHERE key IN (SELECT key FROM manga_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.stats_counters["evictions"] += overflow
+
+    def stats(self) -> Dict:
+        with self._lock:
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM manga_cache").fetchone()[0]
+        lookups = self.stats_counters["hits"] + self.stats_counters["misses"]
+        return {
+            **self.stats_counters,
+            "hit_rate": round(self.stats_counters["hits"] / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": disk_entries,
+        }
@@ -0,0 +1,405 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from catalog_search import SearchIndex
+
+# Версия схемы поискового индекса: при смене индекс перестраивается по таблице titles
+SEARCH_INDEX_VERSION = 2
+# Поля тайтла и главы, у которых есть свои колонки; остальное хранится в extra (JSON)
+TITLE_COLUMNS = ("manga_id", "title", "source_url", "description", "cover_url", "local_cover_path", "total_chapters")
+TITLE_JSON_COLUMNS = ("alternative_titles", "genres", "additional_info")
+CHAPTER_COLUMNS = ("chapter_id", "name", "url", "total_pages", "download_status")
+CHAPTER_LIST_FIELDS = ("pages", "page_hashes")
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class CatalogStore:
+    """
+    Индекс каталога в SQLite вместо manga/<title>/manga_info.json: тайтлы, главы
+    и страницы в отдельных таблицах с индексами по manga_id, chapter_id,
+    URL источника и времени обновления. Тайтл целиком пишется одной транзакцией.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS titles (
+                manga_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                source_url TEXT NOT NULL,
+                description TEXT NOT NULL DEFAULT '',
+                cover_url TEXT,
+                local_cover_path TEXT,
+                alternative_titles TEXT NOT NULL DEFAULT '{}',
+                genres TEXT NOT NULL DEFAULT '[]',
+                additional_info TEXT NOT NULL DEFAULT '{}',
+                total_chapters INTEGER NOT NULL DEFAULT 0,
+                chapters_resolved INTEGER NOT NULL DEFAULT 1,
+                extra TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS titles_source_url ON titles (source_url);
+            CREATE INDEX IF NOT EXISTS titles_updated_at ON titles (updated_at);
+            CREATE TABLE IF NOT EXISTS chapters (
+                manga_id TEXT NOT NULL REFERENCES titles (manga_id) ON DELETE CASCADE,
+                chapter_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                url TEXT NOT NULL,
+                total_pages INTEGER NOT NULL DEFAULT 0,
+                download_status TEXT NOT NULL,
+                extra TEXT,
+                PRIMARY KEY (manga_id, chapter_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS chapters_url ON chapters (url);
+            CREATE TABLE IF NOT EXISTS pages (
+                manga_id TEXT NOT NULL,
+                chapter_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                digest TEXT,
+                PRIMARY KEY (manga_id, chapter_id, position),
+                FOREIGN KEY (manga_id, chapter_id) REFERENCES chapters (manga_id, chapter_id) ON DELETE CASCADE
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self.search_index = SearchIndex(self._db)
+        self._db.commit()
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < SEARCH_INDEX_VERSION:
+            self.reindex()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- запись ---
+
+    def _write_title(self, manga_info: Dict, now: float):
+        extra = {
+            key: value for key, value in manga_info.items()
+            if key not in TITLE_COLUMNS + TITLE_JSON_COLUMNS + ("chapters", "chapters_resolved")
+        }
+        manga_id = manga_info["manga_id"]
+        # Тот же URL мог быть сохранён под другим id (старый импорт) — запись по URL одна
+        stale = [row[0] for row in self._db.execute(
+            "SELECT manga_id FROM titles WHERE source_url = ? AND manga_id != ?", (manga_info["source_url"], manga_id)
+        )]
+        self.search_index.unindex(stale)
+        self._db.execute("DELETE FROM titles WHERE source_url = ? AND manga_id != ?", (manga_info["source_url"], manga_id))
+        self._db.execute("DELETE FROM chapters WHERE manga_id = ?", (manga_id,))
+        self._db.execute(
+            """
+            INSERT INTO titles (
+                manga_id, title, source_url, description, cover_url, local_cover_path,
+                alternative_titles, genres, additional_info, total_chapters, chapters_resolved,
+                extra, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (manga_id) DO UPDATE SET
+                title = excluded.title, source_url = excluded.source_url, description = excluded.description,
+                cover_url = excluded.cover_url, local_cover_path = excluded.local_cover_path,
+                alternative_titles = excluded.alternative_titles, genres = excluded.genres,
+                additional_info = excluded.additional_info, total_chapters = excluded.total_chapters,
+                chapters_resolved = excluded.chapters_resolved, extra = excluded.extra,
+                updated_at = excluded.updated_at
+            """,
+            (
+                manga_id,
+                manga_info.get("title", ""),
+                manga_info["source_url"],
+                manga_info.get("description", ""),
+                manga_info.get("cover_url"),
+                manga_info.get("local_cover_path"),
+                _dumps(manga_info.get("alternative_titles") or {}),
+                _dumps(manga_info.get("genres") or []),
+                _dumps(manga_info.get("additional_info") or {}),
+                manga_info.get("total_chapters", len(manga_info.get("chapters", []))),
+                int(manga_info.get("chapters_resolved", True)),
+                _dumps(extra),
+                now,
+                now,
+            ),
+        )
+
+        chapter_rows, page_rows = [], []
+        for position, chapter in enumerate(manga_info.get("chapters", [])):
+            chapter_id = str(chapter["chapter_id"])
+            extra = {
+                key: value for key, value in chapter.items()
+                if key not in CHAPTER_COLUMNS + CHAPTER_LIST_FIELDS
+            }
+            chapter_rows.append((
+                manga_id, chapter_id, position, chapter.get("name", ""), chapter.get("url", ""),
+                chapter.get("total_pages", 0), chapter.get("download_status", "not_loaded"),
+                _dumps(extra) if extra else None,
+            ))
+            hashes = chapter.get("page_hashes") or []
+            for index, page_url in enumerate(chapter.get("pages") or []):
+                page_rows.append((manga_id, chapter_id, index, page_url, hashes[index] if index < len(hashes) else None))
+        self._db.executemany(
+            "INSERT OR REPLACE INTO chapters (manga_id, chapter_id, position, name, url, total_pages, download_status, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            chapter_rows,
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO pages (manga_id, chapter_id, position, url, digest) VALUES (?, ?, ?, ?, ?)",
+            page_rows,
+        )
+        self.search_index.index(manga_info)
+
+    def save(self, manga_info: Dict, overwrite_resolved: bool = True, updated_at: Optional[float] = None) -> bool:
+        """
+        Тайтл со всеми главами и страницами — одной транзакцией.
+        overwrite_resolved=False: ленивый список глав не затирает уже разобранный тайтл.
+        """
+        with self._lock:
+            try:
+                if not overwrite_resolved and not manga_info.get("chapters_resolved", True):
+                    row = self._db.execute(
+                        "SELECT chapters_resolved FROM titles WHERE manga_id = ?", (manga_info["manga_id"],)
+                    ).fetchone()
+                    if row and row[0]:
+                        return False
+                self._write_title(manga_info, updated_at or time())
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return True
+
+    def delete(self, manga_id: str):
+        with self._lock:
+            try:
+                self.search_index.unindex([manga_id])
+                self._db.execute("DELETE FROM titles WHERE manga_id = ?", (manga_id,))
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def reindex(self) -> int:
+        """Полная перестройка поискового индекса и фасетов (при обновлении схемы)"""
+        with self._lock:
+            try:
+                self._db.execute("DELETE FROM title_terms")
+                self._db.execute("DELETE FROM title_grams")
+                self._db.execute("DELETE FROM title_facets")
+                self._db.execute("DELETE FROM facet_counts")
+                rows = self._db.execute(
+                    "SELECT manga_id, title, alternative_titles, genres, additional_info FROM titles"
+                ).fetchall()
+                for manga_id, title, alternative_titles, genres, additional_info in rows:
+                    self.search_index.index({
+                        "manga_id": manga_id,
+                        "title": title,
+                        "alternative_titles": json.loads(alternative_titles),
+                        "genres": json.loads(genres),
+                        "additional_info": json.loads(additional_info),
+                    })
+                self._db.execute(f"PRAGMA user_version = {SEARCH_INDEX_VERSION}")
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        if rows:
+            print(f"🔎 Поисковый индекс каталога перестроен: {len(rows)} тайтлов")
+        return len(rows)
+
+    # --- чтение ---
+
+    def _pages(self, manga_id: str, chapter_id: Optional[str] = None) -> Dict[str, Tuple[List[str], List[Optional[str]]]]:
+        query = "SELECT chapter_id, url, digest FROM pages WHERE manga_id = ?"
+        params: Tuple = (manga_id,)
+        if chapter_id is not None:
+            query += " AND chapter_id = ?"
+            params += (chapter_id,)
+        pages: Dict[str, Tuple[List[str], List[Optional[str]]]] = {}
+        for ch_id, url, digest in self._db.execute(query + " ORDER BY chapter_id, position", params):
+            urls, hashes = pages.setdefault(ch_id, ([], []))
+            urls.append(url)
+            hashes.append(digest)
+        return pages
+
+    @staticmethod
+    def _chapter(row: Tuple, pages: Tuple[List[str], List[Optional[str]]]) -> Dict:
+        chapter_id, name, url, total_pages, status, extra = row
+        urls, hashes = pages
+        chapter = {
+            "chapter_id": chapter_id,
+            "name": name,
+            "url": url,
+            "total_pages": total_pages,
+            "pages": urls,
+            "download_status": status,
+        }
+        if hashes and all(hashes):
+            chapter["page_hashes"] = hashes
+        if extra:
+            chapter.update(json.loads(extra))
+        return chapter
+
+    def get(self, manga_id: str, max_age_s: Optional[float] = None) -> Optional[Dict]:
+        """Тайтл в том же виде, что отдаёт /manga (max_age_s — только достаточно свежий)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT manga_id, title, source_url, description, cover_url, local_cover_path, alternative_titles, "
+                "genres, additional_info, total_chapters, chapters_resolved, extra, updated_at "
+                "FROM titles WHERE manga_id = ?",
+                (manga_id,),
+            ).fetchone()
+            if not row or (max_age_s is not None and row[12] < time() - max_age_s):
+                return None
+            pages = self._pages(manga_id)
+            chapters = [
+                self._chapter(chapter, pages.get(chapter[0], ([], [])))
+                for chapter in self._db.execute(
+                    "SELECT chapter_id, name, url, total_pages, download_status, extra "
+                    "FROM chapters WHERE manga_id = ? ORDER BY position",
+                    (manga_id,),
+                )
+            ]
+        info = json.loads(row[11])
+        info.update({
+            "manga_id": row[0],
+            "title": row[1],
+            "source_url": row[2],
+            "description": row[3],
+            "cover_url": row[4],
+            "local_cover_path": row[5],
+            "alternative_titles": json.loads(row[6]),
+            "genres": json.loads(row[7]),
+            "additional_info": json.loads(row[8]),
+            "total_chapters": row[9],
+            "chapters_resolved": bool(row[10]),
+            "chapters": chapters,
+        })
+        return info
+
+    def get_by_url(self, source_url: str, max_age_s: Optional[float] = None) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT manga_id FROM titles WHERE source_url = ?", (source_url,)).fetchone()
+        return self.get(row[0], max_age_s) if row else None
+
+    def get_chapter(self, manga_id: str, chapter_id: str) -> Optional[Dict]:
+        """Глава по ключу (manga_id, chapter_id) без чтения всего тайтла; title — для папки тайтла"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT c.chapter_id, c.name, c.url, c.total_pages, c.download_status, c.extra, t.title "
+                "FROM chapters c JOIN titles t ON t.manga_id = c.manga_id "
+                "WHERE c.manga_id = ? AND c.chapter_id = ?",
+                (manga_id, chapter_id),
+            ).fetchone()
+            if not row:
+                return None
+            pages = self._pages(manga_id, chapter_id)
+        chapter = self._chapter(row[:6], pages.get(chapter_id, ([], [])))
+        chapter["title"] = row[6]
+        return chapter
+
+    def find_chapter_by_url(self, chapter_url: str) -> Optional[Tuple[str, str]]:
+        """(manga_id, chapter_id) главы по её адресу у источника"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT manga_id, chapter_id FROM chapters WHERE url = ? LIMIT 1", (chapter_url,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def list_titles(self, updated_since: Optional[float] = None, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Краткие записи тайтлов, новые обновления первыми (без глав)"""
+        query = (
+            "SELECT manga_id, title, source_url, cover_url, local_cover_path, genres, total_chapters, updated_at "
+            "FROM titles"
+        )
+        params: Tuple = ()
+        if updated_since is not None:
+            query += " WHERE updated_at > ?"
+            params = (updated_since,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY updated_at DESC LIMIT ? OFFSET ?", params + (limit, offset)).fetchall()
+        return [
+            {
+                "manga_id": row[0],
+                "title": row[1],
+                "source_url": row[2],
+                "cover_url": row[3],
+                "local_cover_path": row[4],
+                "genres": json.loads(row[5]),
+                "total_chapters": row[6],
+                "updated_at": row[7],
+            }
+            for row in rows
+        ]
+
+    def search(self, query: str = "", **filters) -> Dict:
+        """Поиск и фильтры каталога (см. SearchIndex.search)"""
+        with self._lock:
+            return self.search_index.search(query, **filters)
+
+    # --- импорт ---
+
+    def import_json(self, root: str, once: bool = False) -> int:
+        """
+        Переносим старые manga/<title>/manga_info.json в индекс.
+        Файл пропускается, если в индексе уже есть запись не старше файла.
+        once=True (при старте сервера): перенос делается один раз, дальше JSON —
+        только экспорт, и свои же файлы не перезаписывают каталог на каждом запуске.
+        """
+        imported = 0
+        if once:
+            with self._lock:
+                if self._db.execute("SELECT 1 FROM meta WHERE key = 'json_imported_at'").fetchone():
+                    return 0
+        for name in os.listdir(root) if os.path.isdir(root) else []:
+            path = os.path.join(root, name, "manga_info.json")
+            if not os.path.isfile(path):
+                continue
+            try:
+                mtime = os.path.getmtime(path)
+                with open(path, encoding="utf-8") as f:
+                    info = json.load(f)
+                if not info.get("manga_id") or not info.get("source_url"):
+                    continue
+                with self._lock:
+                    row = self._db.execute(
+                        "SELECT updated_at FROM titles WHERE manga_id = ?", (info["manga_id"],)
+                    ).fetchone()
+                if row and row[0] >= mtime:
+                    continue
+                self.save(info, updated_at=mtime)
+                imported += 1
+            except Exception as e:
+                print(f"[WARN] Не удалось импортировать {path} в каталог: {e}")
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported_at', ?)", (str(time()),)
+            )
+        return imported
+
+    def stats(self) -> Dict:
+        with self._lock:
+            titles, last_update = self._db.execute("SELECT COUNT(*), MAX(updated_at) FROM titles").fetchone()
+            chapters = self._db.execute("SELECT COUNT(*) FROM chapters").fetchone()[0]
+        return {"titles": titles, "chapters": chapters, "last_update": last_update}
+
+
+if __name__ == "__main__":
+    # python catalog.py [папка manga] [файл индекса] — разовый перенос JSON в индекс
+    root = sys.argv[1] if len(sys.argv) > 1 else "manga"
+    store = CatalogStore(sys.argv[2] if len(sys.argv) > 2 else os.path.join(root, "_catalog.sqlite"))
+    print(f"📚 Импортировано тайтлов: {store.import_json(root)}, в индексе: {store.stats()['titles']}")
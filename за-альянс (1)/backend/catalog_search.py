@@ -0,0 +1,285 @@
+import json
+import re
+import sqlite3
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Вес совпадения по основному названию и по альтернативным
+TITLE_WEIGHT = 3
+ALT_TITLE_WEIGHT = 2
+# Нечёткий поиск: доля общих триграмм запроса и кандидатов в выдаче
+FUZZY_MIN_SIMILARITY = 0.45
+FUZZY_MAX_CANDIDATES = 500
+# Фасеты тайтла: жанры и поля additional_info
+FACETS = ("genre", "status", "year")
+SORTS = {
+    "updated": "t.updated_at DESC",
+    "title": "t.title COLLATE NOCASE ASC",
+    "year": "year DESC, t.updated_at DESC",
+    "chapters": "t.total_chapters DESC, t.updated_at DESC",
+}
+
+WORD_RE = re.compile(r"\w+")
+# Год выпуска: первое четырёхзначное число («2019–2021» -> 2019)
+YEAR_RE = re.compile(r"\b(\d{4})\b")
+# Верхняя граница диапазона для поиска по префиксу: term >= prefix AND term < prefix + PREFIX_END
+PREFIX_END = "\U0010ffff"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS title_terms (
+        term TEXT NOT NULL,
+        manga_id TEXT NOT NULL,
+        weight INTEGER NOT NULL,
+        PRIMARY KEY (term, manga_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS title_terms_manga ON title_terms (manga_id);
+    CREATE TABLE IF NOT EXISTS title_grams (
+        gram TEXT NOT NULL,
+        manga_id TEXT NOT NULL,
+        PRIMARY KEY (gram, manga_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS title_grams_manga ON title_grams (manga_id);
+    CREATE TABLE IF NOT EXISTS title_facets (
+        facet TEXT NOT NULL,
+        value TEXT NOT NULL,
+        manga_id TEXT NOT NULL,
+        PRIMARY KEY (facet, value, manga_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS title_facets_manga ON title_facets (manga_id, facet);
+    CREATE TABLE IF NOT EXISTS facet_counts (
+        facet TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (facet, value)
+    ) WITHOUT ROWID;
+"""
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр, без диакритики, ё -> е"""
+    text = unicodedata.normalize("NFKD", str(text).lower().replace("ё", "е"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def words(text: str) -> List[str]:
+    return WORD_RE.findall(normalize(text))
+
+
+def trigrams(word: str) -> Set[str]:
+    """Триграммы слова с пробелами по краям (как в pg_trgm): начало слова весит больше"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def parse_year(value) -> Optional[int]:
+    """Год из поля сайта; None, если числа в нём нет"""
+    match = YEAR_RE.search(str(value or ""))
+    return int(match.group(1)) if match else None
+
+
+def facet_values(manga_info: Dict) -> List[Tuple[str, str]]:
+    info = manga_info.get("additional_info") or {}
+    values = [("genre", genre.strip()) for genre in manga_info.get("genres") or [] if genre and genre.strip()]
+    if info.get("status"):
+        values.append(("status", str(info["status"])))
+    year = parse_year(info.get("year"))
+    if year is not None:
+        values.append(("year", str(year)))
+    return list(dict.fromkeys(values))
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс названий (слова и триграммы) и фасеты каталога
+    в таблицах индекса каталога. Обновляется в транзакции записи тайтла,
+    поэтому общие счётчики фасетов всегда совпадают с содержимым каталога.
+    """
+
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+        self._db.executescript(SCHEMA)
+
+    def unindex(self, manga_ids: Iterable[str]):
+        for manga_id in manga_ids:
+            for facet, value in self._db.execute(
+                "SELECT facet, value FROM title_facets WHERE manga_id = ?", (manga_id,)
+            ).fetchall():
+                self._db.execute(
+                    "UPDATE facet_counts SET count = count - 1 WHERE facet = ? AND value = ?", (facet, value)
+                )
+            self._db.execute("DELETE FROM title_facets WHERE manga_id = ?", (manga_id,))
+            self._db.execute("DELETE FROM title_terms WHERE manga_id = ?", (manga_id,))
+            self._db.execute("DELETE FROM title_grams WHERE manga_id = ?", (manga_id,))
+        self._db.execute("DELETE FROM facet_counts WHERE count <= 0")
+
+    def index(self, manga_info: Dict):
+        """Переиндексация тайтла: старые записи убираются, новые добавляются"""
+        manga_id = manga_info["manga_id"]
+        self.unindex([manga_id])
+
+        terms: Dict[str, int] = {}
+        for word in words(manga_info.get("title", "")):
+            terms[word] = TITLE_WEIGHT
+        for alt in (manga_info.get("alternative_titles") or {}).values():
+            for word in words(alt or ""):
+                terms.setdefault(word, ALT_TITLE_WEIGHT)
+        grams = set().union(*(trigrams(word) for word in terms)) if terms else set()
+
+        self._db.executemany(
+            "INSERT INTO title_terms (term, manga_id, weight) VALUES (?, ?, ?)",
+            [(term, manga_id, weight) for term, weight in terms.items()],
+        )
+        self._db.executemany(
+            "INSERT INTO title_grams (gram, manga_id) VALUES (?, ?)", [(gram, manga_id) for gram in grams]
+        )
+        facets = facet_values(manga_info)
+        self._db.executemany(
+            "INSERT INTO title_facets (facet, value, manga_id) VALUES (?, ?, ?)",
+            [(facet, value, manga_id) for facet, value in facets],
+        )
+        self._db.executemany(
+            "INSERT INTO facet_counts (facet, value, count) VALUES (?, ?, 1) "
+            "ON CONFLICT (facet, value) DO UPDATE SET count = count + 1",
+            facets,
+        )
+
+    def _fuzzy_candidates(self, query_words: List[str]) -> Dict[str, float]:
+        """manga_id -> доля триграмм запроса, найденных в названиях тайтла"""
+        grams = sorted(set().union(*(trigrams(word) for word in query_words)))
+        if not grams:
+            return {}
+        placeholders = ",".join("?" * len(grams))
+        rows = self._db.execute(
+            f"SELECT manga_id, COUNT(*) AS shared FROM title_grams WHERE gram IN ({placeholders}) "
+            "GROUP BY manga_id HAVING shared >= ? ORDER BY shared DESC LIMIT ?",
+            (*grams, max(1, int(len(grams) * FUZZY_MIN_SIMILARITY)), FUZZY_MAX_CANDIDATES),
+        ).fetchall()
+        return {manga_id: shared / len(grams) for manga_id, shared in rows}
+
+    def search(
+        self,
+        query: str = "",
+        genres: Optional[List[str]] = None,
+        status: Optional[str] = None,
+        year: Optional[int] = None,
+        sort: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        fuzzy: bool = True,
+    ) -> Dict:
+        """
+        Страница каталога: все слова запроса — префиксы слов названия или альтернативных
+        названий; если так ничего не нашлось — нечёткий поиск по триграммам.
+        Фасеты считаются по найденному набору (без фильтров — готовые общие счётчики).
+        """
+        if sort and sort not in SORTS and sort != "relevance":
+            raise ValueError(f"Неизвестная сортировка {sort}, доступны: relevance, {', '.join(SORTS)}")
+        query_words = words(query or "")
+
+        where: List[str] = []
+        params: List = []
+        for facet, value in [("genre", g) for g in genres or []] + [("status", status), ("year", year)]:
+            if value is None or value == "":
+                continue
+            where.append("t.manga_id IN (SELECT manga_id FROM title_facets WHERE facet = ? AND value = ?)")
+            params += [facet, str(value)]
+
+        score_sql, score_params = "0", []
+        used_fuzzy = False
+        if query_words:
+            text_where, text_params = [], []
+            scores = []
+            for word in query_words:
+                text_where.append("t.manga_id IN (SELECT manga_id FROM title_terms WHERE term >= ? AND term < ?)")
+                text_params += [word, word + PREFIX_END]
+                # Точное совпадение слова выше префиксного
+                scores.append(
+                    "(SELECT MAX(weight + (term = ?)) FROM title_terms "
+                    "WHERE manga_id = t.manga_id AND term >= ? AND term < ?)"
+                )
+                score_params += [word, word, word + PREFIX_END]
+            count = self._db.execute(
+                "SELECT COUNT(*) FROM titles t WHERE " + " AND ".join(where + text_where), params + text_params
+            ).fetchone()[0]
+            if count or not fuzzy:
+                where += text_where
+                params += text_params
+                score_sql = " + ".join(scores)
+            else:
+                candidates = self._fuzzy_candidates(query_words)
+                used_fuzzy = True
+                where.append(f"t.manga_id IN ({','.join('?' * len(candidates)) or 'NULL'})")
+                params += list(candidates)
+                if candidates:
+                    score_sql = "CASE t.manga_id " + " ".join("WHEN ? THEN ?" for _ in candidates) + " ELSE 0 END"
+                    score_params = [item for pair in candidates.items() for item in pair]
+
+        where_sql = " WHERE " + " AND ".join(where) if where else ""
+        total = self._db.execute(f"SELECT COUNT(*) FROM titles t{where_sql}", params).fetchone()[0]
+
+        order = SORTS.get(sort or ("relevance" if query_words else "updated"))
+        if order is None:
+            order = "score DESC, t.updated_at DESC"
+        rows = self._db.execute(
+            f"""
+            SELECT t.manga_id, t.title, t.source_url, t.cover_url, t.local_cover_path, t.alternative_titles,
+                   t.genres, t.additional_info, t.total_chapters, t.updated_at,
+                   ({score_sql}) AS score,
+                   (SELECT CAST(value AS INTEGER) FROM title_facets f
+                    WHERE f.manga_id = t.manga_id AND f.facet = 'year') AS year
+            FROM titles t{where_sql}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+            """,
+            score_params + params + [limit, offset],
+        ).fetchall()
+
+        if where:
+            facet_rows = self._db.execute(
+                f"SELECT facet, value, COUNT(*) FROM title_facets "
+                f"WHERE manga_id IN (SELECT t.manga_id FROM titles t{where_sql}) GROUP BY facet, value",
+                params,
+            ).fetchall()
+        else:
+            facet_rows = self._db.execute("SELECT facet, value, count FROM facet_counts").fetchall()
+
+        return {
+            "total": total,
+            "fuzzy": used_fuzzy,
+            "items": [self._item(row) for row in rows],
+            "facets": self._facets(facet_rows),
+        }
+
+    @staticmethod
+    def _item(row: Tuple) -> Dict:
+        return {
+            "manga_id": row[0],
+            "title": row[1],
+            "source_url": row[2],
+            "cover_url": row[3],
+            "local_cover_path": row[4],
+            "alternative_titles": json.loads(row[5]),
+            "genres": json.loads(row[6]),
+            "additional_info": json.loads(row[7]),
+            "total_chapters": row[8],
+            "updated_at": row[9],
+            "score": round(row[10], 3) if row[10] else 0,
+        }
+
+    @staticmethod
+    def _facets(rows: Iterable[Tuple[str, str, int]]) -> Dict[str, List[Dict]]:
+        """{facet: [{value, count}]}: жанры и статусы по убыванию числа тайтлов, годы — по убыванию года"""
+        facets: Dict[str, List[Dict]] = {facet: [] for facet in FACETS}
+        for facet, value, count in rows:
+            if facet == "year":
+                # В индексах, собранных до parse_year, мог остаться нечисловой год
+                value = parse_year(value)
+                if value is None:
+                    continue
+            facets.setdefault(facet, []).append({"value": value, "count": count})
+        for facet, values in facets.items():
+            if facet == "year":
+                values.sort(key=lambda v: -v["value"])
+            else:
+                values.sort(key=lambda v: (-v["count"], v["value"]))
+        return facets
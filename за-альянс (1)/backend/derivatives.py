@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from metrics import stage_seconds
+from singleflight import SingleFlight
+
+# Формат и качество перекодирования (webp, avif, jpeg); AVIF — если Pillow собран с его поддержкой
+DERIVATIVE_FORMAT = os.getenv("DERIVATIVE_FORMAT", "webp").lower()
+DERIVATIVE_QUALITY = int(os.getenv("DERIVATIVE_QUALITY", "80"))
+# Высота тайла для нарезки длинных вебтун-полос в пресете page (0 — не резать)
+DERIVATIVE_TILE_HEIGHT = int(os.getenv("DERIVATIVE_TILE_HEIGHT", "0"))
+# По умолчанию половина ядер, поделённая между воркерами uvicorn
+DERIVATIVE_WORKERS = int(os.getenv(
+    "DERIVATIVE_WORKERS",
+    str(max(1, (os.cpu_count() or 2) // 2 // max(1, int(os.getenv("WORKERS", "1"))))),
+))
+# Сколько хешей исходников вне хранилища блобов помнить (LRU)
+DERIVATIVE_HASH_CACHE = int(os.getenv("DERIVATIVE_HASH_CACHE", "4096"))
+
+# Размеры под компоненты фронта: карточка, слайдер на главной, страница читалки
+PRESETS = {
+    "thumb": {"width": 160, "quality": 70},
+    "card": {"width": 320, "quality": 75},
+    "hero": {"width": 1280, "quality": DERIVATIVE_QUALITY},
+    "page": {"width": 1080, "quality": DERIVATIVE_QUALITY, "tile_height": DERIVATIVE_TILE_HEIGHT},
+}
+FORMATS = ("webp", "avif", "jpeg")
+# WebP не умеет стороны больше 16383 px — без нарезки такие полосы уменьшаются
+MAX_SIDE = {"webp": 16383, "avif": 65535, "jpeg": 65500}
+SAVE_OPTIONS = {
+    "webp": lambda q: {"quality": q, "method": 4},
+    "avif": lambda q: {"quality": q, "speed": 6},
+    "jpeg": lambda q: {"quality": q, "optimize": True, "progressive": True},
+}
+
+
+def _save(image, path: str, fmt: str, quality: int):
+    """Атомарная запись: сначала во временный файл, потом переименование"""
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # несколько воркеров могут рисовать одно и то же
+    image.save(tmp_path, format=fmt.upper(), **SAVE_OPTIONS[fmt](quality))
+    os.replace(tmp_path, path)
+
+
+def render_derivative(source: str, target: str, width: int, height: int, fmt: str, quality: int, tile_height: int) -> Dict:
+    """Уменьшение/перекодирование/нарезка одной картинки (выполняется в отдельном процессе)"""
+    from PIL import Image
+
+    if fmt.upper() not in Image.SAVE:
+        fmt = "webp"  # Pillow без поддержки AVIF
+    with Image.open(source) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if img.mode in ("LA", "P", "PA") or "transparency" in img.info else "RGB")
+        if width or height:
+            # Только уменьшаем, пропорции сохраняются
+            img.thumbnail((width or img.width, height or img.height), Image.LANCZOS)
+
+        files = []
+        if tile_height and img.height > tile_height * 1.5:
+            tile_height = min(tile_height, MAX_SIDE[fmt])
+            for index, top in enumerate(range(0, img.height, tile_height)):
+                tile = img.crop((0, top, img.width, min(top + tile_height, img.height)))
+                path = f"{target}_{index:03d}.{fmt}"
+                _save(tile, path, fmt, quality)
+                files.append(path)
+        else:
+            if max(img.size) > MAX_SIDE[fmt]:
+                img.thumbnail((MAX_SIDE[fmt], MAX_SIDE[fmt]), Image.LANCZOS)
+            path = f"{target}.{fmt}"
+            _save(img, path, fmt, quality)
+            files.append(path)
+        size = img.size
+
+    manifest = {"files": [os.path.basename(f) for f in files], "width": size[0], "height": size[1], "format": fmt}
+    tmp_manifest = f"{target}.json.{os.getpid()}.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, f"{target}.json")
+    return manifest
+
+
+class DerivativeStore:
+    """
+    Производные картинки (миниатюры, перекодированные страницы, тайлы) в пуле процессов.
+    Результат кешируется на диске по хешу исходника и параметрам.
+    """
+
+    def __init__(self, root: str, workers: int = DERIVATIVE_WORKERS, hash_cache: int = DERIVATIVE_HASH_CACHE):
+        self.root = root
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._flights = SingleFlight()
+        # (путь, размер, mtime) -> sha256 для исходников вне хранилища блобов; вызывается из потоков
+        self.hash_cache = hash_cache
+        self._source_hashes: "OrderedDict[Tuple[str, int, float], str]" = OrderedDict()
+        self._hash_lock = threading.Lock()
+        self.stats_counters = {"hits": 0, "rendered": 0, "failed": 0}
+        os.makedirs(root, exist_ok=True)
+
+    def start(self):
+        if self._executor is None:
+            # spawn, а не fork: форк процесса с event loop, потоками и открытыми SQLite небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def params(preset: Optional[str] = None, width: int = 0, height: int = 0, fmt: Optional[str] = None,
+               quality: Optional[int] = None, tile_height: Optional[int] = None) -> Dict:
+        """Параметры пресета с переопределениями из запроса"""
+        if preset and preset not in PRESETS:
+            raise ValueError(f"Неизвестный пресет {preset}, доступны: {', '.join(PRESETS)}")
+        base = PRESETS.get(preset, {})
+        fmt = (fmt or DERIVATIVE_FORMAT).lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат {fmt}, доступны: {', '.join(FORMATS)}")
+        return {
+            "width": width or base.get("width", 0),
+            "height": height or base.get("height", 0),
+            "fmt": fmt,
+            "quality": max(1, min(100, quality or base.get("quality", DERIVATIVE_QUALITY))),
+            "tile_height": base.get("tile_height", 0) if tile_height is None else tile_height,
+        }
+
+    def source_hash(self, source: str) -> str:
+        """Для блобов хеш уже в имени файла, остальное хешируем один раз на версию файла"""
+        name = os.path.splitext(os.path.basename(source))[0]
+        if len(name) == 64 and all(c in "0123456789abcdef" for c in name):
+            return name
+        st = os.stat(source)
+        key = (source, st.st_size, st.st_mtime)
+        with self._hash_lock:
+            digest = self._source_hashes.get(key)
+            if digest is not None:
+                self._source_hashes.move_to_end(key)
+                return digest
+        sha = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._hash_lock:
+            self._source_hashes[key] = digest
+            while len(self._source_hashes) > self.hash_cache:
+                self._source_hashes.popitem(last=False)
+        return digest
+
+    def _target(self, digest: str, params: Dict) -> str:
+        suffix = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+        return os.path.join(self.root, digest[:2], f"{digest}_{suffix}")
+
+    def _load_manifest(self, target: str) -> Optional[Dict]:
+        try:
+            with open(f"{target}.json", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        directory = os.path.dirname(target)
+        manifest["files"] = [os.path.join(directory, name) for name in manifest["files"]]
+        if not all(os.path.exists(path) for path in manifest["files"]):
+            return None
+        return manifest
+
+    async def get(self, source: str, params: Dict) -> Dict:
+        """Манифест производной {files, width, height, format}; отрисовывается один раз"""
+        digest = await asyncio.to_thread(self.source_hash, source)
+        target = self._target(digest, params)
+        manifest = self._load_manifest(target)
+        if manifest:
+            self.stats_counters["hits"] += 1
+            return manifest
+
+        async def render() -> Dict:
+            self.start()
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            loop = asyncio.get_running_loop()
+            try:
+                with stage_seconds.time(stage="derivative", fmt=params["fmt"]):
+                    await loop.run_in_executor(
+                        self._executor, render_derivative, source, target,
+                        params["width"], params["height"], params["fmt"], params["quality"], params["tile_height"],
+                    )
+            except Exception:
+                self.stats_counters["failed"] += 1
+                raise
+            self.stats_counters["rendered"] += 1
+            return self._load_manifest(target)
+
+        return await self._flights.run(target, render)
+
+    def stats(self) -> Dict:
+        return {
+            **self.stats_counters,
+            "workers": self.workers,
+            "inflight": self._flights.inflight(),
+            "source_hashes": len(self._source_hashes),
+        }
@@ -0,0 +1,243 @@
+# Скрипты, которые парсер выполняет на странице тайтла (page.evaluate).
+# Вынесены отдельно, чтобы бенчмарк гонял ровно тот же код на сохранённых HTML.
+
+EXPAND_TAGS_JS = r"""
+() => {
+    // Кнопки «Показать все» / «...» ищем одним проходом по текстовым узлам,
+    // а не чтением textContent у каждого button/span/div
+    const targets = new Set(document.querySelectorAll('[class*="show-more"], [class*="expand"]'));
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        const text = walker.currentNode.nodeValue.trim();
+        if (text === '...' || (text.length < 40 && text.includes('Показать все'))) {
+            const el = walker.currentNode.parentElement;
+            if (el) targets.add(el.closest('button, .badge, span, div') || el);
+        }
+    }
+    targets.forEach(el => {
+        try {
+            el.click();
+        } catch(e) {}
+    });
+    return targets.size;
+}
+"""
+
+MANGA_INFO_JS = r"""
+() => {
+    const started = performance.now();
+    const data = {};
+
+    // Название на русском
+    const titleEl = document.querySelector('h1, [data-testid="title"], .title, .manga-title');
+    data.title = titleEl ? titleEl.textContent.trim() : 'Без названия';
+
+    // Альтернативные названия
+    data.alternative_titles = {};
+
+    // Один проход по текстовым узлам основного блока страницы (без обхода всех div)
+    const root = document.querySelector('main') || document.body;
+    const texts = [];
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT, {
+        acceptNode: node => {
+            const parent = node.parentElement;
+            if (!parent || parent.closest('script, style, noscript, a[href*="/reader/"]')) {
+                return NodeFilter.FILTER_REJECT;
+            }
+            return node.nodeValue.trim() ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_REJECT;
+        }
+    });
+    while (walker.nextNode()) texts.push(walker.currentNode.nodeValue.trim());
+
+    // Значение поля: остаток строки после подписи или следующий текстовый узел
+    const valueAfter = (index, label) => {
+        const rest = texts[index].slice(texts[index].indexOf(label) + label.length).replace(/^[:\s]+/, '').trim();
+        if (rest) return rest;
+        return index + 1 < texts.length ? texts[index + 1] : '';
+    };
+
+    const altLabels = [
+        ['english', ['Английское название:', 'English:']],
+        ['korean', ['Корейское название:', 'Korean:']],
+        ['japanese', ['Японское название:', 'Japanese:']]
+    ];
+
+    // Поиск обложки
+    let coverUrl = null;
+
+    const pictureElement = document.querySelector('picture');
+    if (pictureElement) {
+        const imgInPicture = pictureElement.querySelector('img');
+        if (imgInPicture && imgInPicture.src && !imgInPicture.src.startsWith('data:')) {
+            coverUrl = imgInPicture.src;
+        }
+    }
+
+    if (!coverUrl) {
+        const imgSelectors = [
+            'img[class*="rounded"]',
+            'img[alt*="обложка"]',
+            'img[alt*="cover"]',
+            '.cover img',
+            '.manga-cover img',
+            'div.relative img',
+            '.publication-cover img',
+            'img.w-full'
+        ];
+
+        for (const sel of imgSelectors) {
+            try {
+                const el = document.querySelector(sel);
+                if (el && el.src && 
+                    !el.src.startsWith('data:') && 
+                    !el.src.includes('avatar') && 
+                    !el.src.includes('logo') &&
+                    !el.src.includes('icon')) {
+                    coverUrl = el.src;
+                    break;
+                }
+            } catch(e) {}
+        }
+    }
+
+    if (!coverUrl) {
+        // Картинки страницы тайтла блокируются (ResourceBlocker) и naturalWidth у них 0:
+        // размер берём из атрибутов width/height или из раскладки
+        const isBig = img => {
+            const rect = img.getBoundingClientRect();
+            const width = Math.max(img.naturalWidth, Number(img.getAttribute('width')) || 0, rect.width);
+            const height = Math.max(img.naturalHeight, Number(img.getAttribute('height')) || 0, rect.height);
+            return width > 200 && height > 300;
+        };
+        const imgs = Array.from(document.querySelectorAll('img'));
+        const bigImg = imgs.find(img => 
+            img.src && 
+            !img.src.startsWith('data:') &&
+            !img.src.includes('avatar') &&
+            !img.src.includes('logo') &&
+            isBig(img)
+        );
+        if (bigImg) coverUrl = bigImg.src;
+    }
+
+    data.cover_url = coverUrl;
+
+    // Описание
+    let description = '';
+    const descSelectors = [
+        '.publication-description',
+        '.whitespace-pre-wrap',
+        '.description',
+        '.manga-description',
+        '[class*="description"]',
+        'div.font-light'
+    ];
+
+    for (const sel of descSelectors) {
+        try {
+            const el = document.querySelector(sel);
+            if (el && el.textContent && el.textContent.length > 50) {
+                description = el.textContent.trim();
+                break;
+            }
+        } catch(e) {}
+    }
+
+    data.description = description || 'Описание отсутствует';
+
+    // Собираем ВСЕ теги
+    const allTags = new Set();
+
+    const tagSelectors = [
+        'a .badge.text-wf-yellow',
+        'a .badge',
+        '.badge',
+        '.genre',
+        '.tag',
+        'a[href*="/catalog?genres"]',
+        'a[href*="/catalog?tags"]',
+        '.genres a',
+        '.tags a',
+        '[class*="badge"]:not([class*="show"])'
+    ];
+
+    tagSelectors.forEach(sel => {
+        try {
+            document.querySelectorAll(sel).forEach(el => {
+                let text = el.textContent.trim();
+
+                if (text && 
+                    text.length > 1 && 
+                    text !== '...' && 
+                    !text.includes('Показать все') &&
+                    !text.includes('Скрыть') &&
+                    !text.includes('Свернуть')) {
+
+                    const parentLink = el.closest('a');
+                    if (parentLink && parentLink.href && parentLink.href.includes('/catalog')) {
+                        text = parentLink.textContent.trim();
+                    }
+
+                    if (text && !text.includes('Показать')) {
+                        allTags.add(text);
+                    }
+                }
+            });
+        } catch(e) {}
+    });
+
+    try {
+        document.querySelectorAll('a[href*="/catalog"]').forEach(link => {
+            const badge = link.querySelector('.badge');
+            if (badge) {
+                const text = badge.textContent.trim();
+                if (text && !text.includes('Показать') && text !== '...') {
+                    allTags.add(text);
+                }
+            }
+        });
+    } catch(e) {}
+
+    data.genres = Array.from(allTags);
+
+    // Альтернативные названия и дополнительная информация — по собранным текстам
+    data.additional_info = {};
+
+    const statuses = ['Завершен', 'Продолжается', 'Заморожен'];
+    texts.forEach((text, index) => {
+        if (text.length > 200) return;  // подписи короткие, длинные узлы — описание и т.п.
+
+        altLabels.forEach(([key, labels]) => {
+            const label = labels.find(l => text.includes(l));
+            if (label) {
+                const value = valueAfter(index, label);
+                if (value) data.alternative_titles[key] = value;
+            }
+        });
+
+        if (text.startsWith('Статус')) {
+            const nearby = texts.slice(index, index + 3).join(' ');
+            const status = statuses.find(s => nearby.includes(s));
+            if (status) data.additional_info.status = status;
+        }
+
+        if (text.startsWith('Автор')) {
+            const value = valueAfter(index, 'Автор');
+            if (value) data.additional_info.author = value;
+        }
+
+        if (text.startsWith('Художник')) {
+            const value = valueAfter(index, 'Художник');
+            if (value) data.additional_info.artist = value;
+        }
+
+        if (text.startsWith('Год')) {
+            const yearMatch = texts.slice(index, index + 2).join(' ').match(/\d{4}/);
+            if (yearMatch) data.additional_info.year = parseInt(yearMatch[0]);
+        }
+    });
+
+    data._elapsed_ms = performance.now() - started;
+    return data;
+}
+"""
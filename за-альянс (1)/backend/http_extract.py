@@ -0,0 +1,95 @@
+import json
+import re
+from typing import List, Optional
+
+import aiohttp
+
+IMAGE_EXT_RE = re.compile(r"\.(?:jpg|jpeg|png|webp)", re.IGNORECASE)
+SCRIPT_RE = re.compile(r"<script\b([^>]*)>(.*?)</script>", re.IGNORECASE | re.DOTALL)
+SCRIPT_URL_RE = re.compile(r"""https?://[^"'\s,\]]+\.(?:jpg|jpeg|png|webp)""", re.IGNORECASE)
+NUXT_DATA_ID_RE = re.compile(r"""id=["']__NUXT_DATA__["']""", re.IGNORECASE)
+SKIP_MARKERS = ("avatar", "logo", "icon", "button")
+
+
+def _find_images(obj, depth: int = 0) -> List[str]:
+    """Рекурсивно ищем строки с картинками в данных Nuxt (как findImages в браузере)"""
+    if depth > 10:
+        return []
+    if isinstance(obj, str):
+        return [obj] if IMAGE_EXT_RE.search(obj) else []
+    if isinstance(obj, list):
+        values = obj
+    elif isinstance(obj, dict):
+        values = obj.values()
+    else:
+        return []
+    images = []
+    for value in values:
+        images.extend(_find_images(value, depth + 1))
+    return images
+
+
+def _unescape_js(text: str) -> str:
+    """Nuxt сериализует слэши как \\u002F"""
+    return text.replace("\\u002F", "/").replace("\\/", "/")
+
+
+def _clean(urls: List[str]) -> List[str]:
+    """Убираем дубликаты (с сохранением порядка) и системные иконки"""
+    seen = set()
+    result = []
+    for url in urls:
+        if url in seen or any(marker in url for marker in SKIP_MARKERS):
+            continue
+        seen.add(url)
+        result.append(url)
+    return result
+
+
+def extract_images_from_html(html: str) -> List[str]:
+    """Достаём ссылки на страницы главы из сырого HTML без браузера"""
+    scripts = SCRIPT_RE.findall(html)
+
+    # Nuxt 3: JSON-пейлоад в <script id="__NUXT_DATA__">
+    for attrs, body in scripts:
+        if NUXT_DATA_ID_RE.search(attrs):
+            try:
+                nuxt_images = _clean(_find_images(json.loads(body)))
+            except ValueError:
+                nuxt_images = []
+            if nuxt_images:
+                return nuxt_images
+
+    # Nuxt 2 (window.__NUXT__=...) и прочие скрипты: ищем абсолютные ссылки на картинки
+    images = []
+    for _, body in scripts:
+        if body.strip():
+            images.extend(SCRIPT_URL_RE.findall(_unescape_js(body)))
+    return _clean(images)
+
+
+async def fetch_chapter_images(
+    session: aiohttp.ClientSession,
+    url: str,
+    headers: dict,
+    timeout: float = 15,
+    limiter=None,
+) -> Optional[List[str]]:
+    """Скачиваем страницу читалки одним GET и разбираем её; None, если запрос не удался"""
+    try:
+        if limiter is None:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status != 200:
+                    return None
+                html = await response.text(errors="replace")
+        else:
+            # Окно параллельности хоста (adaptive_limiter) учитывает статус и задержку ответа
+            async with limiter.slot(url) as slot:
+                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    slot.observe(response.status, response.headers.get("Retry-After"))
+                    if response.status != 200:
+                        return None
+                    html = await response.text(errors="replace")
+    except Exception:
+        return None
+    return extract_images_from_html(html)
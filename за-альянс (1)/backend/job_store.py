@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import threading
+from time import time
+from typing import Dict, List, Optional
+
+from jobs import FINISHED_STATES
+
+
+class SharedJobStore:
+    """
+    Снимки задач импорта и их события в общем SQLite-файле: при нескольких
+    воркерах список задач, прогресс, отмена и поток событий работают из любого
+    процесса, а не только из того, где задача выполняется.
+    Отмена чужой задачи — флаг cancel_requested, который владелец проверяет сам.
+    """
+
+    def __init__(self, db_path: str, keep_finished: int = 200):
+        self.keep_finished = keep_finished
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS import_jobs (
+                job_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                status TEXT NOT NULL,
+                snapshot TEXT NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS import_jobs_created ON import_jobs (created_at);
+            CREATE TABLE IF NOT EXISTS import_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+
+    def publish(self, snapshot: Dict, events: List[Dict], owner: str):
+        """Сохраняем снимок задачи и её новые события одной транзакцией"""
+        now = time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO import_jobs (job_id, owner, status, snapshot, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, snapshot = excluded.snapshot, "
+                "updated_at = excluded.updated_at",
+                (
+                    snapshot["job_id"], owner, snapshot["status"], json.dumps(snapshot, ensure_ascii=False),
+                    snapshot.get("created_at") or now, now,
+                ),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO import_events (job_id, seq, event) VALUES (?, ?, ?)",
+                [(snapshot["job_id"], event["seq"], json.dumps(event, ensure_ascii=False)) for event in events],
+            )
+            if snapshot["status"] in FINISHED_STATES:
+                self._trim()
+
+    def _trim(self):
+        placeholders = ",".join("?" * len(FINISHED_STATES))
+        stale = [row[0] for row in self._db.execute(
+            f"SELECT job_id FROM import_jobs WHERE status IN ({placeholders}) ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+            (*FINISHED_STATES, self.keep_finished),
+        )]
+        self._db.executemany("DELETE FROM import_jobs WHERE job_id = ?", [(job_id,) for job_id in stale])
+        self._db.executemany("DELETE FROM import_events WHERE job_id = ?", [(job_id,) for job_id in stale])
+
+    @staticmethod
+    def _snapshot(row) -> Dict:
+        snapshot = json.loads(row[0])
+        snapshot["owner"] = row[1]
+        snapshot["cancel_requested"] = bool(row[2])
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT snapshot, owner, cancel_requested FROM import_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._snapshot(row) if row else None
+
+    def list(self, limit: int = 200) -> List[Dict]:
+        """Задачи всех воркеров, новые первыми"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT snapshot, owner, cancel_requested FROM import_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._snapshot(row) for row in rows]
+
+    def request_cancel(self, job_id: str) -> Optional[Dict]:
+        """Просим владельца отменить задачу; завершённые задачи не меняются"""
+        placeholders = ",".join("?" * len(FINISHED_STATES))
+        with self._lock, self._db:
+            self._db.execute(
+                f"UPDATE import_jobs SET cancel_requested = 1 WHERE job_id = ? AND status NOT IN ({placeholders})",
+                (job_id, *FINISHED_STATES),
+            )
+        return self.get(job_id)
+
+    def cancel_requests(self, job_ids: List[str]) -> List[str]:
+        """Какие из задач этого воркера просили отменить из других процессов"""
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT job_id FROM import_jobs WHERE cancel_requested = 1 AND job_id IN ({placeholders})", job_ids
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def events(self, job_id: str, since: int = 0) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT event FROM import_events WHERE job_id = ? AND seq >= ? ORDER BY seq", (job_id, since)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
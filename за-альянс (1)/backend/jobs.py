@@ -0,0 +1,203 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from time import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class ImportJob:
+    """Задача импорта тайтла: прогресс, ошибки и поток событий для админки"""
+
+    def __init__(self, url: str, max_chapters: Optional[int] = None, download_images: bool = True):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.max_chapters = max_chapters
+        self.download_images = download_images
+        self.status = JOB_QUEUED
+        self.created_at = time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.title: Optional[str] = None
+        self.manga_id: Optional[str] = None
+        self.chapters_total = 0
+        self.chapters_done = 0
+        self.pages_downloaded = 0
+        self.errors: List[Dict] = []
+        self.events: List[Dict] = []
+        self.task: Optional[asyncio.Task] = None
+        # Вызывается на каждое событие (например, публикация снимка для других воркеров)
+        self.on_event: Optional[Callable[["ImportJob"], None]] = None
+        # Что из состояния уже опубликовано для других воркеров
+        self.published_events = 0
+        self.published_status: Optional[str] = None
+        self._changed = asyncio.Event()
+
+    def emit(self, event_type: str, **data):
+        """Добавляем структурированное событие прогресса"""
+        self.events.append({"seq": len(self.events), "type": event_type, "ts": time(), **data})
+        self._changed.set()
+        if self.on_event:
+            try:
+                self.on_event(self)
+            except Exception as e:
+                print(f"[WARN] Не удалось опубликовать состояние задачи {self.id}: {e}")
+
+    async def wait_for_events(self, since: int, timeout: float = 15.0) -> List[Dict]:
+        """Ждём новых событий после since (или конца задачи)"""
+        if len(self.events) <= since and self.status not in FINISHED_STATES:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.events[since:]
+
+    def start(self, chapters_total: int):
+        self.chapters_total = chapters_total
+        self.emit("started", chapters_total=chapters_total, title=self.title)
+
+    def chapter_done(self, chapter: Dict):
+        self.chapters_done += 1
+        if chapter.get("download_status") in ("completed", "partial"):
+            self.pages_downloaded += len(chapter.get("pages", []))
+        if chapter.get("download_status") in ("error", "partial", "failed"):
+            self.errors.append({
+                "chapter_id": chapter.get("chapter_id"),
+                "name": chapter.get("name"),
+                "error": chapter.get("error"),
+            })
+        self.emit(
+            "chapter_done",
+            chapter_id=chapter.get("chapter_id"),
+            name=chapter.get("name"),
+            pages=chapter.get("total_pages", 0),
+            status=chapter.get("download_status"),
+            chapters_done=self.chapters_done,
+            chapters_total=self.chapters_total,
+        )
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.finished_at = time()
+        if error:
+            self.errors.append({"error": error})
+        self.emit(status, error=error)
+
+    def eta_s(self) -> Optional[float]:
+        if self.status != JOB_RUNNING or not self.started_at or not self.chapters_done:
+            return None
+        elapsed = time() - self.started_at
+        remaining = self.chapters_total - self.chapters_done
+        return round(elapsed / self.chapters_done * remaining, 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "url": self.url,
+            "manga_id": self.manga_id,
+            "title": self.title,
+            "status": self.status,
+            "chapters_total": self.chapters_total,
+            "chapters_done": self.chapters_done,
+            "pages_downloaded": self.pages_downloaded,
+            "errors": self.errors,
+            "eta_s": self.eta_s(),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+JobRunner = Callable[[ImportJob], Awaitable[None]]
+
+
+class ImportQueue:
+    """Очередь задач импорта с фиксированным числом фоновых воркеров"""
+
+    def __init__(
+        self,
+        runner: JobRunner,
+        workers: int = 2,
+        keep_finished: int = 200,
+        on_event: Optional[Callable[[ImportJob], None]] = None,
+    ):
+        self.runner = runner
+        self.on_event = on_event
+        self.workers = max(1, workers)
+        self.keep_finished = keep_finished
+        self.jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._queue: "asyncio.Queue[ImportJob]" = asyncio.Queue()
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for job in self.jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+    def submit(self, url: str, max_chapters: Optional[int] = None, download_images: bool = True) -> ImportJob:
+        job = ImportJob(url, max_chapters, download_images)
+        job.on_event = self.on_event
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        job.emit(JOB_QUEUED, position=self._queue.qsize())
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[ImportJob]:
+        job = self.jobs.get(job_id)
+        if not job or job.status in FINISHED_STATES:
+            return job
+        if job.task and not job.task.done():
+            job.task.cancel()
+        else:
+            job.finish(JOB_CANCELLED)  # ещё в очереди — воркер её пропустит
+        return job
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != JOB_QUEUED:
+                    continue
+                job.status = JOB_RUNNING
+                job.started_at = time()
+                job.task = asyncio.create_task(self.runner(job))
+                try:
+                    await job.task
+                    job.finish(JOB_COMPLETED)
+                except asyncio.CancelledError:
+                    if not job.task.cancelled():
+                        raise  # остановка самого воркера
+                    job.finish(JOB_CANCELLED)
+                except Exception as e:
+                    print(f"[ERROR] Импорт {job.url} завершился ошибкой: {e}")
+                    job.finish(JOB_FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"queued": self._queue.qsize(), "workers": self.workers, "jobs": counts}
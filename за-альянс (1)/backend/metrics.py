@@ -0,0 +1,187 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Границы корзин гистограмм длительностей (секунды): от быстрых evaluate до долгих загрузок
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Границы для размеров ответов (байты)
+SIZE_BUCKETS = (1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge:
+    """Текущее значение: выставляется вручную или считается функцией при каждом /metrics"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Optional[Callable[[], Dict[LabelKey, float]]] = None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[_label_key(labels)] = value
+
+    def samples(self) -> Iterable[str]:
+        values = dict(self._values)
+        if self.callback:
+            try:
+                values.update(self.callback())
+            except Exception as e:
+                print(f"[WARN] Метрика {self.name} не посчитана: {e}")
+        for key, value in sorted(values.items()):
+            if value is not None:
+                yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Гистограмма с накопительными корзинами, суммой и числом наблюдений"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, Dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Замер длительности блока; метка outcome=error, если блок упал"""
+        started = perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.observe(perf_counter() - started, outcome=outcome, **labels)
+
+    def samples(self) -> Iterable[str]:
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(round(series['sum'], 6))}"
+            yield f"{self.name}_count{_format_labels(key)} {series['count']}"
+
+
+class MetricsRegistry:
+    """Набор метрик приложения с выдачей в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str, callback=None) -> Gauge:
+        return self._register(Gauge(name, help_text, callback))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Длительность этапов парсинга: browser_launch, page_goto, evaluate, cover_download, image_download
+stage_seconds = registry.histogram(
+    "manga_stage_duration_seconds",
+    "Длительность этапов парсинга по stage и outcome",
+)
+# Ожидания готовности страницы (readiness.py): сколько ждали и чем кончилось
+readiness_seconds = registry.histogram(
+    "manga_readiness_wait_seconds",
+    "Длительность ожиданий готовности страницы по шагам",
+)
+image_bytes = registry.histogram(
+    "manga_image_download_bytes",
+    "Размер скачанных картинок",
+    buckets=SIZE_BUCKETS,
+)
+image_bytes_total = registry.counter("manga_image_download_bytes_total", "Всего скачано байт картинок")
+image_downloads_total = registry.counter("manga_image_downloads_total", "Скачивания картинок по результату")
+image_retries_total = registry.counter("manga_image_download_retries_total", "Повторные попытки скачивания картинок")
+chapter_extractions_total = registry.counter(
+    "manga_chapter_extractions_total",
+    "Разбор глав по способу (http — без браузера, browser — через пул)",
+)
+
+
+def label_values(values: Dict[str, float], label: str) -> Dict[LabelKey, float]:
+    """{'a': 1} -> {(('label', 'a'),): 1} для Gauge с функцией"""
+    return {_label_key({label: name}): value for name, value in values.items()}
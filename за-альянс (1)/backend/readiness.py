@@ -0,0 +1,165 @@
+import asyncio
+import os
+from time import monotonic
+from typing import Dict, Iterable, Optional
+
+from metrics import readiness_seconds
+
+# Таймауты ожидания по шагам (мс), переопределяются через READINESS_TIMEOUT_<ШАГ>
+STEP_TIMEOUTS_MS = {
+    "detail_title": 10000,
+    "detail_settle": 2000,
+    "expand_settle": 1500,
+    "chapter_content": 5000,
+    "lazy_images": 3000,
+}
+for _step in STEP_TIMEOUTS_MS:
+    _env = os.getenv(f"READINESS_TIMEOUT_{_step.upper()}")
+    if _env:
+        STEP_TIMEOUTS_MS[_step] = int(_env)
+
+
+class ReadinessStats:
+    """Сколько реально длилось каждое ожидание и как часто оно упиралось в таймаут"""
+
+    def __init__(self):
+        self.steps: Dict[str, Dict] = {}
+
+    def record(self, step: str, seconds: float, ready: bool):
+        s = self.steps.setdefault(step, {"count": 0, "timeouts": 0, "total_s": 0.0, "max_s": 0.0, "last_s": 0.0})
+        s["count"] += 1
+        s["total_s"] += seconds
+        s["max_s"] = max(s["max_s"], seconds)
+        s["last_s"] = seconds
+        if not ready:
+            s["timeouts"] += 1
+        readiness_seconds.observe(seconds, step=step, outcome="ready" if ready else "timeout")
+
+    def snapshot(self) -> Dict:
+        return {
+            step: {
+                **s,
+                "avg_s": round(s["total_s"] / s["count"], 3) if s["count"] else 0.0,
+                "total_s": round(s["total_s"], 3),
+                "max_s": round(s["max_s"], 3),
+                "last_s": round(s["last_s"], 3),
+            }
+            for step, s in self.steps.items()
+        }
+
+
+readiness_stats = ReadinessStats()
+
+
+def _timeout(step: str, timeout_ms: Optional[int]) -> int:
+    return timeout_ms if timeout_ms is not None else STEP_TIMEOUTS_MS.get(step, 5000)
+
+
+async def wait_for_selector(page, selector: str, step: str, timeout_ms: Optional[int] = None) -> bool:
+    """Ждём появления селектора; возвращаем False по таймауту"""
+    started = monotonic()
+    try:
+        await page.wait_for_selector(selector, timeout=_timeout(step, timeout_ms))
+        ready = True
+    except Exception:
+        ready = False
+    readiness_stats.record(step, monotonic() - started, ready)
+    return ready
+
+
+async def wait_for_condition(page, expression: str, step: str, timeout_ms: Optional[int] = None) -> bool:
+    """Ждём, пока JS-выражение станет истинным (например, появится window.__NUXT__)"""
+    started = monotonic()
+    try:
+        await page.wait_for_function(expression, timeout=_timeout(step, timeout_ms))
+        ready = True
+    except Exception:
+        ready = False
+    readiness_stats.record(step, monotonic() - started, ready)
+    return ready
+
+
+async def wait_for_dom_settled(page, step: str, quiet_ms: int = 250, timeout_ms: Optional[int] = None) -> bool:
+    """Ждём, пока MutationObserver не увидит изменений DOM в течение quiet_ms"""
+    started = monotonic()
+    try:
+        ready = await page.evaluate(
+            """
+            ([quietMs, timeoutMs]) => new Promise(resolve => {
+                let quietTimer = null;
+                const finish = (result) => {
+                    observer.disconnect();
+                    clearTimeout(quietTimer);
+                    clearTimeout(hardTimer);
+                    resolve(result);
+                };
+                const observer = new MutationObserver(() => {
+                    clearTimeout(quietTimer);
+                    quietTimer = setTimeout(() => finish(true), quietMs);
+                });
+                observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+                quietTimer = setTimeout(() => finish(true), quietMs);
+                const hardTimer = setTimeout(() => finish(false), timeoutMs);
+            })
+            """,
+            [quiet_ms, _timeout(step, timeout_ms)],
+        )
+    except Exception:
+        ready = False
+    readiness_stats.record(step, monotonic() - started, bool(ready))
+    return bool(ready)
+
+
+class NetworkIdleWatcher:
+    """Следит за запросами страницы нужных типов и ждёт, пока они затихнут"""
+
+    def __init__(self, page, resource_types: Iterable[str] = ("image", "xhr", "fetch")):
+        self.page = page
+        self.resource_types = set(resource_types)
+        self.inflight = set()
+        self._changed = asyncio.Event()
+
+    def _on_request(self, request):
+        if request.resource_type in self.resource_types:
+            self.inflight.add(request)
+            self._changed.set()
+
+    def _on_done(self, request):
+        if request in self.inflight:
+            self.inflight.discard(request)
+            self._changed.set()
+
+    def __enter__(self):
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_done)
+        self.page.on("requestfailed", self._on_done)
+        return self
+
+    def __exit__(self, *exc):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_done)
+        self.page.remove_listener("requestfailed", self._on_done)
+
+    async def wait(self, step: str, idle_ms: int = 300, timeout_ms: Optional[int] = None) -> bool:
+        """Ждём idle_ms тишины (нет активных запросов); False по таймауту"""
+        started = monotonic()
+        deadline = started + _timeout(step, timeout_ms) / 1000
+        ready = False
+        while True:
+            now = monotonic()
+            if now >= deadline:
+                break
+            self._changed.clear()
+            if not self.inflight:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=min(idle_ms / 1000, deadline - now))
+                except asyncio.TimeoutError:
+                    ready = True
+                    break
+            else:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=deadline - now)
+                except asyncio.TimeoutError:
+                    break
+        readiness_stats.record(step, monotonic() - started, ready)
+        return ready
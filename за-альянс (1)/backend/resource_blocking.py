@@ -0,0 +1,97 @@
+import os
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from http_extract import IMAGE_EXT_RE, SKIP_MARKERS
+from metrics import registry
+
+# Какие типы ресурсов не грузить, пока из страницы достаются только ссылки (пусто — ничего не блокировать)
+BLOCK_RESOURCE_TYPES = {
+    t.strip() for t in os.getenv("BLOCK_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()
+}
+# Блокировать скрипты, стили и XHR со сторонних доменов (аналитика, реклама, виджеты)
+BLOCK_THIRD_PARTY = os.getenv("BLOCK_THIRD_PARTY", "1") != "0"
+BLOCK_THIRD_PARTY_TYPES = {"script", "stylesheet", "xhr", "fetch", "eventsource", "websocket", "ping", "other"}
+# Дополнительные хосты, которые блокируются всегда (через запятую)
+BLOCK_HOSTS = tuple(h.strip() for h in os.getenv("BLOCK_HOSTS", "").split(",") if h.strip())
+# Запоминать ссылки заблокированных картинок — запасной источник страниц главы
+CAPTURE_IMAGE_URLS = os.getenv("CAPTURE_IMAGE_URLS", "1") != "0"
+
+blocked_requests_total = registry.counter(
+    "manga_blocked_requests_total",
+    "Запросы браузера, отменённые перехватом, по типу ресурса",
+)
+
+
+def _host_matches(host: str, domain: str) -> bool:
+    return host == domain or host.endswith("." + domain)
+
+
+class ResourceBlocker:
+    """
+    Перехват запросов контекста Playwright (context.route): отменяем картинки,
+    медиа, шрифты и сторонние скрипты, пока со страницы читаются только ссылки.
+    Отменённые картинки запоминаются в captured_images.
+    """
+
+    def __init__(
+        self,
+        first_party: str,
+        resource_types: Optional[Iterable[str]] = None,
+        block_third_party: bool = BLOCK_THIRD_PARTY,
+        capture_images: bool = CAPTURE_IMAGE_URLS,
+    ):
+        host = urlparse(first_party).hostname or first_party
+        self.first_party = host[4:] if host.startswith("www.") else host
+        self.resource_types = set(BLOCK_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.block_third_party = block_third_party
+        self.capture_images = capture_images
+        self.captured_images: List[str] = []
+        self.blocked: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.block_third_party or BLOCK_HOSTS)
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if url.startswith("data:"):
+            return False
+        host = urlparse(url).hostname or ""
+        if any(_host_matches(host, blocked) for blocked in BLOCK_HOSTS):
+            return True
+        if resource_type in self.resource_types:
+            return True
+        if resource_type == "document":
+            return False
+        return (
+            self.block_third_party
+            and resource_type in BLOCK_THIRD_PARTY_TYPES
+            and not _host_matches(host, self.first_party)
+        )
+
+    async def _handle(self, route):
+        request = route.request
+        try:
+            if not self.should_block(request.url, request.resource_type):
+                await route.continue_()
+                return
+            if (
+                self.capture_images
+                and request.resource_type == "image"
+                and IMAGE_EXT_RE.search(request.url)
+                and not any(marker in request.url for marker in SKIP_MARKERS)
+                and request.url not in self.captured_images
+            ):
+                self.captured_images.append(request.url)
+            self.blocked[request.resource_type] = self.blocked.get(request.resource_type, 0) + 1
+            blocked_requests_total.inc(type=request.resource_type)
+            await route.abort("blockedbyclient")
+        except Exception:
+            # Страница уже закрыта — маршрут обрабатывать некому
+            pass
+
+    async def install(self, context):
+        """Подключаем перехват к контексту (или странице) до первого goto"""
+        if self.enabled:
+            await context.route("**/*", self._handle)
+        return self
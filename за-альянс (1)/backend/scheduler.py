@@ -0,0 +1,108 @@
+import asyncio
+from time import monotonic
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """Ограничение частоты запросов к каждому хосту (не чаще N в секунду)"""
+
+    def __init__(self, requests_per_second: float):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        """Ждём, пока для хоста освободится слот"""
+        if not self.min_interval:
+            return
+        host = urlparse(url).netloc
+        async with self._lock:
+            now = monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+ChapterWorker = Callable[[int, Dict], Awaitable[Dict]]
+
+
+class ChapterScheduler:
+    """Параллельная обработка глав с ограничением числа воркеров и сохранением порядка"""
+
+    def __init__(self, concurrency: int = 4, rate_limiter: Optional[HostRateLimiter] = None):
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = rate_limiter
+
+    async def _call(self, worker: ChapterWorker, idx: int, chapter: Dict) -> Dict:
+        """Один вызов воркера с лимитом частоты; исключение превращается в результат со статусом error"""
+        if self.rate_limiter:
+            await self.rate_limiter.wait(chapter.get("url", ""))
+        try:
+            return await worker(idx, chapter)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return {
+                **chapter,
+                "chapter_id": f"{idx}",
+                "total_pages": 0,
+                "pages": [],
+                "download_status": "error",
+                "error": str(e),
+            }
+
+    async def run(self, chapters: List[Dict], worker: ChapterWorker) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Обрабатывает главы воркером worker(idx, chapter).
+        Возвращает результаты в исходном порядке и список ошибок по главам.
+        Ошибка одной главы не прерывает обработку остальных.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[Optional[Dict]] = [None] * len(chapters)
+        failures: List[Dict] = []
+
+        async def run_one(idx: int, chapter: Dict):
+            async with semaphore:
+                result = await self._call(worker, idx, chapter)
+            results[idx - 1] = result
+            if result.get("download_status") == "error":
+                failures.append({
+                    "chapter_id": result.get("chapter_id", f"{idx}"),
+                    "name": chapter.get("name"),
+                    "url": chapter.get("url"),
+                    "error": result.get("error", "unknown error"),
+                })
+
+        await asyncio.gather(*(
+            run_one(idx, chapter)
+            for idx, chapter in enumerate(chapters, start=1)
+        ))
+
+        failures.sort(key=lambda f: int(f["chapter_id"]) if str(f["chapter_id"]).isdigit() else 0)
+        return [r for r in results if r is not None], failures
+
+    async def stream(self, chapters: List[Dict], worker: ChapterWorker) -> AsyncIterator[Dict]:
+        """
+        Как run, но отдаёт результаты по мере готовности (в порядке завершения).
+        Работают ровно concurrency воркеров, готовые главы не накапливаются.
+        """
+        if not chapters:
+            return
+        ready: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        pending = iter(enumerate(chapters, start=1))
+
+        async def consume():
+            for idx, chapter in pending:
+                await ready.put(await self._call(worker, idx, chapter))
+
+        tasks = [asyncio.create_task(consume()) for _ in range(min(self.concurrency, len(chapters)))]
+        try:
+            for _ in range(len(chapters)):
+                yield await ready.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,14 +1,12 @@
 import os
 import re
 import json
-import requests
 from urllib.parse import urljoin, urlparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from time import sleep, time
+from time import perf_counter, sleep, time
 from playwright.async_api import async_playwright
 import sys
 import asyncio
-from tqdm import tqdm
 import aiohttp
 import aiofiles
 from typing import List, Dict, Optional, Tuple
@@ -18,7 +16,40 @@ from pydantic import BaseModel, HttpUrl
 import uvicorn
 from contextlib import asynccontextmanager
 import hashlib
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from adaptive_limiter import AdaptiveHostLimiter, backoff_delay
+from blob_store import BlobStore, chapter_owner, cover_owner
+from browser_pool import BrowserPool
+from cache import MangaCache
+from catalog import CatalogStore
+from derivatives import DerivativeStore
+from singleflight import SingleFlight
+from static_files import ChapterStaticFiles
+from watcher import CatalogWatcher
+from work_lease import WorkLeases
+from scheduler import ChapterScheduler, HostRateLimiter
+from extract_scripts import EXPAND_TAGS_JS, MANGA_INFO_JS
+from http_extract import fetch_chapter_images
+from jobs import FINISHED_STATES, ImportJob, ImportQueue
+from job_store import SharedJobStore
+from metrics import (
+    chapter_extractions_total,
+    image_bytes,
+    image_bytes_total,
+    image_downloads_total,
+    image_retries_total,
+    label_values,
+    registry,
+    stage_seconds,
+)
+from resource_blocking import ResourceBlocker
+from readiness import (
+    NetworkIdleWatcher,
+    readiness_stats,
+    wait_for_condition,
+    wait_for_dom_settled,
+    wait_for_selector,
+)
 
 BASE_URL = "https://webfandom.ru"
 HEADERS = {
@@ -30,13 +61,95 @@ HEADERS = {
     "Upgrade-Insecure-Requests": "1"
 }
 
+# Настройки пула браузеров (можно переопределить через переменные окружения)
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_LEASES = int(os.getenv("BROWSER_MAX_LEASES", "4"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "200"))
+BROWSER_MAX_MEMORY_MB = int(os.getenv("BROWSER_MAX_MEMORY_MB", "1024"))
+
+# Параллельная обработка глав: число одновременных страниц и лимит запросов к хосту
+CHAPTER_CONCURRENCY = int(os.getenv("CHAPTER_CONCURRENCY", "4"))
+CHAPTER_RATE_PER_HOST = float(os.getenv("CHAPTER_RATE_PER_HOST", "4"))
+# Разбирать страницу главы HTTP-запросом до запуска браузера (0 — отключить)
+CHAPTER_HTTP_FAST_PATH = os.getenv("CHAPTER_HTTP_FAST_PATH", "1") != "0"
+
+# Бюджет времени на скрипт извлечения метаданных в браузере (мс)
+METADATA_EVALUATE_BUDGET_MS = float(os.getenv("METADATA_EVALUATE_BUDGET_MS", "250"))
+
+# Фоновый импорт тайтлов: число одновременных задач и глав внутри задачи
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+IMPORT_CHAPTER_CONCURRENCY = int(os.getenv("IMPORT_CHAPTER_CONCURRENCY", "4"))
+# Общие для воркеров снимки и события задач импорта; как часто публиковать прогресс и проверять отмену
+IMPORT_JOBS_DB = os.getenv("IMPORT_JOBS_DB", os.path.join("manga", "_imports.sqlite"))
+IMPORT_POLL_S = float(os.getenv("IMPORT_POLL_S", "1"))
+
+# Наблюдатель за каталогом: базовый интервал проверки, потолок back-off и нагрузка на источник
+WATCHER_ENABLED = os.getenv("WATCHER_ENABLED", "1") != "0"
+WATCHER_BASE_INTERVAL_S = float(os.getenv("WATCHER_BASE_INTERVAL_S", "3600"))
+WATCHER_MAX_INTERVAL_S = float(os.getenv("WATCHER_MAX_INTERVAL_S", str(7 * 24 * 3600)))
+WATCHER_CONCURRENCY = int(os.getenv("WATCHER_CONCURRENCY", "4"))
+WATCHER_RATE_PER_HOST = float(os.getenv("WATCHER_RATE_PER_HOST", "1"))
+
+# Общая HTTP-сессия: пул keep-alive соединений и кеш DNS
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "16"))
+HTTP_KEEPALIVE_S = float(os.getenv("HTTP_KEEPALIVE_S", "60"))
+HTTP_DNS_TTL_S = int(os.getenv("HTTP_DNS_TTL_S", "600"))
+
+# Общий потолок одновременных загрузок картинок; внутри него окно по хостам задаёт host_limiter
+IMAGE_MAX_WORKERS = int(os.getenv("IMAGE_MAX_WORKERS", "32"))
+
+# Скачивание картинок потоком: размер чанка и таймауты (на чтение, а не на весь файл)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+IMAGE_TIMEOUT = aiohttp.ClientTimeout(total=120, sock_connect=15, sock_read=30)
+
+# Число процессов uvicorn; кеш и аренды работы у них общие (SQLite-файлы в папке manga)
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORK_LEASE_TTL_S = float(os.getenv("WORK_LEASE_TTL_S", "60"))
+WORK_LEASE_DB = os.getenv("WORK_LEASE_DB", os.path.join("manga", "_leases.sqlite"))
+
+# Кеш метаданных манги: размер памяти, TTL записей и файл дискового уровня
+MANGA_CACHE_MAX_ENTRIES = int(os.getenv("MANGA_CACHE_MAX_ENTRIES", "200"))
+MANGA_CACHE_MAX_MB = int(os.getenv("MANGA_CACHE_MAX_MB", "256"))
+MANGA_CACHE_TTL_S = float(os.getenv("MANGA_CACHE_TTL_S", str(6 * 3600)))
+MANGA_CACHE_DB = os.getenv("MANGA_CACHE_DB", os.path.join("manga", "_cache.sqlite"))
+# Сколько запись живёт в памяти процесса; при нескольких воркерах — недолго, чтобы видеть чужие обновления
+MANGA_CACHE_MEMORY_TTL_S = os.getenv("MANGA_CACHE_MEMORY_TTL_S", "30" if WORKERS > 1 else "")
+
 # Глобальный кеш для хранения информации о манге
-manga_cache = {}
-browser_pool = None
+manga_cache = MangaCache(
+    MANGA_CACHE_DB,
+    max_entries=MANGA_CACHE_MAX_ENTRIES,
+    max_bytes=MANGA_CACHE_MAX_MB * 1024 * 1024,
+    ttl_s=MANGA_CACHE_TTL_S,
+    memory_ttl_s=float(MANGA_CACHE_MEMORY_TTL_S) if MANGA_CACHE_MEMORY_TTL_S else None,
+)
+# Индекс каталога (тайтлы, главы, страницы) вместо manga/<title>/manga_info.json
+CATALOG_DB = os.getenv("CATALOG_DB", os.path.join("manga", "_catalog.sqlite"))
+# Дополнительно писать manga_info.json рядом со страницами (для старых скриптов)
+MANGA_JSON_EXPORT = os.getenv("MANGA_JSON_EXPORT", "0") != "0"
+catalog = CatalogStore(CATALOG_DB)
+# Между процессами: тайтл/главу парсит один воркер, остальные ждут результат в общем кеше
+work_leases = WorkLeases(WORK_LEASE_DB, ttl_s=WORK_LEASE_TTL_S)
+job_store = SharedJobStore(IMPORT_JOBS_DB)
+# Одновременные запросы одного тайтла/главы ждут одну общую задачу
+scrape_flights = SingleFlight()
+chapter_flights = SingleFlight()
+cover_flights = SingleFlight()
+# Одна загрузка картинки на URL, сколько бы глав её одновременно ни запросили
+page_flights = SingleFlight()
+# Окно параллельных запросов к каждому хосту источника (страницы и CDN картинок), подстраивается по ответам
+host_limiter = AdaptiveHostLimiter("source")
+playwright_instance = None
+browser_pool: Optional[BrowserPool] = None
+import_queue: Optional[ImportQueue] = None
+catalog_watcher: Optional[CatalogWatcher] = None
+http_session: Optional[aiohttp.ClientSession] = None
 
 class MangaRequest(BaseModel):
     url: HttpUrl
     max_chapters: Optional[int] = None
+    download_images: bool = True
 
 class MangaResponse(BaseModel):
     title: str
@@ -45,8 +158,12 @@ class MangaResponse(BaseModel):
     genres: List[str] = []
     cover_url: Optional[str] = None
     local_cover_path: Optional[str] = None
+    cover_variants: Dict[str, str] = {}
     additional_info: Dict = {}
     chapters: List[Dict] = []
+    chapters_resolved: bool = True
+    failed_chapters: List[Dict] = []
+    sync: Dict = {}
     total_chapters: int
     source_url: str
     manga_id: str
@@ -58,17 +175,134 @@ class ChapterResponse(BaseModel):
     total_pages: int
     download_status: str
 
+def create_http_session() -> aiohttp.ClientSession:
+    """Долгоживущая сессия с переиспользованием соединений (одна на приложение)"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_MAX_CONNECTIONS,
+        limit_per_host=HTTP_MAX_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_S,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_TTL_S,
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300))
+
+# Задачи с неопубликованными изменениями; смена статуса будит публикацию сразу
+dirty_import_jobs: Dict[str, ImportJob] = {}
+import_publish_wakeup = asyncio.Event()
+import_publish_lock = asyncio.Lock()
+
+def publish_import_job(job: ImportJob):
+    """
+    Отмечаем задачу для публикации в общем хранилище. Запись идёт не на каждое
+    событие: прогресс — раз в IMPORT_POLL_S, смена статуса — сразу, в фоне.
+    """
+    dirty_import_jobs[job.id] = job
+    if job.status != job.published_status:
+        import_publish_wakeup.set()
+
+async def flush_import_jobs():
+    """Снимки и новые события отмеченных задач — в общее хранилище (в потоке, по очереди)"""
+    async with import_publish_lock:
+        jobs = list(dirty_import_jobs.values())
+        dirty_import_jobs.clear()
+        for job in jobs:
+            events = job.events[job.published_events:]
+            status = job.status
+            try:
+                await asyncio.to_thread(job_store.publish, job.to_dict(), events, work_leases.owner)
+            except Exception as e:
+                print(f"[WARN] Не удалось опубликовать состояние задачи {job.id}: {e}")
+                dirty_import_jobs.setdefault(job.id, job)
+                continue
+            job.published_events += len(events)
+            job.published_status = status
+
+async def sync_import_jobs():
+    """Публикация прогресса задач этого воркера и отмена, запрошенная через DELETE /imports/{id} в другом воркере"""
+    while True:
+        try:
+            await asyncio.wait_for(import_publish_wakeup.wait(), timeout=IMPORT_POLL_S)
+        except asyncio.TimeoutError:
+            pass
+        import_publish_wakeup.clear()
+        await flush_import_jobs()
+        local = [job.id for job in import_queue.jobs.values() if job.status not in FINISHED_STATES]
+        try:
+            for job_id in await asyncio.to_thread(job_store.cancel_requests, local):
+                print(f"🛑 Задача импорта {job_id} отменена из другого воркера")
+                import_queue.cancel(job_id)
+        except Exception as e:
+            print(f"[WARN] Не удалось проверить отмену задач импорта: {e}")
+
+async def run_watcher_when_leader():
+    """Наблюдатель за каталогом работает только в одном воркере — владельце аренды role:watcher"""
+    running = False
+    try:
+        while True:
+            leader = await asyncio.to_thread(work_leases.try_acquire, "role:watcher")
+            if leader and not running:
+                print(f"👀 Наблюдатель за каталогом запущен в процессе {os.getpid()}")
+                catalog_watcher.start()
+                running = True
+            elif not leader and running:
+                await catalog_watcher.pause()
+                running = False
+            await asyncio.sleep(WORK_LEASE_TTL_S / 3)
+    finally:
+        await work_leases.arelease("role:watcher")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global browser_pool
+    global playwright_instance, browser_pool, http_session, import_queue, catalog_watcher
     print("🚀 Запуск сервера парсера манги...")
-    browser_pool = await async_playwright().start()
+    playwright_instance = await async_playwright().start()
+    browser_pool = BrowserPool(
+        playwright_instance,
+        size=BROWSER_POOL_SIZE,
+        max_leases_per_browser=BROWSER_MAX_LEASES,
+        max_pages_per_browser=BROWSER_MAX_PAGES,
+        max_memory_mb=BROWSER_MAX_MEMORY_MB,
+    )
+    await browser_pool.start()
+    derivative_store.start()
+    imported = await asyncio.to_thread(catalog.import_json, "manga", once=True)
+    if imported:
+        print(f"📋 В каталог перенесено {imported} тайтлов из manga_info.json")
+    http_session = create_http_session()
+    import_queue = ImportQueue(run_import_job, workers=IMPORT_WORKERS, on_event=publish_import_job)
+    import_queue.start()
+    import_sync_task = asyncio.create_task(sync_import_jobs())
+    catalog_watcher = CatalogWatcher(
+        os.path.join("manga", "_watcher.sqlite"),
+        checker=lambda url: sync_manga(url, parser.get_manga_id(url)),
+        concurrency=WATCHER_CONCURRENCY,
+        requests_per_second=WATCHER_RATE_PER_HOST,
+        base_interval_s=WATCHER_BASE_INTERVAL_S,
+        max_interval_s=WATCHER_MAX_INTERVAL_S,
+    )
+    watcher_leader_task = asyncio.create_task(run_watcher_when_leader()) if WATCHER_ENABLED else None
     yield
     # Shutdown
     print("🛑 Остановка сервера...")
+    import_sync_task.cancel()
+    await asyncio.gather(import_sync_task, return_exceptions=True)
+    if watcher_leader_task:
+        watcher_leader_task.cancel()
+        await asyncio.gather(watcher_leader_task, return_exceptions=True)
+    if catalog_watcher:
+        await catalog_watcher.stop()
+    if import_queue:
+        await import_queue.stop()
+        await flush_import_jobs()
+    if http_session:
+        await http_session.close()
     if browser_pool:
         await browser_pool.stop()
+    derivative_store.stop()
+    if playwright_instance:
+        await playwright_instance.stop()
 
 app = FastAPI(
     title="Manga Parser API",
@@ -79,8 +313,28 @@ app = FastAPI(
 
 os.makedirs("manga", exist_ok=True)
 
-# Раздаём файлы из папки "manga" по адресу /static
-app.mount("/static", StaticFiles(directory="manga"), name="static")
+# Общее хранилище страниц по хешу содержимого (раздаётся как /static/_blobs/...)
+blob_store = BlobStore(os.path.join("manga", "_blobs"))
+# Миниатюры и перекодированные страницы (раздаются как /static/_derivatives/...)
+derivative_store = DerivativeStore(os.path.join("manga", "_derivatives"))
+
+def static_url(path: str) -> str:
+    """Путь к файлу в папке manga -> адрес /static/... для фронта"""
+    return "/static/" + os.path.relpath(path, "manga").replace("\\", "/")
+
+def resolve_static(src: str) -> str:
+    """Адрес /static/... -> путь к существующему файлу внутри папки manga"""
+    relative = src.split("?", 1)[0]
+    if relative.startswith("/static/"):
+        relative = relative[len("/static/"):]
+    root = os.path.abspath("manga")
+    path = os.path.abspath(os.path.join(root, relative.lstrip("/")))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Файл {src} не найден")
+    return path
+
+# Раздаём файлы из папки "manga" по адресу /static (кеш-заголовки, ETag, Range, X-Accel-Redirect)
+app.mount("/static", ChapterStaticFiles(directory="manga"), name="static")
 
 # 👇 Разрешаем фронту обращаться к API
 app.add_middleware(
@@ -92,8 +346,14 @@ app.add_middleware(
 )
 
 class FastMangaParser:
-    def __init__(self, max_workers: int = 10):
+    def __init__(self, max_workers: int = 10, chapter_concurrency: int = 4, chapter_rate_per_host: float = 4):
         self.max_workers = max_workers
+        self.chapter_scheduler = ChapterScheduler(
+            concurrency=chapter_concurrency,
+            rate_limiter=HostRateLimiter(chapter_rate_per_host),
+        )
+        # Сколько глав разобрано HTTP-путём, а сколько потребовали браузер
+        self.extraction_stats = {"http": 0, "browser": 0}
         
     def sanitize_filename(self, name: str) -> str:
         """Очистка имени файла от недопустимых символов"""
@@ -104,8 +364,14 @@ class FastMangaParser:
         return hashlib.md5(url.encode()).hexdigest()
     
     async def download_image_async(self, session: aiohttp.ClientSession, url: str, path: str, retries: int = 3) -> bool:
-        """Асинхронное скачивание изображения"""
+        """
+        Потоковое скачивание изображения в <path>.part с атомарным переименованием.
+        Готовый файл появляется только после сверки с Content-Length,
+        поэтому его наличие означает целую картинку. Недокачанный .part
+        докачивается через Range.
+        """
         if os.path.exists(path):
+            image_downloads_total.inc(result="exists")
             return True
         if url.startswith("/"):
              url = urljoin(BASE_URL, url)
@@ -115,343 +381,265 @@ class FastMangaParser:
             "Referer": BASE_URL,
             "Accept": "image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
         }
+        part_path = f"{path}.part"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        started = perf_counter()
+        received = 0
+        gone = False
         
         for attempt in range(retries):
+            if attempt:
+                image_retries_total.inc()
             try:
-                async with session.get(url, headers=headers, timeout=30) as response:
-                    if response.status == 200:
-                        content = await response.read()
-                        os.makedirs(os.path.dirname(path), exist_ok=True)
-                        async with aiofiles.open(path, 'wb') as f:
-                            await f.write(content)
-                        return True
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                request_headers = {**headers, "Range": f"bytes={offset}-"} if offset else headers
+                async with host_limiter.slot(url) as slot:
+                    async with session.get(url, headers=request_headers, timeout=IMAGE_TIMEOUT) as response:
+                        slot.observe(response.status, response.headers.get("Retry-After"))
+                        if response.status == 416:
+                            # Сервер не принял диапазон — начинаем заново
+                            os.remove(part_path)
+                            continue
+                        if response.status == 206 and offset:
+                            mode = 'ab'
+                            expected_size = self._content_range_total(response.headers.get("Content-Range"))
+                        elif response.status == 200:
+                            mode, offset = 'wb', 0
+                            expected_size = response.content_length
+                        else:
+                            gone = response.status in (404, 410)  # повторять бессмысленно
+                            raise IOError(f"HTTP {response.status}")
+                        if response.headers.get("Content-Encoding", "identity") != "identity":
+                            expected_size = None  # длина сжатого тела не равна размеру файла
+                    
+                        async with aiofiles.open(part_path, mode) as f:
+                            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                                await f.write(chunk)
+                                received += len(chunk)
+                
+                size = os.path.getsize(part_path)
+                if expected_size is not None and size != expected_size:
+                    if size > expected_size:
+                        os.remove(part_path)
+                    raise IOError(f"получено {size} из {expected_size} байт")
+                os.replace(part_path, path)
+                stage_seconds.observe(perf_counter() - started, stage="image_download", outcome="ok")
+                image_bytes.observe(size)
+                image_bytes_total.inc(received)
+                image_downloads_total.inc(result="ok")
+                return True
             except Exception as e:
-                if attempt == retries - 1:
+                if gone or attempt == retries - 1:
                     print(f"[WARN] Не удалось скачать {url}: {e}")
-                await asyncio.sleep(0.5)
+                    break
+                # После 429/5xx хост сам стоит на паузе в host_limiter; здесь — короткая пауза с джиттером
+                await asyncio.sleep(backoff_delay(attempt, base_s=0.5, max_s=10))
+        stage_seconds.observe(perf_counter() - started, stage="image_download", outcome="error")
+        image_bytes_total.inc(received)
+        image_downloads_total.inc(result="failed")
         return False
     
+    @staticmethod
+    def guess_extension(img_url: str) -> str:
+        """Расширение картинки по URL (по умолчанию jpg)"""
+        ext = "jpg"
+        if any(x in img_url.lower() for x in ['.png', '.webp', '.jpeg']):
+            ext = img_url.split('.')[-1].split('?')[0].lower()[:4]
+        return ext
+
+    async def store_pages(self, img_urls: List[str]) -> List[Dict]:
+        """
+        Скачиваем картинки в контентно-адресуемое хранилище.
+        Уже известные URL не скачиваются повторно, одинаковые картинки хранятся один раз.
+        """
+        urls = list(dict.fromkeys(img_urls))
+        known = dict(zip(urls, await asyncio.to_thread(lambda: [blob_store.lookup_url(url) for url in urls])))
+        missing = [url for url, blob in known.items() if not blob]
+        if missing:
+            semaphore = asyncio.Semaphore(self.max_workers)
+            async with self.download_session() as session:
+                async def store(url: str) -> Optional[Dict]:
+                    async with semaphore:
+                        try:
+                            return await page_flights.run(url, lambda: self.store_page(session, url))
+                        except Exception as e:
+                            print(f"[WARN] Не удалось сохранить {url}: {e}")
+                            return None
+
+                known.update(zip(missing, await asyncio.gather(*(store(url) for url in missing))))
+
+        return [known[url] for url in img_urls if known[url]]
+
+    async def store_page(self, session: aiohttp.ClientSession, url: str) -> Optional[Dict]:
+        """Скачиваем одну картинку во временный файл и кладём в хранилище"""
+        blob = await blob_store.alookup_url(url)  # могли сохранить, пока ждали своей очереди
+        if blob:
+            return blob
+        ext = self.guess_extension(url)
+        staging = blob_store.staging_path(url, ext)
+        if not await self.download_image_async(session, url, staging):
+            return None
+        digest = await blob_store.ingest(staging, ext, url=url)
+        return await blob_store.alookup_url(url) or {"digest": digest, "ext": ext}
+
+    async def store_chapter_pages(self, img_urls: List[str], owner: str) -> List[Dict]:
+        """Скачиваем страницы в хранилище и привязываем их к главе"""
+        blobs = await self.store_pages(img_urls)
+        await blob_store.aset_refs(owner, [blob["digest"] for blob in blobs])
+        return blobs
+
+    async def download_cover(self, cover_url: str, owner: str) -> Optional[str]:
+        """Обложка через общий асинхронный путь загрузки: одна загрузка на URL, повторно — из хранилища"""
+        async def fetch() -> List[Dict]:
+            print(f"Скачиваем обложку: {cover_url}")
+            with stage_seconds.time(stage="cover_download"):
+                return await self.store_pages([cover_url])
+
+        try:
+            blobs = await cover_flights.run(cover_url, fetch)
+        except Exception as e:
+            print(f"[WARN] Не удалось скачать обложку: {e}")
+            return None
+        if not blobs:
+            print(f"[WARN] Не удалось скачать обложку: {cover_url}")
+            return None
+        await blob_store.aset_refs(owner, [blobs[0]["digest"]])
+        return blob_store.blob_path(blobs[0]["digest"], blobs[0]["ext"])
+
+    async def cover_variants(self, cover_path: str, presets: Tuple[str, ...] = ("card", "hero")) -> Dict[str, str]:
+        """Уменьшенные копии обложки для карточек и слайдера (вместо многомегабайтного оригинала)"""
+        variants = {}
+        for preset in presets:
+            try:
+                manifest = await derivative_store.get(cover_path, DerivativeStore.params(preset))
+                variants[preset] = static_url(manifest["files"][0])
+            except Exception as e:
+                print(f"[WARN] Не удалось сделать миниатюру обложки ({preset}): {e}")
+        return variants
+
+    @staticmethod
+    def _content_range_total(content_range: Optional[str]) -> Optional[int]:
+        """Полный размер файла из заголовка 'Content-Range: bytes 100-999/1000'"""
+        if not content_range or "/" not in content_range:
+            return None
+        total = content_range.rsplit("/", 1)[1].strip()
+        return int(total) if total.isdigit() else None
+    
+    @asynccontextmanager
+    async def download_session(self):
+        """Общая сессия сервера; вне сервера — временная на пакет"""
+        if http_session is not None and not http_session.closed:
+            yield http_session
+            return
+        async with create_http_session() as session:
+            yield session
+
     async def download_images_batch(self, img_urls: List[Tuple[str, str]]) -> int:
-        """Пакетная загрузка изображений"""
-        connector = aiohttp.TCPConnector(limit=self.max_workers, force_close=True)
-        timeout = aiohttp.ClientTimeout(total=300)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            tasks = []
-            for url, path in img_urls:
-                task = self.download_image_async(session, url, path)
-                tasks.append(task)
-            
-            results = await asyncio.gather(*tasks)
+        """Пакетная загрузка изображений через общую сессию (соединения переиспользуются между главами)"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def download(session: aiohttp.ClientSession, url: str, path: str) -> bool:
+            async with semaphore:
+                return await self.download_image_async(session, url, path)
+
+        async with self.download_session() as session:
+            results = await asyncio.gather(*(download(session, url, path) for url, path in img_urls))
             return sum(results)
     
     async def get_full_manga_info(self, page) -> Dict:
         """Получаем полную информацию о манге"""
         print("Извлекаем полную информацию о манге...")
         
-        # Ждем появления основного контента
-        try:
-            await page.wait_for_selector('h1, [data-testid="title"], .title, .manga-title', timeout=10000)
-            await asyncio.sleep(2)
-        except:
+        # Ждем появления основного контента и пока DOM перестанет меняться
+        if await wait_for_selector(page, 'h1, [data-testid="title"], .title, .manga-title', step="detail_title"):
+            await wait_for_dom_settled(page, step="detail_settle")
+        else:
             print("Предупреждение: не удалось дождаться полной загрузки, продолжаем...")
-            await asyncio.sleep(1)
         
         # Пробуем развернуть все теги
         try:
             print("Разворачиваем все теги...")
-            await page.evaluate("""
-                () => {
-                    const showMoreButtons = document.querySelectorAll('button, span, div');
-                    showMoreButtons.forEach(element => {
-                        const text = element.textContent || '';
-                        if (text.includes('Показать все') || 
-                            text.includes('...') || 
-                            element.className.includes('show-more') ||
-                            element.className.includes('expand')) {
-                            try {
-                                element.click();
-                            } catch(e) {}
-                        }
-                    });
-                    
-                    const badges = document.querySelectorAll('.badge');
-                    badges.forEach(badge => {
-                        if (badge.textContent && badge.textContent.includes('Показать все')) {
-                            try {
-                                badge.click();
-                            } catch(e) {}
-                        }
-                    });
-                }
-            """)
-            await asyncio.sleep(1)
+            with stage_seconds.time(stage="evaluate", script="expand_tags"):
+                await page.evaluate(EXPAND_TAGS_JS)
+            await wait_for_dom_settled(page, step="expand_settle", quiet_ms=150)
         except:
             print("Не удалось развернуть теги, продолжаем...")
         
         # Извлекаем данные
-        info = await page.evaluate(r"""
-            () => {
-                const data = {};
-                
-                // Название на русском
-                const titleEl = document.querySelector('h1, [data-testid="title"], .title, .manga-title');
-                data.title = titleEl ? titleEl.textContent.trim() : 'Без названия';
-                
-                // Альтернативные названия
-                data.alternative_titles = {};
-                
-                // Ищем блок с альтернативными названиями
-                const infoBlocks = document.querySelectorAll('.publication-info > div, .manga-info > div, .info-block, div');
-                infoBlocks.forEach(block => {
-                    const text = block.textContent || '';
-                    
-                    if (text.includes('Английское название:') || text.includes('English:')) {
-                        const match = text.match(/(?:Английское название:|English:)\s*(.+?)(?:\n|$)/);
-                        if (match) data.alternative_titles.english = match[1].trim();
-                    }
-                    
-                    if (text.includes('Корейское название:') || text.includes('Korean:')) {
-                        const match = text.match(/(?:Корейское название:|Korean:)\s*(.+?)(?:\n|$)/);
-                        if (match) data.alternative_titles.korean = match[1].trim();
-                    }
-                    
-                    if (text.includes('Японское название:') || text.includes('Japanese:')) {
-                        const match = text.match(/(?:Японское название:|Japanese:)\s*(.+?)(?:\n|$)/);
-                        if (match) data.alternative_titles.japanese = match[1].trim();
-                    }
-                });
-                
-                // Поиск обложки
-                let coverUrl = null;
-                
-                const pictureElement = document.querySelector('picture');
-                if (pictureElement) {
-                    const imgInPicture = pictureElement.querySelector('img');
-                    if (imgInPicture && imgInPicture.src && !imgInPicture.src.startsWith('data:')) {
-                        coverUrl = imgInPicture.src;
-                    }
-                }
-                
-                if (!coverUrl) {
-                    const imgSelectors = [
-                        'img[class*="rounded"]',
-                        'img[alt*="обложка"]',
-                        'img[alt*="cover"]',
-                        '.cover img',
-                        '.manga-cover img',
-                        'div.relative img',
-                        '.publication-cover img',
-                        'img.w-full'
-                    ];
-                    
-                    for (const sel of imgSelectors) {
-                        try {
-                            const el = document.querySelector(sel);
-                            if (el && el.src && 
-                                !el.src.startsWith('data:') && 
-                                !el.src.includes('avatar') && 
-                                !el.src.includes('logo') &&
-                                !el.src.includes('icon')) {
-                                coverUrl = el.src;
-                                break;
-                            }
-                        } catch(e) {}
-                    }
-                }
-                
-                if (!coverUrl) {
-                    const imgs = Array.from(document.querySelectorAll('img'));
-                    const bigImg = imgs.find(img => 
-                        img.src && 
-                        !img.src.startsWith('data:') &&
-                        img.naturalWidth > 200 && 
-                        img.naturalHeight > 300 &&
-                        !img.src.includes('avatar') &&
-                        !img.src.includes('logo')
-                    );
-                    if (bigImg) coverUrl = bigImg.src;
-                }
-                
-                data.cover_url = coverUrl;
-                
-                // Описание
-                let description = '';
-                const descSelectors = [
-                    '.publication-description',
-                    '.whitespace-pre-wrap',
-                    '.description',
-                    '.manga-description',
-                    '[class*="description"]',
-                    'div.font-light'
-                ];
-                
-                for (const sel of descSelectors) {
-                    try {
-                        const el = document.querySelector(sel);
-                        if (el && el.textContent && el.textContent.length > 50) {
-                            description = el.textContent.trim();
-                            break;
-                        }
-                    } catch(e) {}
-                }
-                
-                data.description = description || 'Описание отсутствует';
-                
-                // Собираем ВСЕ теги
-                const allTags = new Set();
-                
-                const tagSelectors = [
-                    'a .badge.text-wf-yellow',
-                    'a .badge',
-                    '.badge',
-                    '.genre',
-                    '.tag',
-                    'a[href*="/catalog?genres"]',
-                    'a[href*="/catalog?tags"]',
-                    '.genres a',
-                    '.tags a',
-                    '[class*="badge"]:not([class*="show"])'
-                ];
-                
-                tagSelectors.forEach(sel => {
-                    try {
-                        document.querySelectorAll(sel).forEach(el => {
-                            let text = el.textContent.trim();
-                            
-                            if (text && 
-                                text.length > 1 && 
-                                text !== '...' && 
-                                !text.includes('Показать все') &&
-                                !text.includes('Скрыть') &&
-                                !text.includes('Свернуть')) {
-                                
-                                const parentLink = el.closest('a');
-                                if (parentLink && parentLink.href && parentLink.href.includes('/catalog')) {
-                                    text = parentLink.textContent.trim();
-                                }
-                                
-                                if (text && !text.includes('Показать')) {
-                                    allTags.add(text);
-                                }
-                            }
-                        });
-                    } catch(e) {}
-                });
-                
-                try {
-                    document.querySelectorAll('a[href*="/catalog"]').forEach(link => {
-                        const badge = link.querySelector('.badge');
-                        if (badge) {
-                            const text = badge.textContent.trim();
-                            if (text && !text.includes('Показать') && text !== '...') {
-                                allTags.add(text);
-                            }
-                        }
-                    });
-                } catch(e) {}
-                
-                data.genres = Array.from(allTags);
-                
-                // Дополнительная информация
-                data.additional_info = {};
-                
-                try {
-                    const allElements = document.querySelectorAll('*');
-                    allElements.forEach(el => {
-                        const text = el.textContent || '';
-                        if (text.includes('Статус')) {
-                            if (text.includes('Завершен')) data.additional_info.status = 'Завершен';
-                            else if (text.includes('Продолжается')) data.additional_info.status = 'Продолжается';
-                            else if (text.includes('Заморожен')) data.additional_info.status = 'Заморожен';
-                        }
-                        
-                        if (text.includes('Автор')) {
-                            const authorMatch = text.match(/Автор[:\s]+(.+?)(?:\n|$)/);
-                            if (authorMatch) data.additional_info.author = authorMatch[1].trim();
-                        }
-                        
-                        if (text.includes('Художник')) {
-                            const artistMatch = text.match(/Художник[:\s]+(.+?)(?:\n|$)/);
-                            if (artistMatch) data.additional_info.artist = artistMatch[1].trim();
-                        }
-                        
-                        if (text.includes('Год выпуска') || text.includes('Год')) {
-                            const yearMatch = text.match(/\d{4}/);
-                            if (yearMatch) data.additional_info.year = parseInt(yearMatch[0]);
-                        }
-                    });
-                } catch(e) {}
-                
-                return data;
-            }
-        """)
+        with stage_seconds.time(stage="evaluate", script="manga_info"):
+            info = await page.evaluate(MANGA_INFO_JS)
+        elapsed_ms = info.pop("_elapsed_ms", 0)
+        readiness_stats.record("metadata_evaluate", elapsed_ms / 1000, elapsed_ms <= METADATA_EVALUATE_BUDGET_MS)
+        if elapsed_ms > METADATA_EVALUATE_BUDGET_MS:
+            print(f"[WARN] Извлечение метаданных заняло {elapsed_ms:.0f} мс (бюджет {METADATA_EVALUATE_BUDGET_MS} мс)")
         
         return info
 
     async def extract_images_from_chapter(self, page) -> List[str]:
         """Извлекаем ВСЕ картинки из главы (Nuxt + img + data-* + scroll)"""
-        img_urls = await page.evaluate(r"""
-            () => {
-                const images = [];
-
-                // Проверяем глобальные переменные
-                if (window.images) return window.images;
-                if (window.chapterImages) return window.chapterImages;
-                if (window.pageImages) return window.pageImages;
-
-                // Ищем изображения в Nuxt data
-                if (window.__NUXT__ && window.__NUXT__.data) {
-                    const findImages = (obj, depth = 0) => {
-                        if (depth > 10) return [];
-                        const imgs = [];
-                        if (typeof obj === 'string' && obj.match(/\.(jpg|jpeg|png|webp)/i)) {
-                            imgs.push(obj);
-                        } else if (Array.isArray(obj)) {
-                            obj.forEach(item => imgs.push(...findImages(item, depth + 1)));
-                        } else if (typeof obj === 'object' && obj !== null) {
-                            Object.values(obj).forEach(val => imgs.push(...findImages(val, depth + 1)));
-                        }
-                        return imgs;
-                    };
-                    const nuxtImages = findImages(window.__NUXT__.data);
-                    if (nuxtImages.length > 0) return nuxtImages;
-                }
+        with stage_seconds.time(stage="evaluate", script="chapter_images"):
+            img_urls = await page.evaluate(r"""
+                () => {
+                    const images = [];
+
+                    // Проверяем глобальные переменные
+                    if (window.images) return window.images;
+                    if (window.chapterImages) return window.chapterImages;
+                    if (window.pageImages) return window.pageImages;
 
-                // Парсим <script> для поиска JSON с картинками
-                const scripts = document.querySelectorAll('script');
-                for (const script of scripts) {
-                    const text = script.textContent;
-                    if (!text) continue;
-                    const urlMatches = text.matchAll(/https?:\/\/[^"'\s,\]]+\.(?:jpg|jpeg|png|webp)/gi);
-                    for (const match of urlMatches) {
-                        images.push(match[0]);
+                    // Ищем изображения в Nuxt data
+                    if (window.__NUXT__ && window.__NUXT__.data) {
+                        const findImages = (obj, depth = 0) => {
+                            if (depth > 10) return [];
+                            const imgs = [];
+                            if (typeof obj === 'string' && obj.match(/\.(jpg|jpeg|png|webp)/i)) {
+                                imgs.push(obj);
+                            } else if (Array.isArray(obj)) {
+                                obj.forEach(item => imgs.push(...findImages(item, depth + 1)));
+                            } else if (typeof obj === 'object' && obj !== null) {
+                                Object.values(obj).forEach(val => imgs.push(...findImages(val, depth + 1)));
+                            }
+                            return imgs;
+                        };
+                        const nuxtImages = findImages(window.__NUXT__.data);
+                        if (nuxtImages.length > 0) return nuxtImages;
                     }
-                }
 
-                // Собираем из DOM (src и data-атрибуты)
-                document.querySelectorAll('img').forEach(img => {
-                    if (img.src && !img.src.startsWith('data:')) images.push(img.src);
-                    ['data-src', 'data-original', 'data-lazy-src'].forEach(attr => {
-                        const val = img.getAttribute(attr);
-                        if (val) images.push(val);
+                    // Парсим <script> для поиска JSON с картинками
+                    const scripts = document.querySelectorAll('script');
+                    for (const script of scripts) {
+                        const text = script.textContent;
+                        if (!text) continue;
+                        const urlMatches = text.matchAll(/https?:\/\/[^"'\s,\]]+\.(?:jpg|jpeg|png|webp)/gi);
+                        for (const match of urlMatches) {
+                            images.push(match[0]);
+                        }
+                    }
+
+                    // Собираем из DOM (src и data-атрибуты)
+                    document.querySelectorAll('img').forEach(img => {
+                        if (img.src && !img.src.startsWith('data:')) images.push(img.src);
+                        ['data-src', 'data-original', 'data-lazy-src'].forEach(attr => {
+                            const val = img.getAttribute(attr);
+                            if (val) images.push(val);
+                        });
                     });
-                });
-
-                // Убираем дубликаты и системные иконки
-                return [...new Set(images)].filter(url =>
-                    !url.includes('avatar') &&
-                    !url.includes('logo') &&
-                    !url.includes('icon') &&
-                    !url.includes('button')
-                );
-            }
-        """)
+
+                    // Убираем дубликаты и системные иконки
+                    return [...new Set(images)].filter(url =>
+                        !url.includes('avatar') &&
+                        !url.includes('logo') &&
+                        !url.includes('icon') &&
+                        !url.includes('button')
+                    );
+                }
+            """)
 
         # ⚡ Прокрутка, чтобы подгрузились ленивые картинки
         if not img_urls or len(img_urls) < 2:
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await asyncio.sleep(2)
+            with NetworkIdleWatcher(page, resource_types=("image", "xhr", "fetch")) as watcher:
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                await watcher.wait(step="lazy_images")
             img_urls = await page.evaluate("""
                 () => Array.from(document.querySelectorAll('img'))
                     .map(img => img.src)
@@ -459,160 +647,309 @@ class FastMangaParser:
             """)
 
         return img_urls
-    
-    async def process_chapter_async(self, browser, chapter: Dict, ch_idx: int, manga_dir: str, download_images: bool = True) -> Dict:
-        """Асинхронная обработка главы"""
+
+    async def extract_images_via_http(self, url: str) -> List[str]:
+        """Быстрый путь: картинки из __NUXT__/<script> в сыром HTML, без браузера"""
+        if not CHAPTER_HTTP_FAST_PATH or http_session is None:
+            return []
+        with stage_seconds.time(stage="chapter_http"):
+            img_urls = await fetch_chapter_images(http_session, url, headers={**HEADERS, "Referer": BASE_URL}, limiter=host_limiter)
+        return img_urls or []
+
+    async def extract_images_with_browser(self, browser, url: str) -> List[str]:
+        """Медленный путь: рендерим страницу главы в браузере (без browser — берём из пула)"""
+        if browser is None:
+            async with browser_pool.lease() as leased:
+                return await self.extract_images_with_browser(leased, url)
         context = await browser.new_context(user_agent=HEADERS["User-Agent"])
-        page = await context.new_page()
-        page.set_default_timeout(30000)
-        
         try:
-            await page.goto(chapter['url'], wait_until='domcontentloaded')
-            await asyncio.sleep(1)
-            
-            # Быстрое извлечение изображений
+            # Нужны только ссылки — картинки, шрифты и сторонние скрипты не грузим
+            blocker = await ResourceBlocker(url).install(context)
+            page = await context.new_page()
+            page.set_default_timeout(30000)
+            with stage_seconds.time(stage="page_goto", page="chapter"):
+                await page.goto(url, wait_until='domcontentloaded')
+            # Ждём данные Nuxt или картинки главы вместо фиксированной паузы
+            await wait_for_condition(
+                page,
+                """() => (window.__NUXT__ && window.__NUXT__.data)
+                    || window.images || window.chapterImages || window.pageImages
+                    || document.querySelectorAll('img[src]:not([src^="data:"])').length > 1""",
+                step="chapter_content",
+            )
             img_urls = await self.extract_images_from_chapter(page)
-            
-            chapter_result = {
-                **chapter,
-                "chapter_id": f"{ch_idx}",
-                "total_pages": len(img_urls),
-                "pages": [],
-                "download_status": "pending"
-            }
+            if len(img_urls) < 2 and len(blocker.captured_images) > len(img_urls):
+                # В DOM ссылок нет — берём их из перехваченных запросов картинок
+                img_urls = list(blocker.captured_images)
+            return img_urls
+        finally:
+            await context.close()
+    
+    async def process_chapter_async(
+        self, browser, chapter: Dict, ch_idx: int, manga_dir: str, download_images: bool = True,
+        manga_id: Optional[str] = None,
+    ) -> Dict:
+        """Асинхронная обработка главы (browser=None — браузер арендуется только при необходимости)"""
+        chapter_result = {
+            **chapter,
+            "chapter_id": f"{ch_idx}",
+            "total_pages": 0,
+            "pages": [],
+            "download_status": "pending"
+        }
+        
+        try:
+            # ⚡ Сначала пробуем достать картинки одним HTTP-запросом, браузер — только если не вышло
+            img_urls = await self.extract_images_via_http(chapter['url'])
+            if len(img_urls) < 2:
+                img_urls = await self.extract_images_with_browser(browser, chapter['url'])
+                self.extraction_stats["browser"] += 1
+                chapter_extractions_total.inc(method="browser")
+            else:
+                self.extraction_stats["http"] += 1
+                chapter_extractions_total.inc(method="http")
+            chapter_result["total_pages"] = len(img_urls)
             
             if not img_urls:
                 chapter_result["download_status"] = "no_images"
-                await context.close()
                 return chapter_result
             
-            # Создаем папку для главы
-            ch_dir = os.path.join(manga_dir, f"chapter_{ch_idx:03d}_{self.sanitize_filename(chapter['name'])}")
-            
             if download_images:
-                os.makedirs(ch_dir, exist_ok=True)
-                
-                # Подготавливаем список для загрузки
-                download_list = []
-                
-                for idx, img_url in enumerate(img_urls, 1):
-                    ext = "jpg"
-                    if any(x in img_url.lower() for x in ['.png', '.webp', '.jpeg']):
-                        ext = img_url.split('.')[-1].split('?')[0].lower()[:4]
-                    
-                    filename = os.path.join(ch_dir, f"page_{idx:03d}.{ext}")
-                    # делаем относительный путь от папки manga
-                    relative_path = os.path.relpath(filename, "manga").replace("\\", "/")
-                    # теперь фронт будет получать /static/...
-                    chapter_result["pages"].append(f"/static/{relative_path}")
-                    download_list.append((img_url, filename))
-
-                # Загружаем изображения асинхронно
-                downloaded = await self.download_images_batch(download_list)
-                chapter_result["download_status"] = "completed" if downloaded > 0 else "failed"
+                # Страницы главы ссылаются на блобы хранилища по хешу содержимого
+                owner = chapter_owner(manga_id or "", chapter["url"])
+                blobs = await self.store_chapter_pages(img_urls, owner)
+                for blob in blobs:
+                    # делаем относительный путь от папки manga — фронт получает /static/...
+                    chapter_result["pages"].append(static_url(blob_store.blob_path(blob["digest"], blob["ext"])))
+                chapter_result["page_hashes"] = [blob["digest"] for blob in blobs]
+                if len(blobs) == len(img_urls):
+                    chapter_result["download_status"] = "completed"
+                else:
+                    # Недокачанные страницы выпали бы из главы молча — сообщаем, сколько их
+                    chapter_result["download_status"] = "partial" if blobs else "failed"
+                    chapter_result["error"] = f"скачано {len(blobs)} из {len(img_urls)} страниц"
             else:
                 # Просто сохраняем URL изображений
                 chapter_result["pages"] = img_urls
                 chapter_result["download_status"] = "urls_only"
             
-            await context.close()
             return chapter_result
             
         except Exception as e:
             print(f"[ERROR] Ошибка при обработке главы {chapter['name']}: {e}")
             chapter_result["download_status"] = "error"
             chapter_result["error"] = str(e)
-            await context.close()
             return chapter_result
     
-    async def get_manga_info(self, url: str, max_chapters: Optional[int] = None) -> Dict:
-        """Получение информации о манге с загрузкой первых глав и картинок"""
-        browser = await browser_pool.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-            ]
-        )
+    async def save_manga_info(self, manga_info: Dict, manga_dir: str):
+        """Сохраняем тайтл в каталог в отдельном потоке, чтобы запись SQLite не держала event loop"""
+        await asyncio.to_thread(self.write_manga_info, manga_info, manga_dir)
+
+    def write_manga_info(self, manga_info: Dict, manga_dir: str):
+        """Сохраняем тайтл в индекс каталога (и в JSON, если включён экспорт)"""
+        if MANGA_JSON_EXPORT:
+            # JSON пишется первым: запись каталога получается новее файла, и import_json его не подхватит
+            try:
+                json_path = os.path.join(manga_dir, "manga_info.json")
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(manga_info, f, ensure_ascii=False)
+            except Exception as e:
+                print(f"[WARN] Не удалось сохранить JSON: {e}")
+        try:
+            catalog.save(manga_info)
+            print(f"💾 Информация сохранена в каталог: {manga_info['title']}")
+        except Exception as e:
+            print(f"[WARN] Не удалось сохранить тайтл в каталог: {e}")
 
-        def fix_page_url(page_url: str) -> str:
-            """Исправляем относительные пути на полные ссылки"""
-            if page_url.startswith("http"):
-                return page_url
-            return f"{BASE_URL}{page_url}"
+    async def find_stored_manga_info(self, manga_id: str) -> Optional[Dict]:
+        """Ранее сохранённый тайтл из индекса каталога"""
+        return await asyncio.to_thread(catalog.get, manga_id)
 
+    async def check_detail_page(self, url: str, validators: Dict) -> Tuple[int, Dict]:
+        """Условный GET страницы тайтла (If-None-Match / If-Modified-Since); 0 — проверить не удалось"""
+        if http_session is None:
+            return 0, validators
+        headers = {**HEADERS}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
         try:
+            async with host_limiter.slot(url) as slot, \
+                    http_session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                slot.observe(response.status, response.headers.get("Retry-After"))
+                if response.status not in (200, 304):
+                    return response.status, validators
+                fresh = {
+                    "etag": response.headers.get("ETag", validators.get("etag")),
+                    "last_modified": response.headers.get("Last-Modified", validators.get("last_modified")),
+                }
+                return response.status, fresh
+        except Exception as e:
+            print(f"[WARN] Условный запрос к {url} не удался: {e}")
+            return 0, validators
+
+    async def sync_manga_info(self, url: str) -> Dict:
+        """
+        Инкрементальное обновление тайтла: если страница не менялась (304) —
+        возвращаем сохранённые данные; иначе берём свежий список глав и
+        открываем только новые главы и главы, у которых сменился URL.
+        Новый или ленивый тайтл идёт тем же путём: уже разобранные главы
+        переиспользуются, остальные открываются, тайтл сохраняется один раз.
+        """
+        manga_id = self.get_manga_id(url)
+        stored = await self.find_stored_manga_info(manga_id) or {}
+        resolved = bool(stored) and stored.get("chapters_resolved", True)
+
+        status, validators = await self.check_detail_page(url, stored.get("http_validators", {}) if resolved else {})
+        if status == 304 and resolved:
+            print(f"📋 {stored['title']}: страница не изменилась, главы не перепроверяем")
+            stored["sync"] = {"synced_at": time(), "not_modified": True, "new_chapters": 0, "reused_chapters": stored.get("total_chapters", 0)}
+            return stored
+
+        manga_info = await self.get_manga_info(url, resolve_chapters=False)
+        manga_dir = os.path.join("manga", self.sanitize_filename(manga_info["title"]))
+        known = {
+            ch["url"]: ch for ch in stored.get("chapters", [])
+            if ch.get("download_status") not in ("error", "not_loaded", "pending")
+        }
+
+        chapters: List[Optional[Dict]] = []
+        to_visit: List[Tuple[int, Dict]] = []
+        for idx, chapter in enumerate(manga_info["chapters"], start=1):
+            old = known.get(chapter["url"])
+            if old:
+                chapters.append({**old, "name": chapter["name"], "chapter_id": chapter["chapter_id"]})
+            else:
+                chapters.append(None)
+                to_visit.append((idx, chapter))
+
+        print(f"🔄 {manga_info['title']}: новых/изменённых глав {len(to_visit)}, без изменений {len(chapters) - len(to_visit)}")
+
+        async def process_chapter(position: int, chapter: Dict) -> Dict:
+            idx = to_visit[position - 1][0]
+            result = await self.process_chapter_async(None, chapter, idx, manga_dir, download_images=False)
+            result["pages"] = [self.fix_page_url(p) for p in result["pages"]]
+            return result
+
+        visited, failed = await self.chapter_scheduler.run([ch for _, ch in to_visit], process_chapter)
+        for (idx, _), result in zip(to_visit, visited):
+            chapters[idx - 1] = result
+
+        manga_info.update(
+            chapters=chapters,
+            failed_chapters=failed,
+            total_chapters=len(chapters),
+            chapters_resolved=True,
+            http_validators=validators,
+            sync={
+                "synced_at": time(),
+                "full": not resolved,
+                "new_chapters": len(to_visit),
+                "reused_chapters": len(chapters) - len(to_visit),
+            },
+        )
+        await self.save_manga_info(manga_info, manga_dir)
+        return manga_info
+
+    @staticmethod
+    def fix_page_url(page_url: str) -> str:
+        """Исправляем относительные пути на полные ссылки"""
+        if page_url.startswith("http"):
+            return page_url
+        return f"{BASE_URL}{page_url}"
+
+    async def get_manga_info(self, url: str, max_chapters: Optional[int] = None, resolve_chapters: bool = True) -> Dict:
+        """
+        Получение информации о манге с загрузкой первых глав и картинок.
+        При resolve_chapters=False главы не открываются: возвращаются только
+        метаданные и список глав, страницы подгружаются позже через /chapters.
+        """
+        async with browser_pool.lease() as browser:
             context = await browser.new_context(
                 user_agent=HEADERS["User-Agent"],
                 viewport={"width": 1920, "height": 1080}
             )
 
-            page = await context.new_page()
-            page.set_default_timeout(30000)
-
-            print(f"Переходим на страницу: {url}")
-
             try:
-                await page.goto(url, wait_until='domcontentloaded')
-            except Exception as e:
-                print(f"Предупреждение при загрузке страницы: {e}")
-
-            # Получаем метаданные манги
-            manga_info = await self.get_full_manga_info(page)
-            manga_info["source_url"] = url
-            manga_info["manga_id"] = self.get_manga_id(url)
-
-            # Создаём структуру папок
-            manga_dir = os.path.join("manga", self.sanitize_filename(manga_info["title"]))
-            covers_dir = os.path.join(manga_dir, "covers")
-            os.makedirs(covers_dir, exist_ok=True)
+                await ResourceBlocker(url).install(context)
+                page = await context.new_page()
+                page.set_default_timeout(30000)
 
-            # Скачиваем обложку
-            if manga_info.get("cover_url") and not manga_info["cover_url"].startswith("data:"):
-                cover_path = os.path.join(covers_dir, "main_cover.jpg")
-                cover_url = urljoin(BASE_URL, manga_info["cover_url"]) if manga_info["cover_url"].startswith("/") else manga_info["cover_url"]
+                print(f"Переходим на страницу: {url}")
 
                 try:
-                    print(f"Скачиваем обложку: {cover_url}")
-                    r = requests.get(cover_url, headers={**HEADERS, "Referer": BASE_URL}, timeout=30)
-                    r.raise_for_status()
-                    with open(cover_path, "wb") as f:
-                        f.write(r.content)
-                    manga_info["local_cover_path"] = cover_path
-                    print(f"✅ Обложка сохранена: {cover_path}")
+                    with stage_seconds.time(stage="page_goto", page="detail"):
+                        await page.goto(url, wait_until='domcontentloaded')
                 except Exception as e:
-                    print(f"[WARN] Не удалось скачать обложку: {e}")
+                    print(f"Предупреждение при загрузке страницы: {e}")
 
-            # Получаем список глав
-            chapters = await page.evaluate("""
-                () => {
-                    const chapters = [];
-                    const links = document.querySelectorAll('a[href*="/reader/"]');
-                    links.forEach((link, index) => {
-                        const href = link.getAttribute('href');
-                        if (href && href.includes('/reader/')) {
-                            chapters.push({
-                                name: link.textContent.trim() || 'Глава без названия',
-                                url: href.startsWith('http') ? href : window.location.origin + href,
-                                chapter_id: (index + 1).toString()
+                # Получаем метаданные манги
+                manga_info = await self.get_full_manga_info(page)
+                manga_info["source_url"] = url
+                manga_info["manga_id"] = self.get_manga_id(url)
+
+                # Создаём структуру папок
+                manga_dir = os.path.join("manga", self.sanitize_filename(manga_info["title"]))
+                os.makedirs(manga_dir, exist_ok=True)
+
+                # Обложка качается в фоне, пока читается список глав
+                cover_task = None
+                if manga_info.get("cover_url") and not manga_info["cover_url"].startswith("data:"):
+                    cover_url = urljoin(BASE_URL, manga_info["cover_url"]) if manga_info["cover_url"].startswith("/") else manga_info["cover_url"]
+                    cover_task = asyncio.create_task(self.download_cover(cover_url, cover_owner(manga_info["manga_id"])))
+
+                # Получаем список глав
+                with stage_seconds.time(stage="evaluate", script="chapter_list"):
+                    chapters = await page.evaluate("""
+                        () => {
+                            const chapters = [];
+                            const links = document.querySelectorAll('a[href*="/reader/"]');
+                            links.forEach((link, index) => {
+                                const href = link.getAttribute('href');
+                                if (href && href.includes('/reader/')) {
+                                    chapters.push({
+                                        name: link.textContent.trim() || 'Глава без названия',
+                                        url: href.startsWith('http') ? href : window.location.origin + href,
+                                        chapter_id: (index + 1).toString()
+                                    });
+                                }
                             });
+                            return chapters;
                         }
-                    });
-                    return chapters;
-                }
-            """)
+                    """)
 
-            print(f"📚 Найдено {len(chapters)} глав")
+                if cover_task:
+                    cover_path = await cover_task
+                    if cover_path:
+                        manga_info["local_cover_path"] = cover_path
+                        manga_info["cover_variants"] = await self.cover_variants(cover_path)
+                        print(f"✅ Обложка сохранена: {cover_path}")
 
-            if max_chapters:
-                chapters = chapters[:max_chapters]
-                print(f"📖 Обрабатываем первые {max_chapters} глав")
+                print(f"📚 Найдено {len(chapters)} глав")
 
-            # Обрабатываем главы (с картинками)
-            manga_info["chapters"] = []
-            for idx, chapter in enumerate(chapters, start=1):
-                try:
+                if max_chapters:
+                    chapters = chapters[:max_chapters]
+                    print(f"📖 Обрабатываем первые {max_chapters} глав")
+
+                manga_info["chapters_resolved"] = resolve_chapters
+                if not resolve_chapters:
+                    manga_info["chapters"] = [
+                        {
+                            **chapter,
+                            "chapter_id": f"{idx}",
+                            "total_pages": 0,
+                            "pages": [],
+                            "download_status": "not_loaded"
+                        }
+                        for idx, chapter in enumerate(chapters, start=1)
+                    ]
+                    manga_info["failed_chapters"] = []
+                    manga_info["total_chapters"] = len(manga_info["chapters"])
+                    return manga_info
+
+                # Обрабатываем главы параллельно на нескольких страницах браузера
+                async def process_chapter(idx: int, chapter: Dict) -> Dict:
                     chapter_result = await self.process_chapter_async(
                         browser,
                         chapter,
@@ -622,40 +959,150 @@ class FastMangaParser:
                     )
 
                     # ✅ фиксируем ссылки картинок
-                    chapter_result["pages"] = [fix_page_url(p) for p in chapter_result["pages"]]
+                    chapter_result["pages"] = [self.fix_page_url(p) for p in chapter_result["pages"]]
+                    if chapter_result["download_status"] != "error":
+                        print(f"✅ Глава {chapter_result['name']} загружена ({chapter_result['total_pages']} стр.)")
+                    return chapter_result
 
-                    manga_info["chapters"].append(chapter_result)
-                    print(f"✅ Глава {chapter_result['name']} загружена ({chapter_result['total_pages']} стр.)")
-                except Exception as e:
-                    print(f"[ERROR] Не удалось обработать главу {chapter['name']}: {e}")
+                manga_info["chapters"], manga_info["failed_chapters"] = await self.chapter_scheduler.run(
+                    chapters, process_chapter
+                )
+                if manga_info["failed_chapters"]:
+                    print(f"[WARN] Не удалось обработать глав: {len(manga_info['failed_chapters'])}")
 
-            manga_info["total_chapters"] = len(manga_info["chapters"])
+                manga_info["total_chapters"] = len(manga_info["chapters"])
 
-            # Сохраняем JSON локально
-            try:
-                json_path = os.path.join(manga_dir, "manga_info.json")
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(manga_info, f, ensure_ascii=False, indent=2)
-                print(f"💾 Информация сохранена: {json_path}")
-            except Exception as e:
-                print(f"[WARN] Не удалось сохранить JSON: {e}")
+                await self.save_manga_info(manga_info, manga_dir)
+                return manga_info
+            finally:
+                await context.close()
 
-            await context.close()
-            return manga_info
+# Создаем экземпляр парсера
+parser = FastMangaParser(
+    max_workers=IMAGE_MAX_WORKERS,
+    chapter_concurrency=CHAPTER_CONCURRENCY,
+    chapter_rate_per_host=CHAPTER_RATE_PER_HOST,
+)
 
-        finally:
-            await browser.close()
+async def scrape_manga(url: str, manga_id: str, max_chapters: Optional[int] = None, lazy: bool = False) -> Dict:
+    """Парсим тайтл один раз на все одновременные запросы и кладём результат в кеш"""
+    async def scrape() -> Dict:
+        manga_info = await parser.get_manga_info(url, max_chapters, resolve_chapters=not lazy)
+        if lazy:
+            # Список глав тоже попадает в каталог, но уже разобранный тайтл не затирает
+            await asyncio.to_thread(catalog.save, manga_info, False)
+        await manga_cache.aset(manga_id, manga_info)
+        return manga_info
 
-# Создаем экземпляр парсера
-parser = FastMangaParser(max_workers=10)
+    async def cached() -> Optional[Dict]:
+        info = await manga_cache.aget(manga_id)
+        return info if info and (lazy or info.get("chapters_resolved", True)) else None
+
+    async def scrape_once() -> Dict:
+        return await work_leases.run(f"manga:{manga_id}", scrape, check=cached)
+
+    return await scrape_flights.run((manga_id, max_chapters, lazy), scrape_once)
+
+async def stored_manga(manga_id: str) -> Optional[Dict]:
+    """Кеш, затем индекс каталога (запись не старше TTL кеша)"""
+    info = await manga_cache.aget(manga_id)
+    if info is None:
+        info = await asyncio.to_thread(catalog.get, manga_id, max_age_s=MANGA_CACHE_TTL_S)
+        if info is not None:
+            await manga_cache.aset(manga_id, info)
+    return info
+
+# Префикс ключей кеша со страницами отдельных глав (остальные ключи — тайтлы)
+CHAPTER_CACHE_PREFIX = "chapter:"
+
+def chapter_cache_key(manga_id: str, chapter_id: str, download_images: bool) -> str:
+    """Ключ кеша для страниц отдельной главы"""
+    return f"{CHAPTER_CACHE_PREFIX}{manga_id}:{chapter_id}:{'files' if download_images else 'urls'}"
+
+async def load_chapter(manga_id: str, manga_dir: str, chapter: Dict, download_images: bool) -> Dict:
+    """Страницы одной главы: из кеша или один разбор на все одновременные запросы"""
+    chapter_id = chapter["chapter_id"]
+    cache_key = chapter_cache_key(manga_id, chapter_id, download_images)
+    cached = await manga_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
+    async def load() -> Dict:
+        result = await parser.process_chapter_async(
+            None, chapter, int(chapter_id), manga_dir, download_images, manga_id=manga_id
+        )
+        if result["download_status"] in ("completed", "urls_only"):
+            await manga_cache.aset(cache_key, result)
+        return result
+
+    async def load_once() -> Dict:
+        return await work_leases.run(cache_key, load, check=lambda: manga_cache.aget(cache_key))
+
+    return await chapter_flights.run((manga_id, chapter_id, download_images), load_once)
+
+async def sync_manga(url: str, manga_id: str) -> Dict:
+    """Инкрементальная синхронизация тайтла (одна на все одновременные запросы)"""
+    async def sync() -> Dict:
+        previous = await manga_cache.aget(manga_id) or {}
+        manga_info = await parser.sync_manga_info(url)
+        # Главы со сдвинувшимися номерами больше не соответствуют своим ключам кеша
+        old_urls = {ch.get("chapter_id"): ch.get("url") for ch in previous.get("chapters", [])}
+        for chapter in manga_info["chapters"]:
+            if old_urls.get(chapter["chapter_id"]) not in (None, chapter["url"]):
+                for download_images in (False, True):
+                    await manga_cache.adelete(chapter_cache_key(manga_id, chapter["chapter_id"], download_images))
+        await manga_cache.aset(manga_id, manga_info)
+        return manga_info
+
+    async def sync_once() -> Dict:
+        # Синхронизации одного тайтла в разных воркерах идут по очереди; следующая обычно заканчивается на 304
+        return await work_leases.run(f"manga:{manga_id}", sync)
+
+    return await scrape_flights.run((manga_id, "sync"), sync_once)
+
+async def run_import_job(job: ImportJob):
+    """Полный импорт тайтла в фоне: список глав, затем главы из очереди с ограниченной параллельностью"""
+    job.manga_id = parser.get_manga_id(job.url)
+    manga_info = dict(await scrape_manga(job.url, job.manga_id, lazy=True))
+    job.title = manga_info["title"]
+
+    all_chapters = manga_info["chapters"]
+    # max_chapters ограничивает только скачиваемые главы — список глав тайтла сохраняется целиком
+    chapters = all_chapters[:job.max_chapters] if job.max_chapters else all_chapters
+    job.start(len(chapters))
+
+    manga_dir = os.path.join("manga", parser.sanitize_filename(manga_info["title"]))
+
+    async def process_chapter(idx: int, chapter: Dict) -> Dict:
+        result = await parser.process_chapter_async(
+            None, chapter, idx, manga_dir, job.download_images, manga_id=job.manga_id
+        )
+        job.chapter_done(result)
+        return result
+
+    scheduler = ChapterScheduler(
+        concurrency=IMPORT_CHAPTER_CONCURRENCY,
+        rate_limiter=parser.chapter_scheduler.rate_limiter,
+    )
+    resolved, manga_info["failed_chapters"] = await scheduler.run(chapters, process_chapter)
+    manga_info["chapters"] = resolved + all_chapters[len(chapters):]
+    manga_info["total_chapters"] = len(manga_info["chapters"])
+    manga_info["chapters_resolved"] = len(chapters) == len(all_chapters)
+
+    await parser.save_manga_info(manga_info, manga_dir)
+    await manga_cache.aset(job.manga_id, manga_info)
+    print(f"✅ Импорт {manga_info['title']} завершён: {job.chapters_done} глав, {job.pages_downloaded} стр.")
 
 @app.get("/", summary="Главная страница")
 async def root():
     return {
         "message": "Manga Parser API",
         "endpoints": {
-            "manga_info": "/manga?url=<manga_url>&max_chapters=<number>",
-            "chapter_download": "/chapters/{chapter_id}?manga_url=<url>"
+            "manga_info": "/manga?url=<manga_url>&max_chapters=<number>&lazy=<true|false>",
+            "manga_stream": "/manga/stream?url=<manga_url>&format=<ndjson|sse>",
+            "chapter_download": "/chapters/{chapter_id}?manga_url=<url>",
+            "import": "POST /imports {url, max_chapters, download_images}",
+            "import_progress": "/imports/{job_id}"
         },
         "example": {
             "manga_info": "/manga?url=https://webfandom.ru/publications/manga-vseveduschij-chitatel",
@@ -666,7 +1113,8 @@ async def root():
 @app.get("/manga", response_model=MangaResponse, summary="Получить информацию о манге")
 async def get_manga_info_endpoint(
     url: str = Query(..., description="URL манги с webfandom.ru"),
-    max_chapters: Optional[int] = Query(None, description="Максимальное количество глав для обработки")
+    max_chapters: Optional[int] = Query(None, description="Максимальное количество глав для обработки"),
+    lazy: bool = Query(False, description="Только список глав, без страниц (страницы — через /chapters/{id})")
 ):
     """
     Получает метаданные манги по URL:
@@ -675,30 +1123,110 @@ async def get_manga_info_endpoint(
     - Список всех глав
     - Обложка
     - Дополнительная информация
+
+    С lazy=true главы не открываются, поэтому ответ приходит сразу
+    даже для длинных тайтлов.
     """
     if not url.startswith("https://webfandom.ru"):
         raise HTTPException(status_code=400, detail="URL должен быть с сайта webfandom.ru")
     
     manga_id = parser.get_manga_id(url)
     
-    # Проверяем кеш
-    if manga_id in manga_cache:
-        cached_data = manga_cache[manga_id]
+    # Проверяем кеш и каталог
+    cached_data = await stored_manga(manga_id)
+    # Ленивая запись без страниц не подходит для полного запроса
+    if cached_data and (lazy or cached_data.get("chapters_resolved", True)):
         print(f"📋 Возвращаем данные из кеша для {cached_data['title']}")
         return cached_data
     
     try:
         print(f"🔍 Получение информации о манге: {url}")
-        manga_info = await parser.get_manga_info(url, max_chapters)
-        
-        # Сохраняем в кеш
-        manga_cache[manga_id] = manga_info
-        
-        return manga_info
+        return await scrape_manga(url, manga_id, max_chapters, lazy=lazy)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при парсинге: {str(e)}")
 
+def stream_event(kind: str, data: Dict, seq: int, fmt: str) -> str:
+    """Одна запись потока: строка NDJSON или событие SSE"""
+    payload = json.dumps(data, ensure_ascii=False)
+    if fmt == "sse":
+        return f"id: {seq}\nevent: {kind}\ndata: {payload}\n\n"
+    return f'{{"type": "{kind}", "data": {payload}}}\n'
+
+@app.get("/manga/stream", summary="Тайтл потоком: сначала метаданные, потом главы по мере готовности")
+async def stream_manga_endpoint(
+    url: str = Query(..., description="URL манги с webfandom.ru"),
+    max_chapters: Optional[int] = Query(None, description="Максимальное количество глав для обработки"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson или sse")
+):
+    """
+    Первой записью (manga) приходят метаданные без глав, затем по одной записи
+    chapter на главу в порядке готовности (поле chapter_id — номер главы),
+    в конце — done. Готовые главы кешируются по отдельности и не копятся в памяти.
+    """
+    if not url.startswith("https://webfandom.ru"):
+        raise HTTPException(status_code=400, detail="URL должен быть с сайта webfandom.ru")
+
+    manga_id = parser.get_manga_id(url)
+    manga_info = await manga_cache.aget(manga_id)
+    if not manga_info:
+        try:
+            manga_info = await scrape_manga(url, manga_id, lazy=True)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Ошибка при парсинге: {str(e)}")
+
+    chapters = manga_info["chapters"][:max_chapters] if max_chapters else manga_info["chapters"]
+    manga_dir = os.path.join("manga", parser.sanitize_filename(manga_info["title"]))
+    header = {key: value for key, value in manga_info.items() if key not in ("chapters", "failed_chapters")}
+    header["total_chapters"] = len(chapters)
+
+    async def resolve(_: int, chapter: Dict) -> Dict:
+        try:
+            result = await load_chapter(manga_id, manga_dir, chapter, download_images=False)
+        except Exception as e:
+            result = {**chapter, "total_pages": 0, "pages": [], "download_status": "error", "error": str(e)}
+        return {**result, "pages": [parser.fix_page_url(p) for p in result["pages"]]}
+
+    async def chapter_records():
+        if manga_info.get("chapters_resolved", True):
+            for chapter in chapters:
+                yield chapter
+            return
+        async for result in parser.chapter_scheduler.stream(chapters, resolve):
+            yield result
+
+    async def stream():
+        seq = 0
+        yield stream_event("manga", header, seq, format)
+        failed = 0
+        try:
+            async for chapter in chapter_records():
+                seq += 1
+                failed += chapter.get("download_status") == "error"
+                yield stream_event("chapter", chapter, seq, format)
+        except Exception as e:
+            seq += 1
+            yield stream_event("error", {"detail": str(e)}, seq, format)
+            return
+        yield stream_event("done", {"total_chapters": len(chapters), "failed_chapters": failed}, seq + 1, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # X-Accel-Buffering: nginx не должен копить поток целиком
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/manga/sync", response_model=MangaResponse, summary="Инкрементально обновить тайтл")
+async def sync_manga_endpoint(url: str = Query(..., description="URL манги с webfandom.ru")):
+    """
+    Обновляет сохранённый тайтл: при неизменной странице (ETag/Last-Modified)
+    ничего не перепарсивает, иначе открывает только новые или изменённые главы
+    """
+    if not url.startswith("https://webfandom.ru"):
+        raise HTTPException(status_code=400, detail="URL должен быть с сайта webfandom.ru")
+    try:
+        return await sync_manga(url, parser.get_manga_id(url))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при синхронизации: {str(e)}")
+
 @app.get("/chapters/{chapter_id}", response_model=ChapterResponse, summary="Загрузить конкретную главу")
 async def download_chapter(
     chapter_id: str,
@@ -716,28 +1244,20 @@ async def download_chapter(
     
     manga_id = parser.get_manga_id(manga_url)
 
-    def fix_page_url(page_url: str) -> str:
-        """Исправляем относительные пути на полные ссылки"""
-        if page_url.startswith("http"):
-            return page_url
-        return f"{BASE_URL}{page_url}"
-    
-    # Проверяем, есть ли информация о манге в кеше
-    manga_info = manga_cache.get(manga_id)
-    if not manga_info:
-        # Если нет в кеше, получаем информацию
-        try:
-            manga_info = await parser.get_manga_info(manga_url)
-            manga_cache[manga_id] = manga_info
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Ошибка при получении информации о манге: {str(e)}")
-    
-    # Находим главу по ID
-    chapter_to_download = None
-    for chapter in manga_info["chapters"]:
-        if chapter.get("chapter_id") == chapter_id:
-            chapter_to_download = chapter
-            break
+    # Глава по ключу в индексе каталога, без разбора всего тайтла
+    chapter_to_download = await asyncio.to_thread(catalog.get_chapter, manga_id, chapter_id)
+    if chapter_to_download:
+        title = chapter_to_download.pop("title")
+    else:
+        manga_info = await manga_cache.aget(manga_id)
+        if not manga_info:
+            try:
+                # Для одной главы достаточно списка глав — остальные не открываем
+                manga_info = await scrape_manga(manga_url, manga_id, lazy=True)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Ошибка при получении информации о манге: {str(e)}")
+        chapter_to_download = next((ch for ch in manga_info["chapters"] if ch.get("chapter_id") == chapter_id), None)
+        title = manga_info["title"]
     
     if not chapter_to_download:
         raise HTTPException(status_code=404, detail=f"Глава с ID {chapter_id} не найдена")
@@ -745,51 +1265,304 @@ async def download_chapter(
     try:
         print(f"📖 Загрузка главы {chapter_id}: {chapter_to_download['name']}")
         
-        manga_dir = os.path.join("manga", parser.sanitize_filename(manga_info["title"]))
+        manga_dir = os.path.join("manga", parser.sanitize_filename(title))
         
-        browser = await browser_pool.chromium.launch(headless=True, args=['--no-sandbox'])
-        
-        try:
-            chapter_result = await parser.process_chapter_async(
-                browser, 
-                chapter_to_download, 
-                int(chapter_id), 
-                manga_dir, 
-                download_images
-            )
+        chapter_result = await load_chapter(manga_id, manga_dir, chapter_to_download, download_images)
 
-            # ✅ фиксируем все ссылки на страницы
-            chapter_result["pages"] = [fix_page_url(p) for p in chapter_result["pages"]]
-            
-            return ChapterResponse(
-                chapter_id=chapter_result["chapter_id"],
-                name=chapter_result["name"],
-                pages=chapter_result["pages"],
-                total_pages=chapter_result["total_pages"],
-                download_status=chapter_result["download_status"]
-            )
-            
-        finally:
-            await browser.close()
+        # ✅ фиксируем все ссылки на страницы
+        pages = [parser.fix_page_url(p) for p in chapter_result["pages"]]
+        
+        return ChapterResponse(
+            chapter_id=chapter_result["chapter_id"],
+            name=chapter_result["name"],
+            pages=pages,
+            total_pages=chapter_result["total_pages"],
+            download_status=chapter_result["download_status"]
+        )
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке главы: {str(e)}")
 
+@app.get("/catalog", summary="Каталог: поиск, фильтры и фасеты")
+async def catalog_search(
+    q: str = Query("", description="Поиск по названию и альтернативным названиям (префиксы слов, при промахе — нечёткий)"),
+    genre: List[str] = Query([], description="Жанры (все должны быть у тайтла)"),
+    status: Optional[str] = Query(None, description="Статус тайтла, например Завершен"),
+    year: Optional[int] = Query(None, description="Год выпуска"),
+    sort: Optional[str] = Query(None, description="relevance, updated, title, year, chapters"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    fuzzy: bool = Query(True, description="Нечёткий поиск, если по префиксам ничего не нашлось"),
+):
+    """
+    Страница каталога из индекса: {total, fuzzy, items, facets}.
+    facets — число тайтлов по жанрам, статусам и годам среди найденных.
+    """
+    try:
+        return await asyncio.to_thread(
+            catalog.search, q, genres=genre, status=status, year=year,
+            sort=sort, limit=limit, offset=offset, fuzzy=fuzzy,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/catalog/facets", summary="Фасеты всего каталога")
+async def catalog_facets():
+    """Счётчики жанров, статусов и годов — для боковой панели фильтров"""
+    result = await asyncio.to_thread(catalog.search, limit=0)
+    return {"total": result["total"], "facets": result["facets"]}
+
+@app.get("/catalog/{manga_id}", response_model=MangaResponse, summary="Тайтл из каталога без обращения к источнику")
+async def catalog_title(manga_id: str):
+    manga_info = await asyncio.to_thread(catalog.get, manga_id)
+    if not manga_info:
+        raise HTTPException(status_code=404, detail=f"Тайтл {manga_id} не найден в каталоге")
+    return manga_info
+
+@app.post("/imports", status_code=202, summary="Поставить тайтл в очередь на импорт")
+async def create_import(request: MangaRequest):
+    """Сразу возвращает ID задачи; прогресс — через GET /imports/{job_id}"""
+    url = str(request.url)
+    if not url.startswith("https://webfandom.ru"):
+        raise HTTPException(status_code=400, detail="URL должен быть с сайта webfandom.ru")
+    job = import_queue.submit(url, request.max_chapters, request.download_images)
+    print(f"📥 Импорт поставлен в очередь: {url} (задача {job.id})")
+    return job.to_dict()
+
+@app.get("/imports", summary="Список задач импорта")
+async def list_imports():
+    """Задачи всех воркеров; свои — в актуальном состоянии, чужие — по последнему снимку"""
+    jobs = {snapshot["job_id"]: snapshot for snapshot in await asyncio.to_thread(job_store.list)}
+    for job in import_queue.jobs.values():
+        jobs[job.id] = job.to_dict()
+    return sorted(jobs.values(), key=lambda job: job["created_at"], reverse=True)
+
+@app.get("/imports/{job_id}", summary="Прогресс задачи импорта")
+async def get_import(job_id: str):
+    job = import_queue.get(job_id)
+    if job:
+        return job.to_dict()
+    # Задача могла попасть в другой воркер — берём её последний снимок из общего хранилища
+    snapshot = await asyncio.to_thread(job_store.get, job_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+    return snapshot
+
+@app.delete("/imports/{job_id}", summary="Отменить задачу импорта")
+async def cancel_import(job_id: str):
+    job = import_queue.cancel(job_id)
+    if job:
+        return job.to_dict()
+    # Чужую задачу отменит её воркер, увидев флаг в общем хранилище
+    snapshot = await asyncio.to_thread(job_store.request_cancel, job_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+    return snapshot
+
+async def remote_import_events(job_id: str, since: int):
+    """SSE по задаче другого воркера: опрашиваем её события в общем хранилище"""
+    seq = since
+    idle_s = 0.0
+    while True:
+        events = await asyncio.to_thread(job_store.events, job_id, seq)
+        for event in events:
+            yield f"id: {event['seq']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        seq += len(events)
+        if not events:
+            snapshot = await asyncio.to_thread(job_store.get, job_id)
+            if not snapshot or snapshot["status"] in FINISHED_STATES:
+                # Последние события публикуются вместе с финальным статусом — дочитываем их
+                for event in await asyncio.to_thread(job_store.events, job_id, seq):
+                    yield f"id: {event['seq']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                break
+            idle_s += IMPORT_POLL_S
+            if idle_s >= 15:
+                idle_s = 0.0
+                yield ": keep-alive\n\n"
+        else:
+            idle_s = 0.0
+        await asyncio.sleep(IMPORT_POLL_S)
+
+@app.get("/imports/{job_id}/events", summary="Поток событий задачи импорта (SSE)")
+async def import_events(job_id: str, since: int = Query(0, description="Номер события, с которого продолжить")):
+    job = import_queue.get(job_id)
+    if not job:
+        if not await asyncio.to_thread(job_store.get, job_id):
+            raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+        return StreamingResponse(remote_import_events(job_id, since), media_type="text/event-stream")
+
+    async def stream():
+        seq = since
+        while True:
+            events = await job.wait_for_events(seq)
+            for event in events:
+                yield f"id: {event['seq']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            seq += len(events)
+            if job.status in FINISHED_STATES and seq >= len(job.events):
+                break
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+class WatchRequest(BaseModel):
+    url: HttpUrl
+    priority: float = 1.0
+
+@app.post("/watcher/subscriptions", summary="Подписаться на обновления тайтла")
+async def watch_title(request: WatchRequest):
+    """Чем выше priority, тем чаще проверяется тайтл (популярные — чаще)"""
+    url = str(request.url)
+    if not url.startswith("https://webfandom.ru"):
+        raise HTTPException(status_code=400, detail="URL должен быть с сайта webfandom.ru")
+    return await catalog_watcher.subscribe(url, request.priority)
+
+@app.get("/watcher/subscriptions", summary="Список подписок наблюдателя")
+async def list_watched_titles(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    return await asyncio.to_thread(catalog_watcher.list, limit, offset)
+
+@app.delete("/watcher/subscriptions", summary="Отписаться от тайтла")
+async def unwatch_title(url: str = Query(..., description="URL манги")):
+    if not await asyncio.to_thread(catalog_watcher.unsubscribe, url):
+        raise HTTPException(status_code=404, detail="Подписка не найдена")
+    return {"url": url, "unsubscribed": True}
+
+@app.get("/watcher/events", summary="События о новых главах (long-poll)")
+async def watcher_events(since: int = Query(0, description="Номер события, с которого продолжить")):
+    """
+    Возвращает события new_chapters с seq >= since, ожидая до 25 с, если их ещё нет.
+    Поля message и link подходят для NotificationContext.addNotification.
+    """
+    events = await catalog_watcher.wait_for_events(since)
+    next_since = events[-1]["seq"] + 1 if events else since
+    return {"events": events, "next_since": next_since}
+
 @app.get("/health", summary="Проверка состояния сервера")
 async def health_check():
     """Простая проверка состояния сервера"""
     return {
         "status": "healthy",
-        "cached_manga": len(manga_cache),
+        "cached_manga": manga_cache.count(exclude_prefix=CHAPTER_CACHE_PREFIX),
+        "cache": await asyncio.to_thread(manga_cache.stats),
+        "browser_pool": browser_pool.stats() if browser_pool else None,
+        "readiness": readiness_stats.snapshot(),
+        "chapter_extraction": parser.extraction_stats,
+        "hosts": host_limiter.stats(),
+        "catalog": await asyncio.to_thread(catalog.stats),
+        "blob_store": await asyncio.to_thread(blob_store.stats),
+        "derivatives": derivative_store.stats(),
+        "inflight": {"manga": scrape_flights.stats(), "chapters": chapter_flights.stats()},
+        "imports": import_queue.stats() if import_queue else None,
+        "watcher": await asyncio.to_thread(catalog_watcher.stats) if catalog_watcher else None,
+        "worker": {"pid": os.getpid(), "workers": WORKERS, "leases": await asyncio.to_thread(work_leases.stats)},
         "message": "Сервер работает нормально"
     }
 
+def _pool_metrics() -> Dict:
+    if not browser_pool:
+        return {}
+    stats = browser_pool.stats()
+    return label_values({key: stats[key] for key in ("size", "alive", "leased", "capacity")}, "state")
+
+def _cache_metrics() -> Dict:
+    stats = manga_cache.stats()
+    return label_values({key: stats[key] for key in ("hits", "misses", "evictions", "memory_entries", "disk_entries")}, "kind")
+
+def _import_metrics() -> Dict:
+    if not import_queue:
+        return {}
+    stats = import_queue.stats()
+    return label_values({**stats["jobs"], "queued": stats["queued"]}, "status")
+
+# Состояние, которое считается в момент запроса /metrics
+registry.gauge("manga_browser_pool", "Браузеры пула: size, alive, leased (аренды), capacity", _pool_metrics)
+registry.gauge("manga_cache", "Кеш метаданных: счётчики попаданий/промахов и число записей", _cache_metrics)
+registry.gauge("manga_cache_hit_ratio", "Доля попаданий в кеш", lambda: label_values({"all": manga_cache.stats()["hit_rate"]}, "cache"))
+registry.gauge(
+    "manga_inflight_scrapes",
+    "Выполняющиеся сейчас парсинги тайтлов и глав",
+    lambda: label_values({"manga": scrape_flights.inflight(), "chapters": chapter_flights.inflight()}, "kind"),
+)
+registry.gauge("manga_import_jobs", "Задачи импорта по статусу", _import_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse, summary="Метрики в формате Prometheus")
+async def metrics():
+    """Гистограммы этапов (запуск браузера, goto, ожидания, evaluate, обложка, картинки) и состояние сервера"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _derivative_params(preset, w, h, fmt, q, tile_height) -> Dict:
+    try:
+        return DerivativeStore.params(preset, w, h, fmt, q, tile_height)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/derivatives/image", summary="Уменьшенная/перекодированная копия картинки")
+async def derivative_image(
+    src: str = Query(..., description="Путь /static/... исходной картинки"),
+    preset: Optional[str] = Query(None, description="thumb, card, hero или page"),
+    w: int = Query(0, ge=0, le=4096, description="Ширина (без увеличения)"),
+    h: int = Query(0, ge=0, le=65535, description="Высота (без увеличения)"),
+    fmt: Optional[str] = Query(None, description="webp, avif или jpeg"),
+    q: Optional[int] = Query(None, ge=1, le=100, description="Качество"),
+):
+    """Отдаёт файл производной; результат неизменен для пары (исходник, параметры)"""
+    params = _derivative_params(preset, w, h, fmt, q, 0)
+    try:
+        manifest = await derivative_store.get(resolve_static(src), params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Не удалось обработать картинку: {e}")
+    return FileResponse(
+        manifest["files"][0],
+        media_type=f"image/{manifest['format']}",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+@app.get("/derivatives", summary="Производная картинки с нарезкой длинных полос на тайлы")
+async def derivative_manifest(
+    src: str = Query(..., description="Путь /static/... исходной картинки"),
+    preset: Optional[str] = Query("page", description="thumb, card, hero или page"),
+    w: int = Query(0, ge=0, le=4096),
+    h: int = Query(0, ge=0, le=65535),
+    fmt: Optional[str] = Query(None),
+    q: Optional[int] = Query(None, ge=1, le=100),
+    tile_height: Optional[int] = Query(None, ge=0, le=16383, description="Высота тайла (0 — не резать)"),
+):
+    """Возвращает адреса /static/... готовых файлов (один файл или тайлы сверху вниз)"""
+    params = _derivative_params(preset, w, h, fmt, q, tile_height)
+    try:
+        manifest = await derivative_store.get(resolve_static(src), params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Не удалось обработать картинку: {e}")
+    return {**manifest, "files": [static_url(path) for path in manifest["files"]]}
+
+@app.post("/storage/gc", summary="Очистка хранилища страниц")
+async def storage_gc():
+    """Удаляет картинки, на которые не ссылается ни одна глава, и старые недокачанные файлы"""
+    result = await asyncio.to_thread(blob_store.gc)
+    print(f"🧹 Очистка хранилища: удалено {result['removed_blobs']} файлов, освобождено {result['freed_bytes']} байт")
+    return result
+
 if __name__ == "__main__":
     print("🚀 Запуск FastAPI сервера для парсинга манги")
     print("📚 Доступные эндпоинты:")
     print("   GET /manga?url=<url> - Получить информацию о манге")
+    print("   GET /manga/stream?url=<url> - То же потоком (NDJSON/SSE), главы по мере готовности")
     print("   GET /chapters/{id}?manga_url=<url> - Загрузить главу")
+    print("   POST /imports - Фоновый импорт тайтла, GET /imports/{job_id} - прогресс")
     print("   GET /health - Проверка состояния")
+    print("   GET /metrics - Метрики Prometheus")
     print("🌐 Swagger UI: http://localhost:8000/docs")
     
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    if WORKERS > 1:
+        # Боевой режим: несколько процессов, у каждого свой пул браузеров (BROWSER_POOL_SIZE на процесс)
+        print(f"⚙️ Воркеров: {WORKERS}")
+        uvicorn.run("server:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
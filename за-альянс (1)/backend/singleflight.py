@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов: пока задача по ключу
+    выполняется, остальные вызовы ждут её результат, а не запускают свою.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._inflight[key] = task
+            self.started += 1
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного клиента не должна отменять общую задачу
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # помечаем исключение как полученное, если все ожидающие ушли
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict:
+        return {"inflight": self.inflight(), "started": self.started, "coalesced": self.coalesced}
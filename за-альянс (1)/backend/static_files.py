@@ -0,0 +1,100 @@
+import mimetypes
+import os
+from email.utils import formatdate
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from metrics import registry
+
+# Папки с контентно-адресуемыми файлами: содержимое по адресу никогда не меняется
+IMMUTABLE_PREFIXES = ("_blobs/", "_derivatives/")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Служебные файлы в папке manga, которые не раздаются
+PRIVATE_PREFIXES = ("_blobs/staging/",)
+PRIVATE_SUFFIXES = (".sqlite", ".sqlite-wal", ".sqlite-shm", ".sqlite-journal", ".part", ".tmp")
+# Остальные файлы (manga_info.json и т.п.) — короткий кеш с перепроверкой по ETag
+STATIC_MAX_AGE_S = int(os.getenv("STATIC_MAX_AGE_S", "3600"))
+# Передача файла обратному прокси: префикс internal-location в nginx, например /_manga/ (пусто — отдаём сами)
+STATIC_ACCEL_PREFIX = os.getenv("STATIC_ACCEL_PREFIX", "")
+# X-Accel-Redirect для nginx, X-Sendfile для Apache/lighttpd
+STATIC_ACCEL_HEADER = os.getenv("STATIC_ACCEL_HEADER", "X-Accel-Redirect")
+# Предсжатые копии рядом с файлом: <file>.br / <file>.gz
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+static_responses_total = registry.counter(
+    "manga_static_responses_total",
+    "Ответы /static по способу: file, not_modified, accel, precompressed",
+)
+
+
+class ChapterStaticFiles(StaticFiles):
+    """
+    Раздача /static для страниц глав: immutable-кеш для блобов и производных,
+    сильные ETag, 304 на условные запросы, Range (FileResponse) и
+    передача файла прокси через X-Accel-Redirect.
+    """
+
+    def _relative(self, full_path) -> str:
+        return os.path.relpath(full_path, self.directory).replace("\\", "/")
+
+    @staticmethod
+    def _cache_headers(relative: str, stat_result: os.stat_result) -> Dict[str, str]:
+        headers = {"last-modified": formatdate(stat_result.st_mtime, usegmt=True)}
+        if relative.startswith(IMMUTABLE_PREFIXES):
+            # Имя файла начинается с хеша содержимого — это и есть сильный ETag
+            digest = os.path.basename(relative).split(".", 1)[0]
+            return {**headers, "cache-control": IMMUTABLE_CACHE_CONTROL, "etag": f'"{digest}"'}
+        headers["etag"] = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+        if relative.endswith(".json"):
+            return {**headers, "cache-control": "no-cache"}
+        return {**headers, "cache-control": f"public, max-age={STATIC_MAX_AGE_S}"}
+
+    @staticmethod
+    def _precompressed(full_path, request_headers: Headers) -> Optional[tuple]:
+        accepted = request_headers.get("accept-encoding", "")
+        for encoding, suffix in PRECOMPRESSED:
+            candidate = f"{full_path}{suffix}"
+            if encoding in accepted and os.path.isfile(candidate):
+                return encoding, candidate
+        return None
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        relative = self._relative(full_path)
+        if relative.startswith(PRIVATE_PREFIXES) or relative.endswith(PRIVATE_SUFFIXES):
+            return Response(status_code=404)
+        headers = self._cache_headers(relative, stat_result)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+
+        if status_code == 200 and STATIC_ACCEL_PREFIX:
+            # Тело отдаёт прокси (sendfile), приложение только проверяет путь и ставит заголовки
+            response = Response(status_code=status_code, media_type=media_type, headers=headers)
+            if self.is_not_modified(response.headers, request_headers):
+                static_responses_total.inc(result="not_modified")
+                return NotModifiedResponse(response.headers)
+            response.headers[STATIC_ACCEL_HEADER] = STATIC_ACCEL_PREFIX.rstrip("/") + "/" + relative
+            static_responses_total.inc(result="accel")
+            return response
+
+        result = "file"
+        encoded = None
+        if status_code == 200 and "range" not in request_headers:
+            encoded = self._precompressed(full_path, request_headers)
+        if encoded:
+            encoding, full_path = encoded
+            stat_result = os.stat(full_path)
+            headers["etag"] = headers["etag"][:-1] + f'-{encoding}"'
+            headers["content-encoding"] = encoding
+            result = "precompressed"
+        headers["vary"] = "Accept-Encoding"
+
+        # FileResponse сам ставит Last-Modified и обрабатывает Range/If-Range; ETag берётся наш
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers, media_type=media_type)
+        if self.is_not_modified(response.headers, request_headers):
+            static_responses_total.inc(result="not_modified")
+            return NotModifiedResponse(response.headers)
+        static_responses_total.inc(result=result)
+        return response
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули backend лежат плоско рядом с server.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
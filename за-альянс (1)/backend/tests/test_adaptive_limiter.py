@@ -0,0 +1,78 @@
+import asyncio
+from email.utils import formatdate
+from time import monotonic, time
+
+from adaptive_limiter import AdaptiveHostLimiter, backoff_delay, retry_after_seconds
+
+URL = "https://img.site/page.jpg"
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds("120") == 120
+    assert 55 <= retry_after_seconds(formatdate(time() + 60, usegmt=True)) <= 60
+    assert retry_after_seconds(formatdate(time() - 60, usegmt=True)) == 0
+    assert retry_after_seconds("скоро") is None
+    assert retry_after_seconds(None) is None
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(20):
+        assert 0 <= backoff_delay(attempt, base_s=1, max_s=30) <= min(30, 2 ** attempt)
+
+
+def test_aimd_window():
+    async def scenario():
+        limiter = AdaptiveHostLimiter("test_aimd", initial=4, minimum=1, maximum=8)
+        for _ in range(8):
+            async with limiter.slot(URL) as slot:
+                slot.observe(200)
+        state = limiter.hosts["img.site"]
+        assert 5.5 < state.limit < 6.5  # +1 за каждые limit успешных ответов
+
+        async with limiter.slot("https://img.site/missing.jpg") as slot:
+            slot.observe(404)
+        assert 5.5 < state.limit < 6.5  # 404 о нагрузке не говорит
+
+        async with limiter.slot(URL) as slot:
+            slot.observe(429, "2")
+        assert 2.5 < state.limit < 3.5  # окно вдвое меньше
+        assert 1.5 < state.blocked_until - monotonic() <= 2  # пауза по Retry-After
+        assert limiter.stats()["img.site"]["throttled"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_window_limits_parallel_requests():
+    async def scenario():
+        limiter = AdaptiveHostLimiter("test_window", initial=2, minimum=1, maximum=2)
+        running, peak = 0, 0
+
+        async def request():
+            nonlocal running, peak
+            async with limiter.slot(URL) as slot:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                slot.observe(200)
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        assert peak == 2
+
+    asyncio.run(scenario())
+
+
+def test_network_error_counts_as_failure():
+    async def scenario():
+        limiter = AdaptiveHostLimiter("test_errors", initial=4)
+        try:
+            async with limiter.slot(URL):
+                raise OSError("connection reset")
+        except OSError:
+            pass
+        stats = limiter.stats()["img.site"]
+        assert stats["errors"] == 1
+        assert stats["inflight"] == 0
+        assert stats["limit"] == 2
+
+    asyncio.run(scenario())
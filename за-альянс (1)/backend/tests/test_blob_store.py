@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+from blob_store import BlobStore, chapter_owner
+
+
+def put(store: BlobStore, url: str, content: bytes) -> str:
+    """Кладём картинку в хранилище так же, как store_page: staging -> ingest"""
+    staging = store.staging_path(url, "jpg")
+    with open(staging, "wb") as f:
+        f.write(content)
+    return asyncio.run(store.ingest(staging, "jpg", url=url))
+
+
+def test_duplicate_content_is_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = put(store, "https://img/1.jpg", b"same")
+    second = put(store, "https://img/2.jpg", b"same")
+    assert first == second
+    assert store.stats()["blobs"] == 1
+    assert os.listdir(store.staging_dir) == []
+
+
+def test_gc_keeps_referenced_and_young_blobs(tmp_path):
+    store = BlobStore(str(tmp_path))
+    kept = put(store, "https://img/kept.jpg", b"kept")
+    orphan = put(store, "https://img/orphan.jpg", b"orphan")
+    store.set_refs("m/chapter/a", [kept])
+
+    assert store.gc(grace_s=3600)["removed_blobs"] == 0
+    result = store.gc(grace_s=0)
+    assert result["removed_blobs"] == 1
+    assert os.path.exists(store.blob_path(kept, "jpg"))
+    assert not os.path.exists(store.blob_path(orphan, "jpg"))
+    assert store.lookup_url("https://img/orphan.jpg") is None
+
+
+def test_set_refs_replaces_and_recounts(tmp_path):
+    store = BlobStore(str(tmp_path))
+    a = put(store, "https://img/a.jpg", b"a")
+    b = put(store, "https://img/b.jpg", b"b")
+    store.set_refs("m/chapter/x", [a, b])
+    store.set_refs("m/chapter/y", [a])
+    store.set_refs("m/chapter/x", [b])
+
+    store.gc(grace_s=0)
+    assert [r["digest"] for r in store.get_refs("m/chapter/x")] == [b]
+    assert os.path.exists(store.blob_path(a, "jpg"))  # на него ещё ссылается y
+    store.set_refs("m/chapter/y", [])
+    assert store.gc(grace_s=0)["removed_blobs"] == 1
+    assert not os.path.exists(store.blob_path(a, "jpg"))
+
+
+def test_chapter_shift_after_sync_keeps_old_pages(tmp_path):
+    """Новая глава сдвигает список: скачивание главы на ту же позицию не отбирает ссылки старой"""
+    store = BlobStore(str(tmp_path))
+    manga_id = "manga"
+    old_url = "https://site/reader/title/1"
+    old_pages = [put(store, f"https://img/old/{i}.jpg", f"old {i}".encode()) for i in range(3)]
+    store.set_refs(chapter_owner(manga_id, old_url), old_pages)
+
+    # Синхронизация: старая глава теперь вторая, на первой позиции — новая; её и скачиваем
+    new_url = "https://site/reader/title/2"
+    new_pages = [put(store, f"https://img/new/{i}.jpg", f"new {i}".encode()) for i in range(2)]
+    store.set_refs(chapter_owner(manga_id, new_url), new_pages)
+
+    store.gc(grace_s=0)
+    for digest in old_pages + new_pages:
+        assert os.path.exists(store.blob_path(digest, "jpg"))
+
+
+def test_owners_do_not_collide_between_titles(tmp_path):
+    store = BlobStore(str(tmp_path))
+    url = "https://site/reader/same-path/1"
+    a = put(store, "https://img/a.jpg", b"a")
+    b = put(store, "https://img/b.jpg", b"b")
+    store.set_refs(chapter_owner("first", url), [a])
+    store.set_refs(chapter_owner("second", url), [b])
+
+    store.gc(grace_s=0)
+    assert os.path.exists(store.blob_path(a, "jpg"))
+    assert os.path.exists(store.blob_path(b, "jpg"))
+
+
+def test_staging_path_is_stable_per_url(tmp_path):
+    """Повторная попытка после падения пишет в тот же .part и может продолжить его по Range"""
+    store = BlobStore(str(tmp_path))
+    assert store.staging_path("https://img/1.jpg", "jpg") == store.staging_path("https://img/1.jpg", "jpg")
+    assert store.staging_path("https://img/1.jpg", "jpg") != store.staging_path("https://img/2.jpg", "jpg")
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from cache import MangaCache
+
+
+def make_cache(tmp_path, **kwargs) -> MangaCache:
+    return MangaCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_memory_lru_evicts_oldest_but_disk_keeps_it(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # a — самая свежая
+    cache.set("c", {"v": 3})
+    assert cache.count() == 2
+    assert cache.stats_counters["evictions"] == 1
+
+    assert cache.get("b") == {"v": 2}  # вытеснена из памяти, но есть на диске
+    assert cache.stats_counters["disk_hits"] == 1
+
+
+def test_ttl_expiry_is_a_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", {"v": 1}, ttl_s=0.05)
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_memory_byte_budget(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=100)
+    cache.set("a", {"v": "x" * 60})
+    cache.set("b", {"v": "y" * 60})
+    assert cache.count() == 1
+    assert cache.get("a") == {"v": "x" * 60}
+
+
+def test_disk_trim_drops_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, max_entries=1, disk_max_entries=2, trim_every=1, touch_batch=1)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    time.sleep(0.01)
+    assert cache.get("a") == {"v": 1}  # a читали позже, чем писали b
+    cache.set("c", {"v": 3})
+    assert cache.stats()["disk_entries"] == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+
+
+def test_async_api_and_title_count(tmp_path):
+    async def scenario():
+        cache = make_cache(tmp_path)
+        await cache.aset("manga", {"title": "A"})
+        await cache.aset("chapter:manga:1:urls", {"pages": []})
+        assert await cache.aget("manga") == {"title": "A"}
+        assert cache.count(exclude_prefix="chapter:") == 1
+        await cache.adelete("manga")
+        assert await cache.aget("manga") is None
+
+    asyncio.run(scenario())
+
+
+def test_cache_is_shared_through_disk(tmp_path):
+    writer = make_cache(tmp_path)
+    reader = make_cache(tmp_path)
+    writer.set("a", {"v": 1})
+    assert reader.get("a") == {"v": 1}
@@ -0,0 +1,57 @@
+import json
+import os
+import time
+
+from catalog import CatalogStore
+
+
+def title(manga_id: str, name: str, **extra) -> dict:
+    return {
+        "manga_id": manga_id,
+        "title": name,
+        "source_url": f"https://site/publications/{manga_id}",
+        "chapters": [{"chapter_id": "1", "name": "Глава 1", "url": f"https://site/reader/{manga_id}/1",
+                      "pages": ["https://img/1.jpg"], "download_status": "urls_only"}],
+        **extra,
+    }
+
+
+def write_json(root, info: dict, mtime: float):
+    folder = os.path.join(root, info["title"])
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, "manga_info.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False)
+    os.utime(path, (mtime, mtime))
+
+
+def test_save_and_get_roundtrip(tmp_path):
+    catalog = CatalogStore(str(tmp_path / "catalog.sqlite"))
+    catalog.save(title("a", "Тайтл", genres=["Экшен"]))
+    info = catalog.get("a")
+    assert info["title"] == "Тайтл"
+    assert info["genres"] == ["Экшен"]
+    assert info["chapters"][0]["pages"] == ["https://img/1.jpg"]
+    assert catalog.get_chapter("a", "1")["name"] == "Глава 1"
+
+
+def test_startup_import_runs_once(tmp_path):
+    root = str(tmp_path / "manga")
+    write_json(root, title("a", "Старое"), time.time() - 100)
+    catalog = CatalogStore(str(tmp_path / "catalog.sqlite"))
+    assert catalog.import_json(root, once=True) == 1
+
+    # Каталог обновился, а экспортированный JSON на диске свежее — при следующем старте его не берём
+    catalog.save(title("a", "Новое"))
+    write_json(root, title("a", "Старое"), time.time() + 100)
+    assert catalog.import_json(root, once=True) == 0
+    assert catalog.get("a")["title"] == "Новое"
+
+
+def test_import_skips_files_not_newer_than_row(tmp_path):
+    root = str(tmp_path / "manga")
+    catalog = CatalogStore(str(tmp_path / "catalog.sqlite"))
+    catalog.save(title("a", "Новое"))
+    write_json(root, title("a", "Старое"), time.time() - 100)
+    assert catalog.import_json(root) == 0
+    assert catalog.get("a")["title"] == "Новое"
@@ -0,0 +1,77 @@
+from catalog import CatalogStore
+
+
+def title(manga_id: str, name: str, genres=(), year=None, status=None, **alternative_titles) -> dict:
+    info = {}
+    if year is not None:
+        info["year"] = year
+    if status:
+        info["status"] = status
+    return {
+        "manga_id": manga_id,
+        "title": name,
+        "source_url": f"https://site/publications/{manga_id}",
+        "genres": list(genres),
+        "additional_info": info,
+        "alternative_titles": alternative_titles,
+        "chapters": [],
+    }
+
+
+def make_catalog(tmp_path) -> CatalogStore:
+    catalog = CatalogStore(str(tmp_path / "catalog.sqlite"))
+    catalog.save(title("reader", "Всеведущий читатель", ["Экшен", "Фэнтези"], 2020, "Онгоинг",
+                       english="Omniscient Reader"))
+    catalog.save(title("solo", "Поднятие уровня в одиночку", ["Экшен"], "2018", "Завершён"))
+    catalog.save(title("tower", "Башня бога", ["Фэнтези"], "2010–2024"))
+    return catalog
+
+
+def ids(result: dict) -> list:
+    return [item["manga_id"] for item in result["items"]]
+
+
+def test_prefix_search_on_title_and_alternative_titles(tmp_path):
+    catalog = make_catalog(tmp_path)
+    assert ids(catalog.search("всевед")) == ["reader"]
+    assert ids(catalog.search("omnisc read")) == ["reader"]
+    assert ids(catalog.search("ВСЕВЕДУЩИЙ")) == ["reader"]
+    assert not catalog.search("всевед")["fuzzy"]
+
+
+def test_trigram_fallback_for_typos(tmp_path):
+    catalog = make_catalog(tmp_path)
+    result = catalog.search("всевидущий")
+    assert result["fuzzy"]
+    assert ids(result)[0] == "reader"
+    assert ids(catalog.search("всевидущий", fuzzy=False)) == []
+
+
+def test_facet_filters_and_counts(tmp_path):
+    catalog = make_catalog(tmp_path)
+    assert sorted(ids(catalog.search(genres=["Экшен"]))) == ["reader", "solo"]
+    assert ids(catalog.search(genres=["Экшен"], year=2018)) == ["solo"]
+
+    facets = catalog.search()["facets"]
+    assert facets["genre"] == [{"value": "Фэнтези", "count": 2}, {"value": "Экшен", "count": 2}]
+    assert [f["value"] for f in facets["year"]] == [2020, 2018, 2010]
+
+    filtered = catalog.search(genres=["Фэнтези"])["facets"]
+    assert filtered["genre"] == [{"value": "Фэнтези", "count": 2}, {"value": "Экшен", "count": 1}]
+
+
+def test_non_numeric_year_does_not_break_writes_or_listing(tmp_path):
+    catalog = make_catalog(tmp_path)
+    assert catalog.save(title("odd", "Странный год", year="неизвестно"))
+    assert catalog.save(title("empty", "Пустой год", year=""))
+    result = catalog.search(sort="year")
+    assert result["total"] == 5
+    assert all(isinstance(f["value"], int) for f in result["facets"]["year"])
+    assert ids(catalog.search(year=2010)) == ["tower"]
+
+
+def test_facet_counts_follow_updates(tmp_path):
+    catalog = make_catalog(tmp_path)
+    catalog.save(title("solo", "Поднятие уровня в одиночку", ["Драма"], 2018))
+    genres = {f["value"]: f["count"] for f in catalog.search()["facets"]["genre"]}
+    assert genres == {"Экшен": 1, "Фэнтези": 2, "Драма": 1}
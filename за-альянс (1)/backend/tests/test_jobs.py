@@ -0,0 +1,101 @@
+import asyncio
+
+from jobs import JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED, ImportQueue
+
+
+async def wait_finished(job, timeout: float = 2):
+    async def poll():
+        while job.status not in (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED):
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_progress_and_events():
+    async def scenario():
+        async def runner(job):
+            job.title = "Тайтл"
+            job.start(3)
+            job.chapter_done({"chapter_id": "1", "download_status": "completed", "pages": ["a", "b"]})
+            job.chapter_done({"chapter_id": "2", "download_status": "partial", "pages": ["c"], "error": "скачано 1 из 2 страниц"})
+            job.chapter_done({"chapter_id": "3", "download_status": "failed", "pages": [], "error": "скачано 0 из 4 страниц"})
+
+        queue = ImportQueue(runner, workers=1)
+        queue.start()
+        job = queue.submit("https://site/publications/a")
+        await wait_finished(job)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    snapshot = job.to_dict()
+    assert snapshot["status"] == JOB_COMPLETED
+    assert (snapshot["chapters_done"], snapshot["chapters_total"], snapshot["pages_downloaded"]) == (3, 3, 3)
+    assert [e["chapter_id"] for e in snapshot["errors"]] == ["2", "3"]
+    assert [e["type"] for e in job.events] == ["queued", "started", "chapter_done", "chapter_done", "chapter_done", "completed"]
+    assert [e["seq"] for e in job.events] == list(range(6))
+
+
+def test_cancel_running_and_queued_jobs():
+    async def scenario():
+        started = asyncio.Event()
+
+        async def runner(job):
+            started.set()
+            await asyncio.sleep(60)
+
+        queue = ImportQueue(runner, workers=1)
+        queue.start()
+        running = queue.submit("https://site/publications/a")
+        queued = queue.submit("https://site/publications/b")
+        await asyncio.wait_for(started.wait(), 2)
+
+        queue.cancel(queued.id)
+        assert queued.status == JOB_CANCELLED
+        queue.cancel(running.id)
+        await wait_finished(running)
+        assert running.status == JOB_CANCELLED
+        await asyncio.sleep(0.02)
+        assert queued.started_at is None  # воркер пропустил отменённую задачу
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_runner_error_fails_job():
+    async def scenario():
+        async def runner(job):
+            raise RuntimeError("страница не открылась")
+
+        queue = ImportQueue(runner, workers=1)
+        queue.start()
+        job = queue.submit("https://site/publications/a")
+        await wait_finished(job)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == JOB_FAILED
+    assert job.errors == [{"error": "страница не открылась"}]
+
+
+def test_long_poll_returns_new_events():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def runner(job):
+            await release.wait()
+
+        queue = ImportQueue(runner, workers=1)
+        queue.start()
+        job = queue.submit("https://site/publications/a")
+        seen = len(job.events)
+        waiter = asyncio.create_task(job.wait_for_events(seen, timeout=2))
+        await asyncio.sleep(0.01)
+        release.set()
+        events = await waiter
+        await wait_finished(job)
+        await queue.stop()
+        return events
+
+    events = asyncio.run(scenario())
+    assert events and events[0]["type"] == JOB_COMPLETED
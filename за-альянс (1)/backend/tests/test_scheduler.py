@@ -0,0 +1,65 @@
+import asyncio
+
+from scheduler import ChapterScheduler, HostRateLimiter
+
+
+def chapters(n: int):
+    return [{"name": f"Глава {i}", "url": f"https://site/reader/x/{i}"} for i in range(1, n + 1)]
+
+
+def test_results_keep_order_and_concurrency_is_bounded():
+    async def scenario():
+        running, peak = 0, 0
+
+        async def worker(idx, chapter):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01 * (10 - idx))  # поздние главы заканчиваются раньше
+            running -= 1
+            return {**chapter, "chapter_id": str(idx), "download_status": "urls_only"}
+
+        results, failed = await ChapterScheduler(concurrency=3).run(chapters(8), worker)
+        assert [r["chapter_id"] for r in results] == [str(i) for i in range(1, 9)]
+        assert failed == []
+        assert peak == 3
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_reported_without_stopping_other_chapters():
+    async def scenario():
+        async def worker(idx, chapter):
+            if idx in (2, 4):
+                raise RuntimeError(f"сбой {idx}")
+            return {**chapter, "chapter_id": str(idx), "download_status": "urls_only"}
+
+        results, failed = await ChapterScheduler(concurrency=2).run(chapters(5), worker)
+        assert [r["download_status"] for r in results] == ["urls_only", "error", "urls_only", "error", "urls_only"]
+        assert [(f["chapter_id"], f["error"]) for f in failed] == [("2", "сбой 2"), ("4", "сбой 4")]
+
+    asyncio.run(scenario())
+
+
+def test_stream_yields_every_chapter():
+    async def scenario():
+        async def worker(idx, chapter):
+            await asyncio.sleep(0.001 * idx)
+            return {**chapter, "chapter_id": str(idx)}
+
+        seen = [r["chapter_id"] async for r in ChapterScheduler(concurrency=2).stream(chapters(6), worker)]
+        assert sorted(seen, key=int) == [str(i) for i in range(1, 7)]
+
+    asyncio.run(scenario())
+
+
+def test_host_rate_limiter_spaces_requests():
+    async def scenario():
+        limiter = HostRateLimiter(requests_per_second=50)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(5):
+            await limiter.wait("https://site/a")
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 4 / 50 * 0.9
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.run("k", work) for _ in range(5)))
+        assert results == ["result"] * 5
+        assert len(calls) == 1
+        assert flights.stats() == {"inflight": 0, "started": 1, "coalesced": 4}
+
+        # Закончившийся ключ запускается заново
+        assert await flights.run("k", work) == "result"
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flights.run("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flights.inflight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(flights.run("k", work))
+        second = asyncio.create_task(flights.run("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "done"
+
+    asyncio.run(scenario())
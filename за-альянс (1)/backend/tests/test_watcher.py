@@ -0,0 +1,57 @@
+import asyncio
+
+from watcher import CatalogWatcher
+
+
+def test_pause_cancels_running_checks(tmp_path):
+    async def scenario():
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def checker(url):
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        watcher = CatalogWatcher(str(tmp_path / "watcher.sqlite"), checker, requests_per_second=0)
+        await watcher.subscribe("https://site/publications/a")
+        watcher.start()
+        await asyncio.wait_for(started.wait(), 5)
+        assert watcher.stats()["active_checks"] == 1
+
+        await watcher.pause()
+        assert cancelled.is_set()
+        assert not watcher._checks
+        assert watcher.stats()["active_checks"] == 0
+        await watcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_new_chapters_are_published_as_events(tmp_path):
+    async def scenario():
+        chapters = [{"url": "https://site/reader/a/1", "name": "Глава 1", "chapter_id": "1"}]
+
+        async def checker(url):
+            return {"manga_id": "a", "title": "A", "chapters": list(chapters)}
+
+        watcher = CatalogWatcher(
+            str(tmp_path / "watcher.sqlite"), checker, requests_per_second=0, base_interval_s=0, jitter=0
+        )
+        await watcher.subscribe("https://site/publications/a")
+        watcher.start()
+        # Первая проверка только запоминает главы, событие — после появления новой
+        while not (watcher.get("https://site/publications/a") or {}).get("last_checked_at"):
+            await asyncio.sleep(0.01)
+        chapters.append({"url": "https://site/reader/a/2", "name": "Глава 2", "chapter_id": "2"})
+        watcher._wakeup.set()
+        events = await watcher.wait_for_events(0, timeout=5)
+        await watcher.stop()
+        return events
+
+    events = asyncio.run(scenario())
+    assert len(events) == 1
+    assert events[0]["chapters"] == [{"chapter_id": "2", "name": "Глава 2"}]
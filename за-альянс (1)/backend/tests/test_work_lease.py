@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+
+from work_lease import LeaseLost, WorkLeases
+
+
+def test_lease_is_exclusive_until_expiry(tmp_path):
+    db = str(tmp_path / "leases.sqlite")
+    first, second = WorkLeases(db, ttl_s=0.2), WorkLeases(db, ttl_s=0.2)
+    assert first.try_acquire("manga:a")
+    assert not second.try_acquire("manga:a")
+    assert first.try_acquire("manga:a")  # своё — продлевается
+
+    time.sleep(0.25)
+    assert second.try_acquire("manga:a")
+    assert second.stats()["taken_over"] == 1
+    assert not first.try_acquire("manga:a")
+
+
+def test_release_frees_only_own_lease(tmp_path):
+    db = str(tmp_path / "leases.sqlite")
+    first, second = WorkLeases(db), WorkLeases(db)
+    assert first.try_acquire("k")
+    second.release("k")
+    assert not second.try_acquire("k")
+    first.release("k")
+    assert second.try_acquire("k")
+
+
+def test_waiter_returns_result_of_other_process(tmp_path):
+    async def scenario():
+        db = str(tmp_path / "leases.sqlite")
+        owner, waiter = WorkLeases(db, poll_s=0.01), WorkLeases(db, poll_s=0.01)
+        shared = {}
+
+        async def work():
+            await asyncio.sleep(0.05)
+            shared["k"] = "done"
+            return "done"
+
+        async def never():
+            raise AssertionError("работа не должна выполняться дважды")
+
+        results = await asyncio.gather(
+            owner.run("k", work),
+            waiter.run("k", never, check=lambda: shared.get("k")),
+        )
+        assert results == ["done", "done"]
+        assert waiter.stats()["waited"] == 1
+        assert owner.stats()["held"] == 0
+        assert waiter.try_acquire("k")  # аренда отпущена
+
+    asyncio.run(scenario())
+
+
+def test_lost_lease_cancels_work(tmp_path):
+    async def scenario():
+        db = str(tmp_path / "leases.sqlite")
+        slow, other = WorkLeases(db, ttl_s=0.3), WorkLeases(db, ttl_s=0.3)
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        runner = asyncio.create_task(slow.run("k", work))
+        await asyncio.sleep(0.05)
+        # Другой процесс забирает аренду, как будто продление опоздало больше чем на ttl
+        with other._lock:
+            other._db.execute("UPDATE leases SET owner = ?, expires_at = ?", (other.owner, time.time() + 60))
+        with pytest.raises(LeaseLost):
+            await asyncio.wait_for(runner, 2)
+        assert cancelled.is_set()
+        assert slow.stats()["lost"] == 1
+        assert not slow.try_acquire("k")
+
+    asyncio.run(scenario())
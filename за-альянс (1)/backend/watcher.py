@@ -0,0 +1,320 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+from time import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from scheduler import HostRateLimiter
+
+TitleChecker = Callable[[str], Awaitable[Dict]]
+
+
+class CatalogWatcher:
+    """
+    Следит за подписанными тайтлами и периодически их синхронизирует.
+    Интервал проверки зависит от приоритета, растёт для редко обновляемых тайтлов
+    и размывается случайным джиттером, чтобы проверки не шли пачками.
+    Новые главы публикуются как события для уведомлений на фронте. События лежат
+    в той же SQLite-базе, поэтому long-poll работает в любом воркере, а не только
+    в том, где запущены проверки.
+    База общая для воркеров, поэтому обращения к ней из async-кода идут через
+    asyncio.to_thread; синхронные get/list/unsubscribe/stats — тоже через него.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        checker: TitleChecker,
+        concurrency: int = 4,
+        requests_per_second: float = 1.0,
+        base_interval_s: float = 3600,
+        max_interval_s: float = 7 * 24 * 3600,
+        backoff_factor: float = 1.5,
+        jitter: float = 0.2,
+        max_events: int = 1000,
+        event_poll_s: float = 1.0,
+    ):
+        self.checker = checker
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.base_interval_s = base_interval_s
+        self.max_interval_s = max_interval_s
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+
+        self.max_events = max_events
+        self.event_poll_s = event_poll_s
+        self._events_changed = asyncio.Event()
+        self._active: set = set()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Запущенные проверки: держим ссылки и отменяем их вместе с циклом в pause()
+        self._checks: Set[asyncio.Task] = set()
+        self.checks = 0
+        self.failures = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                url TEXT PRIMARY KEY,
+                priority REAL NOT NULL DEFAULT 1,
+                next_check_at REAL NOT NULL,
+                last_checked_at REAL,
+                last_changed_at REAL,
+                unchanged_streak INTEGER NOT NULL DEFAULT 0,
+                error_streak INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                title TEXT,
+                manga_id TEXT,
+                chapter_urls TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_due ON subscriptions (next_check_at)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                payload TEXT NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    # --- подписки ---
+
+    def _subscribe(self, url: str, priority: float) -> Optional[Dict]:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO subscriptions (url, priority, next_check_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET priority = excluded.priority",
+                (url, priority, time()),
+            )
+        return self.get(url)
+
+    async def subscribe(self, url: str, priority: float = 1.0) -> Dict:
+        """Добавляем тайтл (или меняем приоритет); первая проверка — сразу"""
+        subscription = await asyncio.to_thread(self._subscribe, url, priority)
+        self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, url: str) -> bool:
+        with self._lock, self._db:
+            cursor = self._db.execute("DELETE FROM subscriptions WHERE url = ?", (url,))
+        return cursor.rowcount > 0
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, priority, next_check_at, last_checked_at, last_changed_at, unchanged_streak, "
+                "error_streak, last_error, title, manga_id FROM subscriptions WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, priority, next_check_at, last_checked_at, last_changed_at, unchanged_streak, "
+                "error_streak, last_error, title, manga_id FROM subscriptions ORDER BY next_check_at LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict:
+        keys = ("url", "priority", "next_check_at", "last_checked_at", "last_changed_at",
+                "unchanged_streak", "error_streak", "last_error", "title", "manga_id")
+        return dict(zip(keys, row))
+
+    # --- события ---
+
+    def _emit(self, event: Dict):
+        """Синхронно, из потока; будить ожидающих должен вызывающий код в event loop"""
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO events (ts, payload) VALUES (?, ?)", (time(), json.dumps(event, ensure_ascii=False))
+            )
+            # Храним последние max_events событий
+            self._db.execute("DELETE FROM events WHERE seq <= ?", (cursor.lastrowid - self.max_events,))
+
+    def events_since(self, since: int) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, ts, payload FROM events WHERE seq >= ? ORDER BY seq LIMIT ?", (since, self.max_events)
+            ).fetchall()
+        return [{"seq": seq, "ts": ts, **json.loads(payload)} for seq, ts, payload in rows]
+
+    async def wait_for_events(self, since: int, timeout: float = 25.0) -> List[Dict]:
+        """
+        Long-poll: события с номером >= since (ждём до timeout, если новых нет).
+        Свои события будят сразу, события наблюдателя из другого воркера видны через event_poll_s.
+        """
+        deadline = time() + timeout
+        while True:
+            self._events_changed.clear()
+            events = await asyncio.to_thread(self.events_since, since)
+            remaining = deadline - time()
+            if events or remaining <= 0:
+                return events
+            try:
+                await asyncio.wait_for(self._events_changed.wait(), timeout=min(self.event_poll_s, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    # --- планировщик ---
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def pause(self):
+        """Останавливаем цикл и уже запущенные проверки, не закрывая базу (можно снова вызвать start)"""
+        tasks = list(self._checks)
+        if self._task:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def stop(self):
+        await self.pause()
+        with self._lock:
+            self._db.close()
+
+    def _next_interval(self, priority: float, streak: int) -> float:
+        interval = self.base_interval_s / max(priority, 0.1)
+        interval *= self.backoff_factor ** min(streak, 20)
+        interval = min(interval, self.max_interval_s)
+        return interval * (1 + self.jitter * (2 * random.random() - 1))
+
+    def _poll(self, free: int, limit: int):
+        """Тайтлы, которые пора проверить, и время ближайшей следующей проверки"""
+        with self._lock:
+            due = []
+            if free > 0:
+                due = self._db.execute(
+                    "SELECT url FROM subscriptions WHERE next_check_at <= ? "
+                    "ORDER BY priority DESC, next_check_at LIMIT ?",
+                    (time(), limit),
+                ).fetchall()
+            next_due = self._db.execute("SELECT MIN(next_check_at) FROM subscriptions").fetchone()[0]
+        return due, next_due
+
+    async def _loop(self):
+        while True:
+            free = self.concurrency - len(self._active)
+            due, next_due = await asyncio.to_thread(self._poll, free, free + len(self._active))
+            started = 0
+            for (url,) in due:
+                if url in self._active or started >= free:
+                    continue
+                self._active.add(url)
+                task = asyncio.create_task(self._check(url))
+                self._checks.add(task)
+                task.add_done_callback(self._checks.discard)
+                started += 1
+
+            sleep_s = 60.0 if next_due is None else min(max(next_due - time(), 1.0), 60.0)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _check(self, url: str):
+        try:
+            row = await asyncio.to_thread(self._load, url)
+            if not row:
+                return
+            priority, unchanged_streak, error_streak, chapter_urls = row
+            known = set(json.loads(chapter_urls)) if chapter_urls else None
+
+            async with self._semaphore:
+                await self.rate_limiter.wait(url)
+                self.checks += 1
+                try:
+                    manga_info = await self.checker(url)
+                except Exception as e:
+                    self.failures += 1
+                    error_streak += 1
+                    print(f"[WARN] Наблюдатель: не удалось проверить {url}: {e}")
+                    await asyncio.to_thread(
+                        self._execute,
+                        "UPDATE subscriptions SET last_checked_at = ?, error_streak = ?, last_error = ?, "
+                        "next_check_at = ? WHERE url = ?",
+                        (time(), error_streak, str(e), time() + self._next_interval(priority, unchanged_streak + error_streak), url),
+                    )
+                    return
+
+            chapters = manga_info.get("chapters", [])
+            new_chapters = [ch for ch in chapters if known is not None and ch.get("url") not in known]
+            changed = bool(new_chapters)
+            unchanged_streak = 0 if changed else unchanged_streak + 1
+            now = time()
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE subscriptions SET last_checked_at = ?, last_changed_at = COALESCE(?, last_changed_at), "
+                "unchanged_streak = ?, error_streak = 0, last_error = NULL, title = ?, manga_id = ?, "
+                "chapter_urls = ?, next_check_at = ? WHERE url = ?",
+                (
+                    now,
+                    now if changed else None,
+                    unchanged_streak,
+                    manga_info.get("title"),
+                    manga_info.get("manga_id"),
+                    json.dumps([ch.get("url") for ch in chapters]),
+                    now + self._next_interval(priority, unchanged_streak),
+                    url,
+                ),
+            )
+
+            if changed:
+                title = manga_info.get("title", "")
+                names = [ch.get("name") for ch in new_chapters]
+                print(f"🔔 {title}: новых глав {len(new_chapters)}")
+                await asyncio.to_thread(self._emit, {
+                    "type": "new_chapters",
+                    "manga_id": manga_info.get("manga_id"),
+                    "title": title,
+                    "source_url": url,
+                    "chapters": [{"chapter_id": ch.get("chapter_id"), "name": ch.get("name")} for ch in new_chapters],
+                    # поля для NotificationContext.addNotification
+                    "message": f"{title}: вышла {names[0]}" if len(names) == 1 else f"{title}: новых глав — {len(names)}",
+                    "link": f"/manga/{manga_info.get('manga_id')}",
+                })
+                self._events_changed.set()
+        finally:
+            self._active.discard(url)
+            self._wakeup.set()
+
+    def _load(self, url: str):
+        with self._lock:
+            return self._db.execute(
+                "SELECT priority, unchanged_streak, error_streak, chapter_urls FROM subscriptions WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock, self._db:
+            self._db.execute(sql, params)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total, due = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(next_check_at <= ?), 0) FROM subscriptions", (time(),)
+            ).fetchone()
+            events = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+        return {
+            "subscriptions": total,
+            "due": due,
+            "active_checks": len(self._active),
+            "checks": self.checks,
+            "failures": self.failures,
+            "events": events,
+        }
@@ -0,0 +1,189 @@
+import asyncio
+import inspect
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from time import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+
+class LeaseLost(RuntimeError):
+    """Аренду перехватил другой процесс, пока работа под ней ещё шла"""
+
+
+class WorkLeases:
+    """
+    Аренда работы между процессами через общий SQLite-файл: один тайтл
+    парсит один воркер кластера, остальные ждут его результат в общем кеше.
+    Аренда продлевается, пока работа идёт; если процесс умер — истекает через ttl_s.
+    Владелец аренды — процесс: корутины одного процесса с тем же ключом делят её,
+    и отпускает аренду последняя из них.
+    """
+
+    def __init__(self, db_path: str, ttl_s: float = 60, poll_s: float = 0.5):
+        self.ttl_s = ttl_s
+        self.poll_s = poll_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.stats_counters = {"acquired": 0, "waited": 0, "taken_over": 0, "lost": 0}
+        self._lock = threading.Lock()
+        # ключ -> число корутин процесса, работающих под арендой, и задача её продления
+        self._holders: Dict[str, int] = {}
+        self._heartbeats: Dict[str, asyncio.Task] = {}
+        # Работы под арендой (отменяются при её потере) и отпускания, которые ещё идут
+        self._works: Dict[str, Set[asyncio.Future]] = {}
+        self._lost_works: Set[asyncio.Future] = set()
+        self._releasing: Dict[str, asyncio.Future] = {}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def try_acquire(self, key: str) -> bool:
+        """Берём аренду, если она свободна, просрочена или уже наша (тогда продлеваем)"""
+        now = time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+                if row and row[0] != self.owner and row[1] > now:
+                    self._db.execute("COMMIT")
+                    return False
+                self._db.execute(
+                    "INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                    (key, self.owner, now + self.ttl_s),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row and row[0] != self.owner:
+            self.stats_counters["taken_over"] += 1
+        return True
+
+    def release(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    async def arelease(self, key: str):
+        await asyncio.to_thread(self.release, key)
+
+    async def _heartbeat(self, key: str):
+        while True:
+            await asyncio.sleep(self.ttl_s / 3)
+            try:
+                renewed = await asyncio.to_thread(self.try_acquire, key)
+            except Exception as e:
+                print(f"[WARN] Не удалось продлить аренду {key}: {e}")
+                continue
+            if not renewed:
+                # Продление опоздало больше чем на ttl_s, и аренду взял другой процесс:
+                # останавливаем свою работу, чтобы результат не публиковался дважды
+                self.stats_counters["lost"] += 1
+                print(f"[WARN] Аренда {key} перешла к другому процессу, работа под ней отменяется")
+                self._heartbeats.pop(key, None)
+                for work in self._works.get(key, ()):
+                    self._lost_works.add(work)
+                    work.cancel()
+                return
+
+    def _held(self, key: str) -> bool:
+        """Аренда уже у этого процесса и продлевается"""
+        return bool(self._holders.get(key)) and key in self._heartbeats
+
+    def _hold(self, key: str):
+        self._holders[key] = self._holders.get(key, 0) + 1
+        if key not in self._heartbeats:
+            self._heartbeats[key] = asyncio.create_task(self._heartbeat(key))
+
+    async def _unhold(self, key: str):
+        self._holders[key] -= 1
+        if self._holders[key]:
+            return
+        del self._holders[key]
+        heartbeat = self._heartbeats.pop(key, None)
+        if heartbeat:
+            heartbeat.cancel()
+        # Пока аренда отпускается в потоке, новый захват того же ключа в процессе её дожидается
+        release = asyncio.ensure_future(self.arelease(key))
+        self._releasing[key] = release
+        try:
+            await asyncio.shield(release)
+        finally:
+            if self._releasing.get(key) is release:
+                del self._releasing[key]
+
+    async def _acquire(self, key: str) -> bool:
+        release = self._releasing.get(key)
+        if release:
+            await asyncio.gather(asyncio.shield(release), return_exceptions=True)
+        return await asyncio.to_thread(self.try_acquire, key)
+
+    @staticmethod
+    async def _check(check: Callable[[], Any]) -> Any:
+        result = check()
+        return await result if inspect.isawaitable(result) else result
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        check: Optional[Callable[[], Any]] = None,
+    ) -> Any:
+        """
+        Выполняем factory под арендой key. Если работу уже делает другой процесс —
+        ждём, периодически вызывая check() (например, чтение общего кеша; может быть async):
+        непустой результат возвращается сразу, а освободившаяся аренда берётся на себя.
+        Если аренду перехватили, работа отменяется и мы снова ждём результат через check()
+        (без check — LeaseLost).
+        """
+        while True:
+            waited = False
+            while not self._held(key) and not await self._acquire(key):
+                if not waited:
+                    waited = True
+                    self.stats_counters["waited"] += 1
+                await asyncio.sleep(self.poll_s)
+                if check:
+                    result = await self._check(check)
+                    if result is not None:
+                        return result
+            if waited and check:
+                # Пока ждали, владелец мог успеть всё сделать и отпустить аренду
+                result = await self._check(check)
+                if result is not None:
+                    if not self._holders.get(key):
+                        await self.arelease(key)
+                    return result
+
+            self.stats_counters["acquired"] += 1
+            self._hold(key)
+            work = asyncio.ensure_future(factory())
+            self._works.setdefault(key, set()).add(work)
+            try:
+                return await work
+            except asyncio.CancelledError:
+                if work not in self._lost_works:
+                    raise
+            finally:
+                self._works[key].discard(work)
+                if not self._works[key]:
+                    del self._works[key]
+                self._lost_works.discard(work)
+                await self._unhold(key)
+            if check is None:
+                raise LeaseLost(key)
+
+    def stats(self) -> Dict:
+        """Синхронно: из async-кода вызывать через asyncio.to_thread"""
+        with self._lock:
+            active = self._db.execute("SELECT COUNT(*) FROM leases WHERE expires_at > ?", (time(),)).fetchone()[0]
+        return {**self.stats_counters, "owner": self.owner, "active": active, "held": len(self._holders)}
@@ -101,3 +101,96 @@ export async function fetchMangaInfo(url: string): Promise<Manga> {
   const raw = await res.json();
   return normalizeManga(raw); // ✅ уже с Page[] и правильной обложкой
 }
+
+/** Потоковая загрузка: метаданные приходят сразу, главы — по мере готовности */
+export async function streamMangaInfo(
+  url: string,
+  onManga: (manga: Manga) => void,
+  onChapter: (chapter: Chapter) => void
+): Promise<void> {
+  const res = await fetch(`${API_BASE}/manga/stream?url=${encodeURIComponent(url)}`);
+  if (!res.ok || !res.body) {
+    const text = await res.text().catch(() => "");
+    throw new Error(
+      `Ошибка при получении манги: ${res.status} ${res.statusText} ${text}`
+    );
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let received = 0;
+
+  const handle = (line: string) => {
+    if (!line.trim()) return;
+    const record = JSON.parse(line);
+    if (record.type === "manga") {
+      onManga(normalizeManga({ ...record.data, chapters: [] }));
+    } else if (record.type === "chapter") {
+      const idx = Number(record.data?.chapter_id ?? received + 1) - 1;
+      onChapter(normalizeChapter(record.data, idx));
+      received += 1;
+    } else if (record.type === "error") {
+      throw new Error(`Ошибка при получении манги: ${record.data?.detail ?? ""}`);
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop() ?? "";
+    lines.forEach(handle);
+  }
+  handle(buffer + decoder.decode());
+}
+
+export interface CatalogFacetValue {
+  value: string | number;
+  count: number;
+}
+
+export interface CatalogQuery {
+  q?: string;
+  genres?: string[];
+  status?: string;
+  year?: number;
+  sort?: "relevance" | "updated" | "title" | "year" | "chapters";
+  limit?: number;
+  offset?: number;
+}
+
+export interface CatalogPage {
+  total: number;
+  fuzzy: boolean;
+  items: Manga[];
+  facets: { [facet: string]: CatalogFacetValue[] };
+}
+
+/** Страница каталога с сервера: поиск, фильтры и счётчики фасетов */
+export async function searchCatalog(query: CatalogQuery = {}): Promise<CatalogPage> {
+  const params = new URLSearchParams();
+  if (query.q) params.set("q", query.q);
+  (query.genres ?? []).forEach((g) => params.append("genre", g));
+  if (query.status) params.set("status", query.status);
+  if (query.year) params.set("year", String(query.year));
+  if (query.sort) params.set("sort", query.sort);
+  if (query.limit) params.set("limit", String(query.limit));
+  if (query.offset) params.set("offset", String(query.offset));
+
+  const res = await fetch(`${API_BASE}/catalog?${params.toString()}`);
+  if (!res.ok) {
+    const text = await res.text().catch(() => "");
+    throw new Error(
+      `Ошибка при загрузке каталога: ${res.status} ${res.statusText} ${text}`
+    );
+  }
+  const raw = await res.json();
+  return {
+    total: raw.total,
+    fuzzy: raw.fuzzy,
+    items: (raw.items ?? []).map((item: any) => normalizeManga({ ...item, chapters: [] })),
+    facets: raw.facets ?? {},
+  };
+}